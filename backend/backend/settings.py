@@ -69,6 +69,98 @@ SIMPLE_JWT = {
     "USER_ID_CLAIM": "user_id",
 }
 
+# Reverse proxies in front of gunicorn whose X-Forwarded-For entries are
+# trusted (nginx on the host: 1). 0 means REMOTE_ADDR is the client.
+TRUSTED_PROXY_COUNT = env.int("TRUSTED_PROXY_COUNT", default=0)
+
+
+def env_overrides(**variables):
+    """
+    {key: value} for the variables among `variables` (key=(env reader, name))
+    that are set in the environment. Unset keys are left out so the app
+    group falls back to the defaults kept next to its code (the *_DEFAULTS
+    dicts, read through core.utils.get_app_setting).
+    """
+    return {key: read(name) for key, (read, name) in variables.items() if name in os.environ}
+
+
+# Login throttling / account lockout (see core.throttling.LoginGuard)
+LOGIN_GUARD = env_overrides(
+    WINDOW_SECONDS=(env.int, "LOGIN_GUARD_WINDOW_SECONDS"),
+    MAX_ATTEMPTS_PER_IP=(env.int, "LOGIN_GUARD_MAX_ATTEMPTS_PER_IP"),
+    MAX_FAILURES_PER_EMAIL=(env.int, "LOGIN_GUARD_MAX_FAILURES_PER_EMAIL"),
+    LOCKOUT_SECONDS=(env.int, "LOGIN_GUARD_LOCKOUT_SECONDS"),
+)
+
+DEVICE_REGISTRY = env_overrides(
+    TOUCH_INTERVAL_SECONDS=(env.int, "DEVICE_TOUCH_INTERVAL_SECONDS"),
+    MAX_DEVICES_PER_USER=(env.int, "MAX_DEVICES_PER_USER"),
+)
+
+TRENDING = env_overrides(
+    BUCKET_SECONDS=(env.int, "TRENDING_BUCKET_SECONDS"),
+    HALF_LIFE_HOURS=(env.float, "TRENDING_HALF_LIFE_HOURS"),
+    MAX_RANKED=(env.int, "TRENDING_MAX_RANKED"),
+)
+
+NEARBY_PLACES = env_overrides(
+    NEAREST_PER_TYPE=(env.int, "NEARBY_PLACES_PER_TYPE"),
+    MAX_DISTANCE_MILES=(env.float, "NEARBY_PLACES_MAX_DISTANCE_MILES"),
+)
+
+IMAGE_VARIANTS = env_overrides(
+    WIDTHS=(lambda name: env.list(name, cast=int), "IMAGE_VARIANT_WIDTHS"),
+    FORMATS=(env.list, "IMAGE_VARIANT_FORMATS"),
+    MAX_DECODE_PIXELS=(env.int, "IMAGE_MAX_DECODE_PIXELS"),
+    WORKERS=(env.int, "IMAGE_WORKERS"),
+    WORKER_MEMORY_MB=(env.int, "IMAGE_WORKER_MEMORY_MB"),
+)
+
+IMAGE_RESIZE = env_overrides(
+    DIRECTORY=(env.str, "IMAGE_RESIZE_CACHE_DIR"),
+    MAX_CACHE_BYTES=(env.int, "IMAGE_RESIZE_CACHE_MAX_BYTES"),
+    MAX_WIDTH=(env.int, "IMAGE_RESIZE_MAX_WIDTH"),
+)
+
+VIDEO_PIPELINE = env_overrides(
+    FFMPEG=(env.str, "FFMPEG_BINARY"),
+    FFPROBE=(env.str, "FFPROBE_BINARY"),
+    SEGMENT_SECONDS=(env.int, "HLS_SEGMENT_SECONDS"),
+    PRESET=(env.str, "VIDEO_X264_PRESET"),
+)
+
+NEAR_DUPLICATES = env_overrides(
+    MAX_DISTANCE=(env.int, "NEAR_DUPLICATE_MAX_DISTANCE"),
+    REPORT_CACHE_SECONDS=(env.int, "NEAR_DUPLICATE_REPORT_CACHE_SECONDS"),
+)
+
+MEDIA_STORE = env_overrides(
+    ORPHAN_GRACE_HOURS=(env.int, "MEDIA_ORPHAN_GRACE_HOURS"),
+)
+
+PROTECTED_FILES = env_overrides(
+    MODE=(env.str, "PROTECTED_FILES_MODE"),
+    SIGNED_URL_SECRET=(env.str, "PROTECTED_FILES_SIGNED_URL_SECRET"),
+    SIGNED_URL_MAX_AGE=(env.int, "PROTECTED_FILES_SIGNED_URL_MAX_AGE"),
+)
+
+MEDIA_UPLOADS = {
+    **env_overrides(
+        DIRECTORY=(env.str, "CHUNKED_UPLOAD_DIR"),
+        SESSION_TTL_HOURS=(env.int, "CHUNKED_UPLOAD_TTL_HOURS"),
+    ),
+    # Merged over the per-kind default caps
+    "MAX_SIZE": env_overrides(
+        image=(env.int, "CHUNKED_UPLOAD_MAX_IMAGE_BYTES"),
+        video=(env.int, "CHUNKED_UPLOAD_MAX_VIDEO_BYTES"),
+    ),
+}
+
+MAP_TILES = env_overrides(
+    CLUSTER_DEPTH=(env.int, "MAP_TILES_CLUSTER_DEPTH"),
+    CACHE_TIMEOUT=(env.int, "MAP_TILES_CACHE_TIMEOUT"),
+)
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -144,6 +236,25 @@ DATABASES = {
     )
 }
 
+# Cache
+# Redis in production (shared across gunicorn workers), local memory otherwise
+
+REDIS_CACHE_URL = env("REDIS_CACHE_URL", default=None)
+if REDIS_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+            "KEY_PREFIX": "vmas",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 AUTH_USER_MODEL = 'core.User'
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -363,27 +474,6 @@ JAZZMIN_SETTINGS = {
     }
 
 # Logging Configuration
-LOGGING = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-        },
-    },
-    "root": {
-        "handlers": ["console"],
-        "level": "WARNING",
-    },
-    "loggers": {
-        "django": {
-            "handlers": ["console"],
-            "level": env("DJANGO_LOG_LEVEL", default="INFO"),
-            "propagate": False,
-        },
-    },
-}
-
 FERNET_KEYS = [
     '',
 ]
@@ -396,27 +486,52 @@ LOGGING = {
 
     'formatters': {
         'verbose': {
+            '()': 'core.logging_utils.StructuredFormatter',
             'format': '[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s',
             'datefmt': '%Y-%m-%d %H:%M:%S',
         },
     },
 
+    # Sampling runs first so dropped records never build their context
+    'filters': {
+        'sampling': {
+            '()': 'core.logging_utils.SamplingFilter',
+        },
+        'context': {
+            '()': 'core.logging_utils.ContextFilter',
+        },
+    },
+
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            'class': 'core.logging_utils.NonBlockingStreamHandler',
             'formatter': 'verbose',
+            'filters': ['sampling', 'context'],
         },
     },
 
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
+    },
+
     'loggers': {
+        'django': {
+            'handlers': ['console'],
+            'level': env('DJANGO_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
         'core': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': env('CORE_LOG_LEVEL', default='INFO'),
             'propagate': False,
         },
     },
 }
 
+# Fraction of high-volume INFO events (logged with extra={'sampled': True}) kept
+LOG_SAMPLE_RATE = env.float('LOG_SAMPLE_RATE', default=0.1)
+
 CCELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://redis:6379/0')
 CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default='redis://redis:6379/0') # Results are stored here
 CELERY_ACCEPT_CONTENT = ['application/json']
@@ -433,3 +548,42 @@ CELERY_RESULT_EXPIRES = env.int('CELERY_RESULT_EXPIRES', default=86400) # 1 day
 
 # Celery Beat Settings
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+
+CELERY_BEAT_SCHEDULE = {
+    'sync-login-lockouts': {
+        'task': 'sync_login_lockouts_task',
+        'schedule': 60.0,
+    },
+    'reconcile-agent-ratings': {
+        'task': 'reconcile_agent_ratings_task',
+        'schedule': 60.0 * 60 * 6,
+    },
+    'reconcile-property-engagement': {
+        'task': 'reconcile_property_engagement_task',
+        'schedule': 60.0 * 60 * 6,
+    },
+    'send-saved-search-digests': {
+        'task': 'send_saved_search_digests_task',
+        'schedule': 60.0 * 60,
+    },
+    'compute-property-similarity': {
+        'task': 'compute_property_similarity_task',
+        'schedule': 60.0 * 60 * 24,
+    },
+    'fold-property-views': {
+        'task': 'fold_property_views_task',
+        'schedule': 60.0 * 5,
+    },
+    'sync-nearby-places': {
+        'task': 'sync_nearby_places_task',
+        'schedule': 60.0 * 15,
+    },
+    'collect-orphan-media': {
+        'task': 'collect_orphan_media_task',
+        'schedule': 60.0 * 60 * 24,
+    },
+    'expire-upload-sessions': {
+        'task': 'expire_upload_sessions_task',
+        'schedule': 60.0 * 60,
+    },
+}
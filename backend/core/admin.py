@@ -4,10 +4,11 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from .models import (
     User, Agency, License, Specialization, AgentProfile, 
-    UserActivityLog, UserDevice, UserFavorite
+    UserActivityLog, UserDevice, UserFavorite, AgentReview, StoredBlob
 )
 from django.db import models
 from django_json_widget.widgets import JSONEditorWidget
+from .profile_cache import invalidate_user_profiles
 
 
 class CustomUserChangeForm(UserChangeForm):
@@ -174,23 +175,27 @@ class CustomUserAdmin(UserAdmin):
 
     def activate_users(self, request, queryset):
         updated = queryset.update(is_active=True)
+        invalidate_user_profiles(queryset.values_list('pk', flat=True))
         self.message_user(request, f'{updated} users activated successfully')
     activate_users.short_description = _("Activate selected users")
 
     def deactivate_users(self, request, queryset):
         updated = queryset.update(is_active=False)
+        invalidate_user_profiles(queryset.values_list('pk', flat=True))
         self.message_user(request, f'{updated} users deactivated successfully')
     deactivate_users.short_description = _("Deactivate selected users")
 
     def verify_emails(self, request, queryset):
         from django.utils import timezone
         updated = queryset.update(email_verified=True, email_verified_at=timezone.now())
+        invalidate_user_profiles(queryset.values_list('pk', flat=True))
         self.message_user(request, f'{updated} users email verified successfully')
     verify_emails.short_description = _("Verify emails for selected users")
 
     def verify_phones(self, request, queryset):
         from django.utils import timezone
         updated = queryset.update(phone_verified=True, phone_verified_at=timezone.now())
+        invalidate_user_profiles(queryset.values_list('pk', flat=True))
         self.message_user(request, f'{updated} users phone verified successfully')
     verify_phones.short_description = _("Verify phones for selected users")
 
@@ -240,7 +245,7 @@ class UserDeviceAdmin(admin.ModelAdmin):
     list_display = ('user', 'device_name', 'device_type', 'os', 'last_used', 'is_trusted')
     list_filter = ('device_type', 'os', 'is_trusted')
     search_fields = ('user__email', 'user__first_name', 'user__last_name', 'device_name')
-    readonly_fields = ('last_used',)
+    readonly_fields = ('fingerprint', 'last_used')
 
 
 class UserFavoriteAdmin(admin.ModelAdmin):
@@ -313,6 +318,7 @@ class AgencyAdmin(admin.ModelAdmin):
             agency_verified=True,
             agency_verified_at=timezone.now()
         )
+        invalidate_user_profiles(User.objects.filter(agency__in=queryset).values_list('pk', flat=True))
         
         self.message_user(request, f'{updated} agencies verified successfully')
     verify_agencies.short_description = _("Verify selected agencies")
@@ -338,6 +344,23 @@ class UserActivityLogAdmin(admin.ModelAdmin):
     truncated_details.short_description = _('Details')
 
 
+@admin.register(AgentReview)
+class AgentReviewAdmin(admin.ModelAdmin):
+    list_display = ('agent', 'reviewer', 'rating', 'created_at')
+    list_filter = ('rating',)
+    search_fields = ('agent__email', 'reviewer__email', 'comment')
+    readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('agent', 'reviewer')
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'refcount', 'updated_at')
+    list_filter = ('created_at',)
+    search_fields = ('name', 'digest')
+    readonly_fields = ('name', 'digest', 'size', 'refcount', 'created_at', 'updated_at')
+
+
 # Register all models
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(License, LicenseAdmin)
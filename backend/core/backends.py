@@ -1,10 +1,15 @@
 from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.utils import timezone
 from .models import User
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, email=None, password=None, **kwargs):
         try:
             user = User.objects.get(email=email)
+            # Locked accounts stop the backend chain before the hasher runs
+            if user.account_locked_until and user.account_locked_until > timezone.now():
+                raise PermissionDenied
             if user.check_password(password):
                 return user
         except User.DoesNotExist:
@@ -14,4 +19,4 @@ class EmailBackend(ModelBackend):
         try:
             return User.objects.get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
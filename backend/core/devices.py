@@ -0,0 +1,124 @@
+# backend/core/devices.py
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UserDevice
+from .utils import get_app_setting, get_client_ip
+
+
+DEVICE_REGISTRY_DEFAULTS = {
+    'TOUCH_INTERVAL_SECONDS': 300,  # At most one last_used write per device in this window
+    'MAX_DEVICES_PER_USER': 20,     # Older untrusted devices beyond this are pruned
+}
+
+# User agent plus the low-entropy client hints browsers send by default
+FINGERPRINT_HEADERS = (
+    'HTTP_USER_AGENT',
+    'HTTP_SEC_CH_UA',
+    'HTTP_SEC_CH_UA_MOBILE',
+    'HTTP_SEC_CH_UA_PLATFORM',
+    'HTTP_SEC_CH_UA_MODEL',
+)
+
+OS_PATTERNS = (
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Android', re.compile(r'Android')),
+    ('Windows', re.compile(r'Windows')),
+    ('macOS', re.compile(r'Mac OS X|Macintosh')),
+    ('Linux', re.compile(r'Linux|X11')),
+)
+BROWSER_PATTERNS = (
+    ('Edge', re.compile(r'Edg(e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('Chrome', re.compile(r'Chrome/|CriOS/')),
+    ('Safari', re.compile(r'Safari/')),
+)
+
+
+def get_device_registry_setting(name):
+    return get_app_setting('DEVICE_REGISTRY', name, DEVICE_REGISTRY_DEFAULTS)
+
+
+def _hint(meta, key):
+    return meta.get(key, '').strip().strip('"')
+
+
+def device_fingerprint(request):
+    raw = '\n'.join(request.META.get(key, '') for key in FINGERPRINT_HEADERS)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _match(patterns, value, default='Unknown'):
+    for name, pattern in patterns:
+        if pattern.search(value):
+            return name
+    return default
+
+
+def describe_device(request):
+    """Best-effort device_name/device_type/os/browser from the request headers."""
+    meta = request.META
+    user_agent = meta.get('HTTP_USER_AGENT', '')
+
+    os_name = _hint(meta, 'HTTP_SEC_CH_UA_PLATFORM') or _match(OS_PATTERNS, user_agent)
+    browser = _match(BROWSER_PATTERNS, user_agent)
+
+    if 'iPad' in user_agent or 'Tablet' in user_agent:
+        device_type = 'tablet'
+    elif _hint(meta, 'HTTP_SEC_CH_UA_MOBILE') == '?1' or 'Mobile' in user_agent:
+        device_type = 'mobile'
+    else:
+        device_type = 'desktop'
+
+    model = _hint(meta, 'HTTP_SEC_CH_UA_MODEL')
+    return {
+        'device_name': (model or f'{browser} on {os_name}')[:255],
+        'device_type': device_type,
+        'os': os_name[:100],
+        'browser': browser,
+    }
+
+
+def register_device(user_id, request):
+    """
+    Records the requesting device for `user_id`.
+
+    Repeat calls for the same device inside TOUCH_INTERVAL_SECONDS are
+    dropped in the cache, so last_used is written at most once per window.
+    A write is a single INSERT ... ON CONFLICT (user, fingerprint) DO UPDATE,
+    followed by trimming the user's history to MAX_DEVICES_PER_USER.
+    Returns True when the database was written.
+    """
+    fingerprint = device_fingerprint(request)
+    touch_key = f'device_registry:touch:{user_id}:{fingerprint}'
+    if not cache.add(touch_key, 1, timeout=get_device_registry_setting('TOUCH_INTERVAL_SECONDS')):
+        return False
+
+    device = UserDevice(
+        user_id=user_id,
+        fingerprint=fingerprint,
+        ip_address=get_client_ip(request) or '0.0.0.0',
+        last_used=timezone.now(),
+        **describe_device(request)
+    )
+    UserDevice.objects.bulk_create(
+        [device],
+        update_conflicts=True,
+        unique_fields=['user', 'fingerprint'],
+        update_fields=['ip_address', 'last_used'],
+    )
+    prune_devices(user_id)
+    return True
+
+
+def prune_devices(user_id):
+    """Deletes untrusted devices beyond the newest MAX_DEVICES_PER_USER."""
+    limit = get_device_registry_setting('MAX_DEVICES_PER_USER')
+    stale = UserDevice.objects.recent_for(user_id).values('pk')[limit:]
+    return UserDevice.objects.filter(
+        user_id=user_id, is_trusted=False, pk__in=stale
+    ).delete()[0]
@@ -0,0 +1,48 @@
+# backend/core/filetypes.py
+import os
+import threading
+
+import magic
+
+
+# Leading bytes handed to libmagic; enough for every format we accept
+SNIFF_BYTES = 2048
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def _reset_detector():
+    # A libmagic handle must not be shared with a forked child
+    global _detector
+    _detector = None
+
+
+os.register_at_fork(after_in_child=_reset_detector)
+
+
+def get_detector():
+    """
+    The process-wide libmagic handle. Opening one loads and parses the whole
+    magic database, so it is done once per process rather than per file;
+    python-magic serialises calls on a handle internally.
+    """
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = magic.Magic(mime=True)
+    return _detector
+
+
+def detect_mime(data):
+    """MIME type of a file from its leading bytes."""
+    return get_detector().from_buffer(bytes(data[:SNIFF_BYTES]))
+
+
+def detect_file_mime(file):
+    """MIME type of a Django File, leaving its position at the start."""
+    file.seek(0)
+    head = file.read(SNIFF_BYTES)
+    file.seek(0)
+    return detect_mime(head)
@@ -0,0 +1,172 @@
+# backend/core/logging_utils.py
+import logging
+import os
+import queue
+import random
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+
+REDACTED = '***'
+SENSITIVE_KEYS = {
+    'password', 'password2', 'confirm_password', 'old_password', 'new_password',
+    'token', 'access', 'refresh', 'tfa_secret', 'secret', 'api_key',
+}
+SENSITIVE_HEADERS = {'HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_X_CSRFTOKEN'}
+LOGGED_HEADERS = (
+    'REMOTE_ADDR', 'HTTP_USER_AGENT', 'HTTP_REFERER', 'HTTP_X_FORWARDED_FOR',
+    'HTTP_AUTHORIZATION', 'HTTP_ORIGIN',
+)
+
+
+def redact(data):
+    """Copy of a mapping with secret-looking keys masked."""
+    try:
+        items = data.items()
+    except AttributeError:
+        return data
+    return {
+        key: REDACTED if str(key).lower() in SENSITIVE_KEYS else value
+        for key, value in items
+    }
+
+
+class LazyContext:
+    """
+    Log context that is only built when a handler actually emits the record.
+
+    Creating one costs a single allocation; the callable runs in
+    ContextFilter, which sits on the handler and therefore never sees
+    records dropped by logger levels or sampling.
+    """
+    __slots__ = ('builder',)
+
+    def __init__(self, builder):
+        self.builder = builder
+
+    def resolve(self):
+        return self.builder()
+
+
+def request_context(request, include_data=False, **fields):
+    """Lazy, redacted context for a DRF request plus any extra fields."""
+    def build():
+        meta = request.META
+        context = {
+            'method': request.method,
+            'path': request.path,
+            'user_id': getattr(request.user, 'id', None),
+            'headers': {
+                key: REDACTED if key in SENSITIVE_HEADERS else meta[key]
+                for key in LOGGED_HEADERS if key in meta
+            },
+        }
+        if include_data:
+            context['data'] = redact(request.data)
+        context.update(fields)
+        return context
+    return LazyContext(build)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of records logged with extra={'sampled': True} at INFO
+    or below; every other record passes through untouched.
+    """
+    def __init__(self, rate=None):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or record.levelno > logging.INFO:
+            return True
+        rate = self.rate if self.rate is not None else getattr(settings, 'LOG_SAMPLE_RATE', 1.0)
+        return random.random() < rate
+
+
+class ContextFilter(logging.Filter):
+    """Resolves LazyContext values and redacts the result before formatting."""
+    def filter(self, record):
+        context = getattr(record, 'context', None)
+        if isinstance(context, LazyContext):
+            record.context = redact(context.resolve())
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Standard format with the record's context appended as key=value pairs."""
+    def format(self, record):
+        message = super().format(record)
+        context = getattr(record, 'context', None)
+        if isinstance(context, dict) and context:
+            pairs = ' '.join(f'{key}={value!r}' for key, value in context.items())
+            message = f'{message} | {pairs}'
+        return message
+
+
+class NonBlockingStreamHandler(QueueHandler):
+    """
+    Hands records to a bounded queue drained by a background StreamHandler,
+    so request threads never block on log I/O. Records are dropped (and
+    counted) when the queue is full rather than stalling the worker.
+
+    The listener thread does not survive fork(), so forked children (Celery's
+    prefork pool, gunicorn with --preload) get a fresh queue and listener.
+    """
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream)
+        self._start_listener()
+        if hasattr(os, 'register_at_fork'):
+            handler = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: _restart_in_child(handler))
+
+    def _start_listener(self):
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._listener_running = True
+
+    def _after_fork_in_child(self):
+        # Handlers closed before the fork stay closed. Records still queued
+        # belong to the parent's listener, so the child starts empty.
+        if not self._listener_running:
+            return
+        self._listener_running = False
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self._start_listener()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Formatting runs on the listener thread; only snapshot what may not
+        # survive the hand-off (exception text and the rendered message args).
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Called by logging.shutdown() at exit; drains what is still queued
+        if self._listener_running:
+            self._listener_running = False
+            self.listener.stop()
+        super().close()
+
+
+def _restart_in_child(handler_ref):
+    handler = handler_ref()
+    if handler is not None:
+        handler._after_fork_in_child()
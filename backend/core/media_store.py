@@ -0,0 +1,188 @@
+# backend/core/media_store.py
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from .utils import get_app_setting
+
+
+MEDIA_STORE_DEFAULTS = {
+    'ORPHAN_GRACE_HOURS': 24,    # Unreferenced blobs younger than this are kept
+}
+
+# (model, field name) pairs whose files live in the content-addressed store
+TRACKED_FIELDS = []
+
+
+def get_media_store_setting(name):
+    return get_app_setting('MEDIA_STORE', name, MEDIA_STORE_DEFAULTS)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file under the SHA-256 of its content, inside the directory
+    its upload_to asked for: property_images/3f/3f9a...c1.jpg. The digest is
+    computed while the upload is streamed to a temporary file, which is then
+    either moved into place or, when that content is already stored,
+    discarded, so identical uploads share one file. Every stored name gets a
+    StoredBlob row whose refcount the tracked model fields keep up to date.
+    """
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        target_dir = self.path(directory)
+        os.makedirs(target_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=target_dir, prefix='.upload-', delete=False) as temporary:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temporary.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                os.unlink(temporary.name)
+                raise
+
+        hexdigest = digest.hexdigest()
+        stored_name = os.path.join(directory, hexdigest[:2], f"{hexdigest}{extension}").replace(os.sep, '/')
+        stored_path = self.path(stored_name)
+        # The locked, refreshed blob row keeps collect_orphan_blobs from
+        # deleting the file between the existence check and the reference
+        with transaction.atomic():
+            register_blob(stored_name, hexdigest, size)
+            if os.path.exists(stored_path):
+                os.unlink(temporary.name)
+            else:
+                os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary.name, self.file_permissions_mode)
+                os.replace(temporary.name, stored_path)
+        return stored_name
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is the digest; an existing file is the same content
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def get_content_addressed_storage():
+    # Referenced as a callable by FileField(storage=...) to keep migrations stable
+    return content_addressed_storage
+
+
+def register_blob(name, digest, size):
+    """
+    Creates the blob row of a freshly stored name or refreshes its grace
+    period, and locks it until the surrounding transaction ends.
+    """
+    from .models import StoredBlob
+
+    blob = None
+    while blob is None:
+        StoredBlob.objects.get_or_create(name=name, defaults={'digest': digest, 'size': size})
+        # None when the collector deleted the row in between; create it again
+        blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+    StoredBlob.objects.filter(pk=blob.pk).update(updated_at=timezone.now())
+    return blob
+
+
+def adjust_references(names, delta):
+    from .models import StoredBlob
+
+    names = [name for name in names if name]
+    for name in set(names):
+        StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + delta * names.count(name))
+
+
+def retain(*names):
+    adjust_references(names, 1)
+
+
+def release(*names):
+    adjust_references(names, -1)
+
+
+def track_file_references(model, *field_names):
+    """
+    Keeps StoredBlob.refcount in step with the file fields of `model`:
+    saving a row retains its new names and releases the ones it replaced,
+    deleting it releases them. Querysets that bypass signals (update,
+    bulk_create) are corrected by collect_orphan_blobs before it deletes.
+    """
+    for field_name in field_names:
+        TRACKED_FIELDS.append((model, field_name))
+
+    def remember(sender, instance, **kwargs):
+        instance._stored_names = {field: getattr(instance, field).name for field in field_names}
+
+    def on_save(sender, instance, **kwargs):
+        previous = getattr(instance, '_stored_names', {})
+        current = {field: getattr(instance, field).name for field in field_names}
+        for field in field_names:
+            if current[field] != previous.get(field):
+                retain(current[field])
+                release(previous.get(field))
+        instance._stored_names = current
+
+    def on_delete(sender, instance, **kwargs):
+        release(*(getattr(instance, field).name for field in field_names))
+
+    uid = f'media_store:{model._meta.label}'
+    post_init.connect(remember, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=uid)
+
+
+def count_references(names):
+    """{name: rows referencing it} across every tracked field."""
+    counts = dict.fromkeys(names, 0)
+    for model, field_name in TRACKED_FIELDS:
+        referenced = model._default_manager.filter(**{f'{field_name}__in': names}).values_list(field_name, flat=True)
+        for name in referenced:
+            counts[name] += 1
+    return counts
+
+
+def collect_orphan_blobs():
+    """
+    Deletes stored files no row references any more. Candidates are blobs
+    with refcount <= 0 untouched for ORPHAN_GRACE_HOURS; their references are
+    recounted first, so a drifted counter is repaired instead of trusted.
+    Returns (files deleted, counters repaired).
+    """
+    from .models import StoredBlob
+
+    cutoff = timezone.now() - timedelta(hours=get_media_store_setting('ORPHAN_GRACE_HOURS'))
+    candidates = list(
+        StoredBlob.objects.filter(refcount__lte=0, updated_at__lt=cutoff).values_list('name', flat=True)[:1000]
+    )
+    deleted = repaired = 0
+    for name, references in count_references(candidates).items():
+        if references:
+            repaired += StoredBlob.objects.filter(name=name).update(refcount=references)
+            continue
+        # Only delete the file if no upload refreshed the blob meanwhile; the
+        # row lock holds back uploads of the same content until the file is gone
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(
+                name=name, refcount__lte=0, updated_at__lt=cutoff
+            ).first()
+            if blob is not None:
+                blob.delete()
+                content_addressed_storage.delete(name)
+                deleted += 1
+    return deleted, repaired
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.7 on 2026-10-19 15:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_agent_search_terms(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    AgentSearchTerm = apps.get_model('core', 'AgentSearchTerm')
+
+    def terms_from(values):
+        if not isinstance(values, list):
+            return set()
+        return {str(v).strip().lower()[:255] for v in values if isinstance(v, str) and v.strip()}
+
+    terms = []
+    for user in User.objects.filter(role='agent').select_related('agency').iterator():
+        service_areas = terms_from(user.service_areas)
+        if user.agency_id:
+            service_areas |= terms_from(user.agency.service_areas)
+        terms.extend(AgentSearchTerm(user_id=user.pk, term_type='language', value=v) for v in terms_from(user.languages))
+        terms.extend(AgentSearchTerm(user_id=user.pk, term_type='service_area', value=v) for v in service_areas)
+    AgentSearchTerm.objects.bulk_create(terms, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_license_specialization_userdevice_userfavorite_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term_type', models.CharField(choices=[('language', 'Language'), ('service_area', 'Service Area')], max_length=20, verbose_name='Term Type')),
+                ('value', models.CharField(max_length=255, verbose_name='Value')),
+            ],
+            options={
+                'verbose_name': 'Agent Search Term',
+                'verbose_name_plural': 'Agent Search Terms',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='agency',
+            index=models.Index(fields=['latitude', 'longitude'], name='core_agency_latitud_282207_idx'),
+        ),
+        migrations.AddField(
+            model_name='agentsearchterm',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='agentsearchterm',
+            index=models.Index(fields=['term_type', 'value', 'user'], name='core_agents_term_ty_0f5b99_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='agentsearchterm',
+            unique_together={('user', 'term_type', 'value')},
+        ),
+        migrations.RunPython(backfill_agent_search_terms, migrations.RunPython.noop),
+    ]
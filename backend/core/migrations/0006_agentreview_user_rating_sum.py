@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-19 15:58
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_rating_sum(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    User.objects.filter(rating__isnull=False).update(rating_sum=F('rating') * F('reviews_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_agentsearchterm_agency_coordinates_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Rating Sum'),
+        ),
+        migrations.CreateModel(
+            name='AgentReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)], verbose_name='Rating')),
+                ('comment', models.TextField(blank=True, verbose_name='Comment')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('agent', models.ForeignKey(limit_choices_to={'role': 'agent'}, on_delete=django.db.models.deletion.CASCADE, related_name='reviews_received', to=settings.AUTH_USER_MODEL)),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews_written', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Agent Review',
+                'verbose_name_plural': 'Agent Reviews',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['agent', 'created_at'], name='core_agentr_agent_i_442003_idx')],
+                'unique_together': {('agent', 'reviewer')},
+            },
+        ),
+        migrations.RunPython(backfill_rating_sum, migrations.RunPython.noop),
+    ]
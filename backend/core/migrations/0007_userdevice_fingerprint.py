@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:20
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_fingerprints(apps, schema_editor):
+    # Rows created before the registry have nothing to fingerprint; give each
+    # a distinct placeholder so the (user, fingerprint) constraint holds.
+    UserDevice = apps.get_model('core', 'UserDevice')
+    devices = list(UserDevice.objects.only('pk'))
+    for device in devices:
+        device.fingerprint = hashlib.sha256(f'legacy:{device.pk}'.encode('utf-8')).hexdigest()
+    UserDevice.objects.bulk_update(devices, ['fingerprint'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_agentreview_user_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdevice',
+            name='fingerprint',
+            field=models.CharField(default='', max_length=64, verbose_name='Fingerprint'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userdevice',
+            constraint=models.UniqueConstraint(fields=('user', 'fingerprint'), name='unique_user_device_fingerprint'),
+        ),
+        migrations.AddIndex(
+            model_name='userdevice',
+            index=models.Index(fields=['user', '-last_used'], name='core_userde_user_id_2396ee_idx'),
+        ),
+    ]
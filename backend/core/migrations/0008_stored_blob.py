@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_userdevice_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Name')),
+                ('digest', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Size (bytes)')),
+                ('refcount', models.IntegerField(default=0, verbose_name='References')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Stored Blob',
+                'verbose_name_plural': 'Stored Blobs',
+                'indexes': [models.Index(fields=['refcount', 'updated_at'], name='core_stored_refcoun_19cc38_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:54
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def split_legacy_ratings(apps, schema_editor):
+    """
+    Whatever the aggregates hold beyond the AgentReview rows (ratings from
+    before reviews were stored, or added without one) becomes the baseline.
+    """
+    User = apps.get_model('core', 'User')
+    agents = User.objects.filter(Q(reviews_count__gt=0) | ~Q(rating_sum=0)).annotate(
+        reviewed_sum=Sum('reviews_received__rating'), reviewed_count=Count('reviews_received')
+    )
+    for agent in agents:
+        User.objects.filter(pk=agent.pk).update(
+            legacy_rating_sum=max(agent.rating_sum - (agent.reviewed_sum or 0), 0),
+            legacy_reviews_count=max(agent.reviews_count - agent.reviewed_count, 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_stored_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='legacy_rating_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Legacy Rating Sum'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='legacy_reviews_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Legacy Reviews Count'),
+        ),
+        migrations.RunPython(split_legacy_ratings, migrations.RunPython.noop),
+    ]
@@ -8,7 +8,11 @@ from datetime import date
 import json
 from django.core.exceptions import ValidationError
 from encrypted_model_fields.fields import EncryptedCharField, EncryptedTextField
-from django.db.models import Q
+from django.db.models import Q, F, Case, When, Value, ExpressionWrapper, DecimalField, FloatField
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
+from django.core.validators import MinValueValidator, MaxValueValidator
+from decimal import Decimal
 from phonenumber_field.modelfields import PhoneNumberField
 
 
@@ -66,6 +70,31 @@ class UserManager(BaseUserManager):
     def get_agency_agents(self, agency):
         return self.filter(agency=agency, role='agent', is_active=True)
 
+    def apply_review_delta(self, agent_id, rating_delta, count_delta=0):
+        """
+        Shifts an agent's rating aggregates in a single UPDATE built from
+        F-expressions, so concurrent reviews never overwrite each other and
+        readers always see a consistent rating / reviews_count pair.
+        """
+        new_sum = F('rating_sum') + Value(Decimal(str(rating_delta)))
+        new_count = F('reviews_count') + count_delta
+        # Float division: SQLite would otherwise divide the NUMERIC sum as integers
+        average = ExpressionWrapper(
+            Round(Cast(new_sum, FloatField()) / new_count, 2),
+            output_field=DecimalField(max_digits=3, decimal_places=2)
+        )
+        return self.filter(pk=agent_id).update(
+            rating_sum=new_sum,
+            reviews_count=new_count,
+            rating=Case(When(GreaterThan(new_count, 0), then=average), default=None),
+        )
+
+    def get_public_agent_profiles(self):
+        """Everything AgentPublicProfileSerializer touches, in three queries per page."""
+        return self.select_related('agency', 'agent_profile').prefetch_related(
+            'licenses', 'specializations'
+        )
+
 
 class License(models.Model):
     LICENSE_TYPES = (
@@ -105,6 +134,18 @@ class Specialization(models.Model):
         return self.name
 
 
+class AgencyQuerySet(models.QuerySet):
+    def with_member_counts(self):
+        """Member and active agent counts as one grouped annotation."""
+        return self.annotate(
+            member_count=models.Count('members'),
+            active_agents_count=models.Count(
+                'members',
+                filter=Q(members__role='agent', members__is_active=True)
+            ),
+        )
+
+
 class Agency(models.Model):
     name = models.CharField(_('Agency Name'), max_length=255, unique=True)
     description = models.TextField(_('Description'), blank=True, null=True)
@@ -129,12 +170,17 @@ class Agency(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AgencyQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name_plural = _('Agencies')
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['latitude', 'longitude']),
+        ]
 
     def clean(self):
         if self.verified and not self.verified_at:
@@ -147,6 +193,9 @@ class Agency(models.Model):
 
     @property
     def agent_count(self):
+        # Use the with_member_counts() annotation when the instance has it
+        if hasattr(self, 'active_agents_count'):
+            return self.active_agents_count
         return self.active_agents.count()
 
 
@@ -189,6 +238,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     average_response_time = models.PositiveIntegerField(_('Average Response Time (hours)'), blank=True, null=True)
     rating = models.DecimalField(_('Rating'), max_digits=3, decimal_places=2, blank=True, null=True)
     reviews_count = models.PositiveIntegerField(_('Reviews Count'), default=0)
+    rating_sum = models.DecimalField(_('Rating Sum'), max_digits=12, decimal_places=2, default=0)
+    # Ratings recorded before AgentReview existed; reconciliation adds them back
+    legacy_rating_sum = models.DecimalField(_('Legacy Rating Sum'), max_digits=12, decimal_places=2, default=0)
+    legacy_reviews_count = models.PositiveIntegerField(_('Legacy Reviews Count'), default=0)
     
     # Social Media Links
     facebook_url = models.URLField(_('Facebook Profile'), blank=True, null=True)
@@ -329,16 +382,6 @@ class User(AbstractBaseUser, PermissionsMixin):
             return list(set(self.service_areas + self.agency.service_areas))
         return self.service_areas
 
-    def update_rating(self, new_rating):
-        """Update agent rating with new review"""
-        if not self.rating:
-            self.rating = new_rating
-        else:
-            total_rating = self.rating * self.reviews_count
-            self.rating = (total_rating + new_rating) / (self.reviews_count + 1)
-        self.reviews_count += 1
-        self.save(update_fields=['rating', 'reviews_count'])
-
     def get_absolute_url(self):
         """Get URL for user's public profile"""
         if self.is_agent:
@@ -399,8 +442,15 @@ class UserActivityLog(models.Model):
         return f"{self.user} - {self.get_action_display()} at {self.timestamp}"
 
 
+class UserDeviceQuerySet(models.QuerySet):
+    def recent_for(self, user_id):
+        """A user's devices, most recently used first (served by the user/last_used index)."""
+        return self.filter(user_id=user_id).order_by('-last_used', '-pk')
+
+
 class UserDevice(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='devices')
+    fingerprint = models.CharField(_('Fingerprint'), max_length=64)
     device_name = models.CharField(_('Device Name'), max_length=255)
     device_type = models.CharField(_('Device Type'), max_length=100)
     os = models.CharField(_('Operating System'), max_length=100)
@@ -409,7 +459,15 @@ class UserDevice(models.Model):
     last_used = models.DateTimeField(_('Last Used'))
     is_trusted = models.BooleanField(_('Trusted Device'), default=False)
 
+    objects = UserDeviceQuerySet.as_manager()
+
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'fingerprint'], name='unique_user_device_fingerprint'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-last_used']),
+        ]
         verbose_name = _('User Device')
         verbose_name_plural = _('User Devices')
 
@@ -446,4 +504,83 @@ class UserFavorite(models.Model):
 
     def clean(self):
         if not self.property and not self.agent and not self.search_parameters:
-            raise ValidationError("At least one of property, agent, or search parameters must be set")
\ No newline at end of file
+            raise ValidationError("At least one of property, agent, or search parameters must be set")
+
+class AgentSearchTerm(models.Model):
+    """
+    Normalized copy of an agent's `languages` and `service_areas` (including
+    the agency's service areas) so agent search can use an indexed equality
+    lookup instead of scanning JSON columns. Rebuilt by core.signals.
+    """
+    TERM_TYPES = (
+        ('language', _('Language')),
+        ('service_area', _('Service Area')),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    term_type = models.CharField(_('Term Type'), max_length=20, choices=TERM_TYPES)
+    value = models.CharField(_('Value'), max_length=255)
+
+    class Meta:
+        unique_together = ('user', 'term_type', 'value')
+        indexes = [
+            models.Index(fields=['term_type', 'value', 'user']),
+        ]
+        verbose_name = _('Agent Search Term')
+        verbose_name_plural = _('Agent Search Terms')
+
+    def __str__(self):
+        return f"{self.user_id} {self.term_type}: {self.value}"
+
+
+
+class AgentReview(models.Model):
+    agent = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reviews_received',
+        limit_choices_to={'role': 'agent'}
+    )
+    reviewer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews_written')
+    rating = models.PositiveSmallIntegerField(
+        _('Rating'),
+        validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
+    comment = models.TextField(_('Comment'), blank=True)
+    created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
+
+    class Meta:
+        unique_together = ('agent', 'reviewer')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['agent', 'created_at']),
+        ]
+        verbose_name = _('Agent Review')
+        verbose_name_plural = _('Agent Reviews')
+
+    def __str__(self):
+        return f"{self.reviewer} -> {self.agent}: {self.rating}"
+
+
+class StoredBlob(models.Model):
+    """
+    A file in the content-addressed media store (see core.media_store),
+    shared by every row that uploaded the same bytes.
+    """
+    name = models.CharField(_('Name'), max_length=255, unique=True)
+    digest = models.CharField(_('SHA-256'), max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(_('Size (bytes)'))
+    refcount = models.IntegerField(_('References'), default=0)
+    created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at']),
+        ]
+        verbose_name = _('Stored Blob')
+        verbose_name_plural = _('Stored Blobs')
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
@@ -0,0 +1,101 @@
+# backend/core/pagination.py
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek-based pagination over a (value, pk) pair.
+
+    The view provides `keyset_ordering` as a (field, descending) tuple, either
+    as an attribute or set per request. Each page continues from the last row
+    of the previous one, so deep pages cost the same as the first and rows
+    inserted mid-scroll do not shift the page boundaries.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, value, pk):
+        if isinstance(value, Decimal):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = {'dt': value.isoformat()}
+        raw = json.dumps([value, pk]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if isinstance(value, dict):
+                value = parse_datetime(value['dt'])
+                if value is None:
+                    raise ValueError(value)
+        except (KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field, self.descending = getattr(view, 'keyset_ordering', ('pk', False))
+        self.page_size = self.get_page_size(request)
+
+        prefix = '-' if self.descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            op = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{op}': value})
+                | Q(**{self.field: value, f'pk__{op}': pk})
+            )
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        cursor = self.encode_cursor(getattr(self.last, self.field), self.last.pk)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
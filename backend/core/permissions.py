@@ -1,5 +1,35 @@
+from collections import namedtuple
 from rest_framework import permissions
 from django.utils.translation import gettext_lazy as _
+from .models import Agency
+
+
+AgencyMembership = namedtuple('AgencyMembership', ['agency_id', 'agency_role'])
+
+
+def get_agency_membership(request):
+    """
+    The requesting user's agency membership, resolved once per request from
+    the authenticated user row (User.agency / User.agency_role), so agency
+    permission checks answer from memory instead of querying per object.
+    """
+    membership = getattr(request, '_agency_membership', None)
+    if membership is None:
+        user = request.user
+        membership = AgencyMembership(
+            getattr(user, 'agency_id', None),
+            getattr(user, 'agency_role', None)
+        )
+        request._agency_membership = membership
+    return membership
+
+
+def get_object_agency_id(obj):
+    """Agency id of an Agency instance or of any object with an agency FK."""
+    if isinstance(obj, Agency):
+        return obj.pk
+    return getattr(obj, 'agency_id', None)
+
 
 class IsAdminOrSelf(permissions.BasePermission):
     """
@@ -18,21 +48,13 @@ class IsAgencyOwner(permissions.BasePermission):
     message = _('Only agency owners can perform this action.')
 
     def has_object_permission(self, request, view, obj):
-        # For agency model instances
-        if hasattr(obj, 'members'):
-            return obj.members.filter(
-                id=request.user.id,
-                agency_role='owner'
-            ).exists()
-        
-        # For user instances with agency relationship
-        if hasattr(obj, 'agency'):
-            return obj.agency.members.filter(
-                id=request.user.id,
-                agency_role='owner'
-            ).exists()
-        
-        return False
+        membership = get_agency_membership(request)
+        agency_id = get_object_agency_id(obj)
+        return (
+            agency_id is not None
+            and membership.agency_id == agency_id
+            and membership.agency_role == 'owner'
+        )
 
 
 class IsAgencyMember(permissions.BasePermission):
@@ -42,15 +64,8 @@ class IsAgencyMember(permissions.BasePermission):
     message = _('Only agency members can perform this action.')
 
     def has_object_permission(self, request, view, obj):
-        # For agency model instances
-        if hasattr(obj, 'members'):
-            return obj.members.filter(id=request.user.id).exists()
-        
-        # For user instances with agency relationship
-        if hasattr(obj, 'agency'):
-            return obj.agency.members.filter(id=request.user.id).exists()
-        
-        return False
+        agency_id = get_object_agency_id(obj)
+        return agency_id is not None and get_agency_membership(request).agency_id == agency_id
 
 
 class IsAdminOrAgencyOwner(permissions.BasePermission):
@@ -60,11 +75,12 @@ class IsAdminOrAgencyOwner(permissions.BasePermission):
     message = _('Only admin users or agency owners can perform this action.')
 
     def has_permission(self, request, view):
+        membership = get_agency_membership(request)
         return request.user.is_staff or (
-            request.user.role == 'agency' and 
-            request.user.agency_role == 'owner'
+            membership.agency_id is not None and
+            membership.agency_role == 'owner'
         )
-    
+
 class IsAgentOrAdmin(permissions.BasePermission):
     """
     Allow access to admin users or agents.
@@ -75,4 +91,16 @@ class IsAgentOrAdmin(permissions.BasePermission):
         return request.user.is_staff or request.user.role == 'agent'
 
     def has_object_permission(self, request, view, obj):
-        return request.user.is_staff or request.user.role == 'agent'
\ No newline at end of file
+        return request.user.is_staff or request.user.role == 'agent'
+
+
+class IsReviewerOrAdmin(permissions.BasePermission):
+    """
+    Allow read access to anyone and changes only to the review author or admins.
+    """
+    message = _('Only the review author or admin users can perform this action.')
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return request.user.is_staff or obj.reviewer_id == request.user.id
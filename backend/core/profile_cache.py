@@ -0,0 +1,104 @@
+# backend/core/profile_cache.py
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import User
+
+
+AGENT_PROFILE_CACHE_TIMEOUT = 60 * 60 * 6
+SESSION_PROFILE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def agent_profile_cache_key(user_id):
+    return f'agent_public_profile:v1:{user_id}'
+
+
+def get_agent_public_profiles(user_ids):
+    """
+    Returns rendered AgentPublicProfileSerializer data for the given ids, in
+    the same order. Cached profiles are served as-is; the misses are loaded
+    with one query plan (constant query count) and written back.
+    """
+    from .serializers import AgentPublicProfileSerializer
+
+    user_ids = list(user_ids)
+    keys = {user_id: agent_profile_cache_key(user_id) for user_id in user_ids}
+    cached = cache.get_many(keys.values())
+    profiles = {
+        user_id: cached[key] for user_id, key in keys.items() if key in cached
+    }
+
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        users = User.objects.get_public_agent_profiles().filter(pk__in=missing)
+        rendered = {}
+        for user in users:
+            data = AgentPublicProfileSerializer(user).data
+            profiles[user.pk] = data
+            rendered[keys[user.pk]] = data
+        cache.set_many(rendered, timeout=AGENT_PROFILE_CACHE_TIMEOUT)
+
+    return [profiles[user_id] for user_id in user_ids if user_id in profiles]
+
+
+def invalidate_agent_profiles(user_ids):
+    user_ids = list(user_ids)
+    if user_ids:
+        cache.delete_many([agent_profile_cache_key(user_id) for user_id in user_ids])
+
+
+def session_profile_cache_key(user_id):
+    return f'session_profile:v1:{user_id}'
+
+
+def get_session_profile(user):
+    """
+    Returns (data, etag) for the /users/me session profile of `user`.
+
+    The cached entry is tied to user.updated_at, so any save of the user row
+    renders it afresh; agency changes drop it through signals and .update()
+    writes through invalidate_user_profiles. Only a miss
+    touches the database (one agency lookup). Presence fields are overlaid
+    from `user` on every call and folded into the ETag.
+    """
+    from .serializers import SessionProfileSerializer
+
+    key = session_profile_cache_key(user.pk)
+    version = user.updated_at.isoformat()
+    entry = cache.get(key)
+    if entry is None or entry['version'] != version:
+        data = SessionProfileSerializer(user).data
+        # Tag the content, not the version: invalidated entries re-render under
+        # the same updated_at and must not answer an old If-None-Match with 304
+        content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+        entry = {
+            'version': version,
+            'tag': f"{user.pk}:{hashlib.md5(content.encode('utf-8')).hexdigest()}",
+            'data': data,
+        }
+        cache.set(key, entry, timeout=SESSION_PROFILE_CACHE_TIMEOUT)
+
+    volatile = SessionProfileSerializer().volatile_representation(user)
+    tag = ':'.join([entry['tag']] + [str(volatile[name]) for name in sorted(volatile)])
+    etag = '"%s"' % hashlib.md5(tag.encode('utf-8')).hexdigest()
+    return {**entry['data'], **volatile}, etag
+
+
+def invalidate_session_profiles(user_ids):
+    user_ids = list(user_ids)
+    if user_ids:
+        cache.delete_many([session_profile_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_user_profiles(user_ids):
+    """
+    Drops both cached profiles of the given users. For writes that bypass
+    save() (queryset.update, F() aggregates): they leave updated_at alone,
+    so the session profile would otherwise keep its version.
+    """
+    user_ids = list(user_ids)
+    invalidate_agent_profiles(user_ids)
+    invalidate_session_profiles(user_ids)
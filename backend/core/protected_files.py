@@ -0,0 +1,93 @@
+# backend/core/protected_files.py
+import base64
+import hashlib
+import mimetypes
+import time
+from urllib.parse import quote
+
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils.http import content_disposition_header
+from django.views.static import serve
+
+from .utils import get_app_setting
+
+
+PROTECTED_FILES_DEFAULTS = {
+    # How an authorised download is delivered:
+    #   'django'            - streamed by the Django worker (development)
+    #   'x-accel-redirect'  - nginx serves INTERNAL_LOCATION + name (internal location)
+    #   'x-sendfile'        - Apache mod_xsendfile / lighttpd serve the absolute path
+    #   'signed-url'        - redirect to SIGNED_LOCATION + name, checked by nginx secure_link
+    'MODE': 'django',
+    'INTERNAL_LOCATION': '/protected-media/',
+    'SIGNED_LOCATION': '/signed-media/',
+    'SIGNED_URL_SECRET': '',                 # Shared with nginx secure_link_md5; required for 'signed-url'
+    'SIGNED_URL_MAX_AGE': 300,
+    # Media directories never served from the public MEDIA_URL
+    'PRIVATE_PREFIXES': ['receipts/', 'licenses/', 'verifications/'],
+}
+
+
+def get_protected_files_setting(name):
+    return get_app_setting('PROTECTED_FILES', name, PROTECTED_FILES_DEFAULTS)
+
+
+def is_private(name):
+    return name.lstrip('/').startswith(tuple(get_protected_files_setting('PRIVATE_PREFIXES')))
+
+
+def signed_url(name, max_age=None):
+    """
+    Short-lived URL of a stored file in the format of nginx's secure_link
+    module: md5 over "<expires><uri> <secret>", base64url without padding.
+    nginx checks it and serves the file without calling Django.
+    """
+    secret = get_protected_files_setting('SIGNED_URL_SECRET')
+    if not secret:
+        raise ValueError("PROTECTED_FILES['SIGNED_URL_SECRET'] is required for signed URLs")
+    expires = int(time.time()) + (max_age or get_protected_files_setting('SIGNED_URL_MAX_AGE'))
+    uri = get_protected_files_setting('SIGNED_LOCATION') + name
+    # nginx hashes the decoded $uri, the link carries it percent-encoded
+    digest = hashlib.md5(f'{expires}{uri} {secret}'.encode()).digest()
+    token = base64.urlsafe_b64encode(digest).decode().rstrip('=')
+    return f'{quote(uri)}?md5={token}&expires={expires}'
+
+
+def protected_file_response(field_file, filename=None, as_attachment=True, content_type=None):
+    """
+    Response delivering a stored file the caller has already authorised.
+    Outside 'django' mode no bytes pass through the worker: the web server
+    is told which file to send (or the client is sent to a signed URL).
+    Raises Http404 when the file is missing.
+    """
+    name = field_file.name
+    if not name or not field_file.storage.exists(name):
+        raise Http404('File not found.')
+    filename = filename or name.rsplit('/', 1)[-1]
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    mode = get_protected_files_setting('MODE')
+
+    if mode == 'django':
+        return FileResponse(field_file.open('rb'), as_attachment=as_attachment, filename=filename, content_type=content_type)
+    if mode == 'signed-url':
+        response = HttpResponseRedirect(signed_url(name))
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = get_protected_files_setting('INTERNAL_LOCATION') + quote(name)
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = field_file.path
+    else:
+        raise ValueError(f"Unknown PROTECTED_FILES mode {mode!r}")
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def serve_public_media(request, path, document_root=None):
+    """Development MEDIA_URL view that refuses the private directories."""
+    if is_private(path):
+        raise Http404('File not found.')
+    return serve(request, path, document_root=document_root)
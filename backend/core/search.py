@@ -0,0 +1,129 @@
+# backend/core/search.py
+import math
+
+from django.db.models import Exists, OuterRef, F, Value, DecimalField, FloatField
+from django.db.models.functions import ASin, Coalesce, Cos, Power, Radians, Sin, Sqrt
+
+from .models import User, AgentSearchTerm
+
+
+EARTH_RADIUS_KM = 6371.0
+AGENT_ROLES = ['agent']
+
+
+def normalize_term(value):
+    return str(value).strip().lower()[:255]
+
+
+def _terms_from(values):
+    if not isinstance(values, list):
+        return set()
+    return {normalize_term(v) for v in values if isinstance(v, str) and v.strip()}
+
+
+def rebuild_agent_search_terms(user_ids):
+    """
+    Replaces the AgentSearchTerm rows of the given users with their current
+    languages and combined (agent + agency) service areas.
+    """
+    users = User.objects.filter(pk__in=user_ids).select_related('agency').only(
+        'id', 'role', 'languages', 'service_areas', 'agency__service_areas'
+    )
+    terms = []
+    for user in users:
+        if user.role not in AGENT_ROLES:
+            continue
+        service_areas = _terms_from(user.service_areas)
+        if user.agency:
+            service_areas |= _terms_from(user.agency.service_areas)
+        terms.extend(
+            AgentSearchTerm(user=user, term_type='language', value=value)
+            for value in _terms_from(user.languages)
+        )
+        terms.extend(
+            AgentSearchTerm(user=user, term_type='service_area', value=value)
+            for value in service_areas
+        )
+
+    AgentSearchTerm.objects.filter(user_id__in=user_ids).delete()
+    AgentSearchTerm.objects.bulk_create(terms, batch_size=500)
+
+
+def haversine_distance(latitude, longitude, lat_field='agency__latitude', lng_field='agency__longitude'):
+    """
+    Great-circle distance in km from (latitude, longitude) to the given
+    coordinate fields, as a database expression (works on SQLite and Postgres).
+    """
+    dlat = Radians(F(lat_field) - Value(latitude)) / 2
+    dlng = Radians(F(lng_field) - Value(longitude)) / 2
+    a = (
+        Power(Sin(dlat), 2)
+        + Cos(Radians(Value(latitude))) * Cos(Radians(F(lat_field))) * Power(Sin(dlng), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Coarse lat/lng box around a point so the indexed columns prune before the distance math."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    return latitude - dlat, latitude + dlat, longitude - dlng, longitude + dlng
+
+
+def _has_term(term_type, value):
+    return Exists(AgentSearchTerm.objects.filter(
+        user=OuterRef('pk'), term_type=term_type, value=normalize_term(value)
+    ))
+
+
+def search_agents(params):
+    """
+    Builds the agent search queryset from validated AgentSearchParamsSerializer
+    data. Returns (queryset, keyset_ordering) where keyset_ordering is the
+    (field, descending) pair the results are ranked by.
+    """
+    queryset = User.objects.filter(role__in=AGENT_ROLES, is_active=True).select_related('agency')
+
+    if params.get('agency') is not None:
+        queryset = queryset.filter(agency_id=params['agency'])
+    if params.get('min_rating') is not None:
+        queryset = queryset.filter(rating__gte=params['min_rating'])
+    if params.get('min_experience') is not None:
+        queryset = queryset.filter(years_of_experience__gte=params['min_experience'])
+    if params.get('specialization') is not None:
+        queryset = queryset.filter(Exists(
+            User.specializations.through.objects.filter(
+                user_id=OuterRef('pk'), specialization_id=params['specialization']
+            )
+        ))
+    if params.get('language'):
+        queryset = queryset.filter(_has_term('language', params['language']))
+    if params.get('service_area'):
+        queryset = queryset.filter(_has_term('service_area', params['service_area']))
+
+    latitude = params.get('latitude')
+    longitude = params.get('longitude')
+    if latitude is not None and longitude is not None:
+        queryset = queryset.filter(
+            agency__latitude__isnull=False, agency__longitude__isnull=False
+        )
+        radius = params.get('radius')
+        if radius:
+            min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius)
+            queryset = queryset.filter(
+                agency__latitude__range=(min_lat, max_lat),
+                agency__longitude__range=(min_lng, max_lng),
+            )
+        queryset = queryset.annotate(
+            distance=haversine_distance(latitude, longitude)
+        )
+        if radius:
+            queryset = queryset.filter(distance__lte=radius)
+        return queryset, ('distance', False)
+
+    queryset = queryset.annotate(
+        distance=Value(None, output_field=FloatField()),
+        rank_rating=Coalesce('rating', Value(0), output_field=DecimalField(max_digits=3, decimal_places=2)),
+    )
+    return queryset, ('rank_rating', True)
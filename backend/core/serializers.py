@@ -1,23 +1,35 @@
+from decimal import Decimal
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.contrib.auth.password_validation import validate_password
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from .models import (
     User, Agency, UserActivityLog, 
-    License, Specialization, AgentProfile, UserDevice, UserFavorite
+    License, Specialization, AgentProfile, UserDevice, UserFavorite, AgentReview
 )
 
 
 class LicenseSerializer(serializers.ModelSerializer):
+    # License documents are private media, downloaded through the API
+    document_url = serializers.SerializerMethodField()
+
     class Meta:
         model = License
         fields = [
             'id', 'number', 'type', 'state', 'expiry_date',
-            'verified', 'verified_at', 'document'
+            'verified', 'verified_at', 'document', 'document_url'
         ]
         read_only_fields = ['verified', 'verified_at']
+        extra_kwargs = {'document': {'write_only': True}}
+
+    def get_document_url(self, obj):
+        request = self.context.get('request')
+        if not obj.document or request is None:
+            return None
+        return request.build_absolute_uri(reverse('license-document', args=[obj.pk]))
 
 
 class LicenseCreateSerializer(serializers.ModelSerializer):
@@ -143,7 +155,6 @@ class UserSerializer(serializers.ModelSerializer):
     licenses = LicenseSerializer(many=True, read_only=True)
     specializations = SpecializationSerializer(many=True, read_only=True)
     agent_profile = AgentProfileSerializer(read_only=True)
-    devices = UserDeviceSerializer(many=True, read_only=True)
     password = serializers.CharField(
         write_only=True,
         required=False,
@@ -177,7 +188,7 @@ class UserSerializer(serializers.ModelSerializer):
             'years_of_experience', 'languages', 'service_areas', 'rating',
             'reviews_count', 'facebook_url', 'linkedin_url', 'twitter_url',
             'instagram_url', 'licenses', 'specializations', 'agent_profile',
-            'devices', 'created_at', 'updated_at', 'agency_verified',
+            'created_at', 'updated_at', 'agency_verified',
             'average_response_time', 'is_online',
             'verification_documents', 'last_login', 'last_activity', 'last_seen'
         ]
@@ -259,6 +270,48 @@ class UserSerializer(serializers.ModelSerializer):
         return instance
 
 
+class SessionAgencySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Agency
+        fields = ['id', 'name', 'logo', 'verified', 'updated_at']
+
+
+class SessionProfileSerializer(serializers.ModelSerializer):
+    """
+    Compact profile for /users/me: the user row plus a slim agency, without
+    licenses, specializations, agent profile or devices (served by their own
+    endpoints), so it can be cached per user version.
+    """
+    agency = SessionAgencySerializer(read_only=True)
+    full_name = serializers.CharField(read_only=True)
+
+    # Presence fields move without bumping updated_at; they are read from the
+    # request user instead of the cached copy.
+    VOLATILE_FIELDS = ('is_online', 'last_login', 'last_activity', 'last_seen')
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'email', 'first_name', 'last_name', 'full_name', 'role',
+            'phone_number', 'alternate_phone', 'is_active', 'date_of_birth',
+            'profile_picture', 'cover_photo', 'bio', 'gender', 'email_verified',
+            'phone_verified', 'tfa_enabled', 'is_staff', 'notification_preferences',
+            'communication_preferences', 'agency', 'agency_role', 'agency_verified',
+            'years_of_experience', 'languages', 'service_areas', 'rating',
+            'reviews_count', 'average_response_time', 'facebook_url', 'linkedin_url',
+            'twitter_url', 'instagram_url', 'created_at', 'updated_at',
+            'is_online', 'last_login', 'last_activity', 'last_seen',
+        ]
+        read_only_fields = fields
+
+    def volatile_representation(self, instance):
+        fields = self.fields
+        return {
+            name: fields[name].to_representation(value) if value is not None else None
+            for name, value in ((name, getattr(instance, name)) for name in self.VOLATILE_FIELDS)
+        }
+
+
 class AgentPublicProfileSerializer(serializers.ModelSerializer):
     agency = AgencySerializer(read_only=True)
     licenses = LicenseSerializer(many=True, read_only=True)
@@ -298,6 +351,30 @@ class AgentSearchSerializer(serializers.ModelSerializer):
         ]
 
 
+class AgentSearchParamsSerializer(serializers.Serializer):
+    """Validates the query string of the agent search endpoints."""
+    specialization = serializers.IntegerField(required=False, min_value=1)
+    language = serializers.CharField(required=False, max_length=255)
+    service_area = serializers.CharField(required=False, max_length=255)
+    min_rating = serializers.DecimalField(required=False, max_digits=3, decimal_places=2, min_value=Decimal('0'))
+    min_experience = serializers.IntegerField(required=False, min_value=0)
+    agency = serializers.IntegerField(required=False, min_value=1)
+    latitude = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    radius = serializers.FloatField(required=False, min_value=0.1, max_value=1000)
+
+    def validate(self, data):
+        if ('latitude' in data) != ('longitude' in data):
+            raise serializers.ValidationError(
+                _("Both latitude and longitude are required for distance search.")
+            )
+        if 'radius' in data and 'latitude' not in data:
+            raise serializers.ValidationError(
+                {'radius': _("A radius requires latitude and longitude.")}
+            )
+        return data
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
         write_only=True,
@@ -476,4 +553,33 @@ class UserFavoriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 _("Cannot favorite both property and agent in the same record.")
             )
-        return data
\ No newline at end of file
+        return data
+
+
+class AgentReviewSerializer(serializers.ModelSerializer):
+    reviewer_name = serializers.CharField(source='reviewer.full_name', read_only=True)
+
+    class Meta:
+        model = AgentReview
+        fields = [
+            'id', 'agent', 'reviewer', 'reviewer_name', 'rating',
+            'comment', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['reviewer', 'created_at', 'updated_at']
+
+    def validate_agent(self, value):
+        if self.instance and value != self.instance.agent:
+            raise serializers.ValidationError(_("The reviewed agent cannot be changed."))
+        if value.role != 'agent':
+            raise serializers.ValidationError(_("Only agents can be reviewed."))
+        return value
+
+    def validate(self, data):
+        request = self.context.get('request')
+        agent = data.get('agent')
+        if self.instance is None and request and agent:
+            if agent == request.user:
+                raise serializers.ValidationError(_("You cannot review yourself."))
+            if AgentReview.objects.filter(agent=agent, reviewer=request.user).exists():
+                raise serializers.ValidationError(_("You have already reviewed this agent."))
+        return data
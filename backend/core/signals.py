@@ -1,7 +1,9 @@
-from django.db.models.signals import pre_save, post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import User, UserActivityLog
+from .models import User, Agency, UserActivityLog, AgentProfile, AgentSearchTerm, License, Specialization
+from .profile_cache import invalidate_agent_profiles, invalidate_session_profiles
 
 @receiver(pre_save, sender=User)
 def update_last_activity(sender, instance, **kwargs):
@@ -19,4 +21,104 @@ def create_activity_log(sender, instance, created, **kwargs):
         UserActivityLog.objects.create(
             user=instance,
             action="Account Created"
-        )
\ No newline at end of file
+        )
+
+AGENT_SEARCH_USER_FIELDS = {'languages', 'service_areas', 'agency', 'role'}
+
+
+@receiver(post_save, sender=User)
+def refresh_agent_search_terms(sender, instance, created, update_fields=None, **kwargs):
+    from .search import AGENT_ROLES, rebuild_agent_search_terms
+
+    if update_fields is not None and not AGENT_SEARCH_USER_FIELDS.intersection(update_fields):
+        return
+    if instance.role not in AGENT_ROLES:
+        # Only a former agent can have terms left over to drop
+        if not created and (update_fields is None or 'role' in update_fields):
+            AgentSearchTerm.objects.filter(user=instance).delete()
+        return
+    rebuild_agent_search_terms([instance.pk])
+
+
+@receiver(post_save, sender=Agency)
+def refresh_agency_agent_search_terms(sender, instance, created, update_fields=None, **kwargs):
+    from .search import rebuild_agent_search_terms
+
+    if created or (update_fields is not None and 'service_areas' not in update_fields):
+        return
+    member_ids = list(instance.members.values_list('pk', flat=True))
+    if member_ids:
+        rebuild_agent_search_terms(member_ids)
+
+
+# Fields that never appear in a public agent profile; saves that only touch
+# these keep the cached profile.
+PROFILE_IRRELEVANT_USER_FIELDS = {
+    'last_login', 'last_activity', 'is_online', 'last_seen',
+    'failed_login_attempts', 'account_locked_until', 'password',
+}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_profile_cache(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= PROFILE_IRRELEVANT_USER_FIELDS:
+        return
+    invalidate_agent_profiles([instance.pk])
+
+
+@receiver(post_save, sender=AgentProfile)
+@receiver(post_delete, sender=AgentProfile)
+def invalidate_agent_profile_cache(sender, instance, **kwargs):
+    invalidate_agent_profiles([instance.user_id])
+
+
+@receiver(post_save, sender=Agency)
+def invalidate_agency_member_profiles(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_agent_profiles(instance.members.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Agency)
+@receiver(pre_delete, sender=Agency)
+def invalidate_agency_member_session_profiles(sender, instance, created=False, **kwargs):
+    # Session profiles are keyed on the member's own updated_at, which agency
+    # edits (and the SET_NULL on delete) do not bump
+    if not created:
+        invalidate_session_profiles(instance.members.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=License)
+def invalidate_license_holder_profiles(sender, instance, **kwargs):
+    invalidate_agent_profiles(User.objects.filter(licenses=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Specialization)
+def invalidate_specialist_profiles(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_agent_profiles(User.objects.filter(specializations=instance).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=License)
+@receiver(pre_delete, sender=Specialization)
+def invalidate_holder_profiles_on_delete(sender, instance, **kwargs):
+    # The through rows are gone by post_delete; collect the holders first and
+    # drop their profiles once the delete is committed
+    related = 'licenses' if sender is License else 'specializations'
+    user_ids = list(User.objects.filter(**{related: instance}).values_list('pk', flat=True))
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_agent_profiles(user_ids))
+
+
+@receiver(m2m_changed, sender=User.licenses.through)
+@receiver(m2m_changed, sender=User.specializations.through)
+def invalidate_profiles_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_agent_profiles([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_agent_profiles(pk_set)
+    elif action == 'pre_clear':
+        # clear() from the license/specialization side has no pk_set; collect the holders first
+        related = 'licenses' if sender is User.licenses.through else 'specializations'
+        invalidate_agent_profiles(User.objects.filter(**{related: instance}).values_list('pk', flat=True))
@@ -77,6 +77,86 @@ def send_verification_email_task(user_id, verification_url):
         logger.error(f"Error in send_verification_email_task for user_id {user_id}: {e}", exc_info=True)
         raise
 
+@shared_task(name="sync_login_lockouts_task")
+def sync_login_lockouts_task():
+    """
+    Periodic task that mirrors the cache-side login guard state onto
+    User.failed_login_attempts / User.account_locked_until in one bulk update.
+    """
+    from django.db.models.functions import Lower
+    from .throttling import pop_pending_login_states
+
+    states = pop_pending_login_states()
+    if not states:
+        return "No pending login states to sync."
+
+    # The guard keys on lowercased emails; stored addresses keep their case
+    users = list(
+        User.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=states.keys())
+        .only('id', 'email', 'failed_login_attempts', 'account_locked_until')
+    )
+    for user in users:
+        user.failed_login_attempts, user.account_locked_until = states[user.email_lower]
+
+    User.objects.bulk_update(
+        users, ['failed_login_attempts', 'account_locked_until'], batch_size=500
+    )
+    logger.info(f"Synced login guard state for {len(users)} users.")
+    return f"Synced login guard state for {len(users)} users."
+
+@shared_task(name="reconcile_agent_ratings_task")
+def reconcile_agent_ratings_task():
+    """
+    Periodic task that recomputes rating_sum / reviews_count / rating for every
+    rated agent from the AgentReview table plus the legacy baseline in one
+    UPDATE, correcting any drift in the incrementally maintained aggregates.
+    Agents whose reviews were all deleted fall back to the baseline alone.
+    """
+    from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+    from django.db.models.functions import Cast, Coalesce, Round
+    from django.db.models.lookups import GreaterThan
+    from .models import AgentReview
+    from .profile_cache import invalidate_user_profiles
+
+    per_agent = AgentReview.objects.filter(agent=OuterRef('pk')).order_by().values('agent')
+    reviewed_sum = Coalesce(
+        Subquery(per_agent.annotate(total=Sum('rating')).values('total')), Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+    reviewed_count = Coalesce(Subquery(per_agent.annotate(count=Count('pk')).values('count')), Value(0))
+    new_sum = F('legacy_rating_sum') + reviewed_sum
+    new_count = F('legacy_reviews_count') + reviewed_count
+    # Float division: SQLite would otherwise divide the NUMERIC sum as integers
+    average = ExpressionWrapper(
+        Round(Cast(new_sum, FloatField()) / new_count, 2), output_field=DecimalField(max_digits=3, decimal_places=2)
+    )
+    rated = User.objects.filter(
+        Q(pk__in=AgentReview.objects.values('agent')) | Q(reviews_count__gt=0) | Q(rating__isnull=False)
+        | Q(legacy_reviews_count__gt=0)
+    )
+    agent_ids = list(rated.values_list('pk', flat=True))
+    updated = User.objects.filter(pk__in=agent_ids).update(
+        rating_sum=new_sum,
+        reviews_count=new_count,
+        rating=Case(When(GreaterThan(new_count, 0), then=average), default=None),
+    )
+    invalidate_user_profiles(agent_ids)
+    logger.info(f"Reconciled ratings for {updated} agents.")
+    return f"Reconciled ratings for {updated} agents."
+
+@shared_task(name="collect_orphan_media_task")
+def collect_orphan_media_task():
+    """
+    Periodic task that deletes content-addressed media files no longer
+    referenced by any row, after recounting their references.
+    """
+    from .media_store import collect_orphan_blobs
+
+    deleted, repaired = collect_orphan_blobs()
+    logger.info(f"Collected {deleted} orphaned media files ({repaired} reference counts repaired).")
+    return f"Collected {deleted} orphaned media files ({repaired} reference counts repaired)."
+
 # You can add other tasks here, e.g., for image processing:
 # @shared_task(name="process_property_image_task")
 # def process_property_image_task(image_id):
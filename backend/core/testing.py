@@ -0,0 +1,32 @@
+# backend/core/testing.py
+import tempfile
+
+from django.test import override_settings
+
+
+def enter_context(test_case, manager):
+    """
+    Enters a context manager for the rest of a test, exiting it on cleanup.
+    TestCase.enterContext only exists from Python 3.11.
+    """
+    value = manager.__enter__()
+    test_case.addCleanup(manager.__exit__, None, None, None)
+    return value
+
+
+class TemporaryMediaMixin:
+    """
+    Test case mixin running each test against an empty MEDIA_ROOT in a
+    temporary directory that is removed afterwards. temporary_directory()
+    makes further scratch directories (upload parts, render caches).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = self.temporary_directory()
+        enter_context(self, override_settings(MEDIA_ROOT=self.media_root))
+
+    def temporary_directory(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return directory.name
@@ -1,3 +1,529 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import logging
+import os
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import Http404
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import User, Agency, License, Specialization, AgentReview, AgentSearchTerm, UserDevice
+from core.permissions import IsAgencyOwner, IsAgencyMember
+from core.serializers import AgentReviewSerializer
+from core.logging_utils import LazyContext, ContextFilter, SamplingFilter, NonBlockingStreamHandler, redact
+from core.protected_files import serve_public_media
+from core.views import AgentReviewViewSet
+from core.tasks import sync_login_lockouts_task, reconcile_agent_ratings_task
+from core.testing import TemporaryMediaMixin
+from core.utils import get_app_setting
+
+
+@override_settings(LOGIN_GUARD={'MAX_FAILURES_PER_EMAIL': 3, 'MAX_ATTEMPTS_PER_IP': 10})
+class LoginGuardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='guard@example.com',
+            first_name='Guard',
+            last_name='Test',
+            password='S3cure-pass-123'
+        )
+        self.url = reverse('token_obtain_pair')
+
+    def _login(self, password, email='guard@example.com'):
+        return self.client.post(self.url, {'email': email, 'password': password}, format='json')
+
+    def test_account_locks_after_repeated_failures(self):
+        for _ in range(3):
+            self.assertEqual(self._login('wrong-password').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Even the right password is rejected while the account is locked
+        response = self._login('S3cure-pass-123')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_ip_limit_rejects_before_authentication(self):
+        for i in range(10):
+            self._login('wrong-password', email=f'nobody{i}@example.com')
+
+        response = self._login('S3cure-pass-123')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_spoofed_forwarded_for_does_not_reset_ip_limit(self):
+        # nginx appends the real peer (10.0.0.9) to whatever the client sent
+        for i in range(10):
+            self.client.post(
+                self.url, {'email': f'nobody{i}@example.com', 'password': 'wrong-password'}, format='json',
+                HTTP_X_FORWARDED_FOR=f'203.0.113.{i}, 10.0.0.9'
+            )
+
+        response = self.client.post(
+            self.url, {'email': 'guard@example.com', 'password': 'S3cure-pass-123'}, format='json',
+            HTTP_X_FORWARDED_FOR='198.51.100.77, 10.0.0.9'
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        for i in range(10):
+            self.client.post(
+                self.url, {'email': f'nobody{i}@example.com', 'password': 'wrong-password'}, format='json',
+                HTTP_X_FORWARDED_FOR=f'203.0.113.{i}'
+            )
+        self.assertEqual(self._login('S3cure-pass-123').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_successful_login_resets_counters(self):
+        self._login('wrong-password')
+        self._login('wrong-password')
+        self.assertEqual(self._login('S3cure-pass-123').status_code, status.HTTP_200_OK)
+        self.assertEqual(self._login('wrong-password').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._login('S3cure-pass-123').status_code, status.HTTP_200_OK)
+
+    def test_lockout_state_is_synced_to_user(self):
+        for _ in range(3):
+            self._login('wrong-password')
+
+        sync_login_lockouts_task()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 3)
+        self.assertIsNotNone(self.user.account_locked_until)
+
+    def test_lockout_sync_matches_mixed_case_emails(self):
+        # Accounts created before emails were lowercased on save
+        User.objects.filter(pk=self.user.pk).update(email='Guard@Example.com')
+        for _ in range(3):
+            self._login('wrong-password')
+
+        sync_login_lockouts_task()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 3)
+        self.assertIsNotNone(self.user.account_locked_until)
+
+
+class AgentSearchTests(APITestCase):
+    def setUp(self):
+        near = Agency.objects.create(name='Near Realty', latitude=-20.07, longitude=30.83, service_areas=['Masvingo'])
+        far = Agency.objects.create(name='Far Realty', latitude=-17.83, longitude=31.05)
+        self.sales = Specialization.objects.create(name='Sales')
+
+        self.near_agent = User.objects.create_agent(
+            'near@example.com', 'Near', 'Agent', 'S3cure-pass-123', agency=near, languages=['Shona', 'English'], rating='4.50'
+        )
+        self.near_agent.specializations.add(self.sales)
+        self.far_agent = User.objects.create_agent(
+            'far@example.com', 'Far', 'Agent', 'S3cure-pass-123', agency=far, languages=['English'], rating='4.90'
+        )
+        self.viewer = User.objects.create_customer('viewer@example.com', 'View', 'Er', 'S3cure-pass-123')
+        self.client.force_authenticate(self.viewer)
+        self.url = reverse('agent-search')
+
+    def test_ranks_by_distance_from_point(self):
+        response = self.client.get(self.url, {'latitude': -20.06, 'longitude': 30.82})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(ids, [self.near_agent.id, self.far_agent.id])
+        self.assertLess(float(response.data['results'][0]['distance']), float(response.data['results'][1]['distance']))
+
+    def test_filters_by_language_service_area_and_specialization(self):
+        for params in ({'language': 'shona'}, {'service_area': 'masvingo'}, {'specialization': self.sales.id}):
+            response = self.client.get(self.url, params)
+            self.assertEqual([row['id'] for row in response.data['results']], [self.near_agent.id], params)
+
+    def test_only_agents_keep_search_terms(self):
+        self.viewer.languages = ['Shona']
+        self.viewer.save()
+        self.assertFalse(AgentSearchTerm.objects.filter(user=self.viewer).exists())
+
+        self.far_agent.role = 'customer'
+        self.far_agent.save(update_fields=['role'])
+        self.assertFalse(AgentSearchTerm.objects.filter(user=self.far_agent).exists())
+        self.assertTrue(AgentSearchTerm.objects.filter(user=self.near_agent).exists())
+
+    def test_keyset_pagination_walks_all_agents(self):
+        response = self.client.get(self.url, {'page_size': 1})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.far_agent.id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [self.near_agent.id])
+        self.assertIsNone(response.data['next'])
+
+
+class AgentProfileDirectoryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        agency = Agency.objects.create(name='Directory Realty')
+        specialization = Specialization.objects.create(name='Rentals')
+        for i in range(4):
+            agent = User.objects.create_agent(
+                f'agent{i}@example.com', 'Agent', f'Number{i}', 'S3cure-pass-123', agency=agency
+            )
+            agent.specializations.add(specialization)
+        self.agency = agency
+        self.client.force_authenticate(User.objects.get(email='agent0@example.com'))
+        self.url = reverse('agent-public-profiles')
+
+    def test_page_is_loaded_in_constant_queries_then_cached(self):
+        # page query + user/agency/profile + licenses + specializations
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 4)
+
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_profile_change_invalidates_cached_profile(self):
+        self.client.get(self.url)
+        agent = User.objects.get(email='agent1@example.com')
+        agent.bio = 'Updated bio'
+        agent.save()
+
+        response = self.client.get(self.url)
+        bios = {row['id']: row['bio'] for row in response.data['results']}
+        self.assertEqual(bios[agent.id], 'Updated bio')
+
+    def test_deleting_a_license_or_specialization_invalidates_holders(self):
+        agent = User.objects.get(email='agent1@example.com')
+        license = License.objects.create(number='ZW-1001', type='sales', state='Harare', expiry_date='2030-01-01')
+        agent.licenses.add(license)
+        response = self.client.get(self.url)
+        rows = {row['id']: row for row in response.data['results']}
+        self.assertEqual(len(rows[agent.id]['licenses']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            license.delete()
+            Specialization.objects.get(name='Rentals').delete()
+
+        response = self.client.get(self.url)
+        rows = {row['id']: row for row in response.data['results']}
+        self.assertEqual((rows[agent.id]['licenses'], rows[agent.id]['specializations']), ([], []))
+
+
+class AgencyDirectoryTests(APITestCase):
+    def setUp(self):
+        first = Agency.objects.create(name='Alpha Homes')
+        Agency.objects.create(name='Beta Homes')
+        User.objects.create_agent('a1@example.com', 'A', 'One', 'S3cure-pass-123', agency=first)
+        User.objects.create_agent('a2@example.com', 'A', 'Two', 'S3cure-pass-123', agency=first, is_active=False)
+        self.client.force_authenticate(User.objects.create_customer('c@example.com', 'C', 'Ustomer', 'S3cure-pass-123'))
+
+    def test_list_annotates_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('agency-list'), {'page_size': 1})
+        row = response.data['results'][0]
+        self.assertEqual(row['name'], 'Alpha Homes')
+        self.assertEqual(row['member_count'], 2)
+        self.assertEqual(row['active_agents_count'], 1)
+        self.assertIsNotNone(response.data['next'])
+
+
+class AgencyPermissionTests(APITestCase):
+    def setUp(self):
+        self.agency = Agency.objects.create(name='Owned Realty')
+        self.owner = User.objects.create_agent(
+            'owner@example.com', 'O', 'Wner', 'S3cure-pass-123', agency=self.agency, agency_role='owner'
+        )
+        self.agent = User.objects.create_agent(
+            'member@example.com', 'M', 'Ember', 'S3cure-pass-123', agency=self.agency, agency_role='agent'
+        )
+        self.outsider = User.objects.create_agent('out@example.com', 'O', 'Utsider', 'S3cure-pass-123')
+
+    def _request(self, user):
+        return type('Request', (), {'user': User.objects.get(pk=user.pk)})()
+
+    def test_checks_answer_from_memory(self):
+        owner_request = self._request(self.owner)
+        outsider_request = self._request(self.outsider)
+        agent = User.objects.get(pk=self.agent.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsAgencyOwner().has_object_permission(owner_request, None, self.agency))
+            self.assertTrue(IsAgencyOwner().has_object_permission(owner_request, None, agent))
+            self.assertTrue(IsAgencyMember().has_object_permission(owner_request, None, agent))
+            self.assertFalse(IsAgencyOwner().has_object_permission(outsider_request, None, self.agency))
+            self.assertFalse(IsAgencyMember().has_object_permission(outsider_request, None, agent))
+
+    def test_member_is_not_owner(self):
+        request = self._request(self.agent)
+        self.assertTrue(IsAgencyMember().has_object_permission(request, None, self.agency))
+        self.assertFalse(IsAgencyOwner().has_object_permission(request, None, self.agency))
+
+
+class AgentReviewTests(APITestCase):
+    def setUp(self):
+        self.agent = User.objects.create_agent('rated@example.com', 'Rated', 'Agent', 'S3cure-pass-123')
+        self.alice = User.objects.create_customer('alice@example.com', 'Alice', 'A', 'S3cure-pass-123')
+        self.bob = User.objects.create_customer('bob@example.com', 'Bob', 'B', 'S3cure-pass-123')
+        self.url = reverse('review-list')
+
+    def _review(self, user, rating):
+        self.client.force_authenticate(user)
+        return self.client.post(self.url, {'agent': self.agent.id, 'rating': rating}, format='json')
+
+    def test_reviews_update_aggregates(self):
+        self.assertEqual(self._review(self.alice, 5).status_code, status.HTTP_201_CREATED)
+        response = self._review(self.bob, 4)
+        self.agent.refresh_from_db()
+        self.assertEqual((self.agent.reviews_count, str(self.agent.rating)), (2, '4.50'))
+
+        self.client.patch(reverse('review-detail', args=[response.data['id']]), {'rating': 2}, format='json')
+        self.agent.refresh_from_db()
+        self.assertEqual(str(self.agent.rating), '3.50')
+
+        self.client.delete(reverse('review-detail', args=[response.data['id']]))
+        self.agent.refresh_from_db()
+        self.assertEqual((self.agent.reviews_count, str(self.agent.rating)), (1, '5.00'))
+
+    def test_duplicate_and_self_reviews_are_rejected(self):
+        self._review(self.alice, 5)
+        self.assertEqual(self._review(self.alice, 1).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._review(self.agent, 5).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reconciliation_recomputes_from_reviews(self):
+        AgentReview.objects.create(agent=self.agent, reviewer=self.alice, rating=3)
+        AgentReview.objects.create(agent=self.agent, reviewer=self.bob, rating=4)
+        User.objects.filter(pk=self.agent.pk).update(rating='1.00', reviews_count=9)
+
+        reconcile_agent_ratings_task()
+
+        self.agent.refresh_from_db()
+        self.assertEqual((self.agent.reviews_count, str(self.agent.rating)), (2, '3.50'))
+
+    def test_concurrent_duplicate_review_is_rejected(self):
+        self._review(self.alice, 5)
+        # The other request passed validation before this one's row existed
+        with mock.patch.object(AgentReviewSerializer, 'validate', lambda serializer, data: data):
+            self.assertEqual(self._review(self.alice, 1).status_code, status.HTTP_400_BAD_REQUEST)
+        self.agent.refresh_from_db()
+        self.assertEqual((self.agent.reviews_count, str(self.agent.rating)), (1, '5.00'))
+
+    def test_reconciliation_keeps_legacy_ratings(self):
+        User.objects.filter(pk=self.agent.pk).update(legacy_rating_sum=8, legacy_reviews_count=2)
+        AgentReview.objects.create(agent=self.agent, reviewer=self.alice, rating=5)
+
+        reconcile_agent_ratings_task()
+
+        self.agent.refresh_from_db()
+        self.assertEqual((self.agent.reviews_count, str(self.agent.rating)), (3, '4.33'))
+
+    def test_concurrent_delete_is_applied_once(self):
+        self._review(self.alice, 5)
+        self._review(self.bob, 3)
+        stale = AgentReview.objects.get(reviewer=self.bob)
+        # The other request deleted the review after this one loaded it
+        self.client.delete(reverse('review-detail', args=[stale.pk]))
+        AgentReviewViewSet().perform_destroy(stale)
+
+        self.agent.refresh_from_db()
+        self.assertEqual((self.agent.reviews_count, str(self.agent.rating)), (1, '5.00'))
+
+    def test_list_pages_past_the_first_page(self):
+        carol = User.objects.create_customer('carol@example.com', 'Carol', 'C', 'S3cure-pass-123')
+        for user, rating in ((self.alice, 5), (self.bob, 4), (carol, 3)):
+            AgentReview.objects.create(agent=self.agent, reviewer=user, rating=rating)
+
+        first = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        second = self.client.get(first.data['next'])
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertIsNone(second.data['next'])
+
+        ids = [row['id'] for row in first.data['results'] + second.data['results']]
+        self.assertEqual(sorted(ids), sorted(AgentReview.objects.values_list('id', flat=True)))
+
+    def test_reconciliation_resets_agents_without_reviews(self):
+        User.objects.filter(pk=self.agent.pk).update(rating='4.00', rating_sum=8, reviews_count=2)
+
+        reconcile_agent_ratings_task()
+
+        self.agent.refresh_from_db()
+        self.assertEqual((self.agent.reviews_count, self.agent.rating_sum, self.agent.rating), (0, 0, None))
+
+
+class AppSettingTests(APITestCase):
+    DEFAULTS = {'TIMEOUT': 60, 'LIMITS': {'image': 10, 'video': 20}}
+
+    @override_settings(EXAMPLE_GROUP={'LIMITS': {'image': 5}})
+    def test_unset_keys_and_dict_entries_fall_back_to_defaults(self):
+        self.assertEqual(get_app_setting('EXAMPLE_GROUP', 'TIMEOUT', self.DEFAULTS), 60)
+        self.assertEqual(get_app_setting('EXAMPLE_GROUP', 'LIMITS', self.DEFAULTS), {'image': 5, 'video': 20})
+        self.assertEqual(get_app_setting('MISSING_GROUP', 'LIMITS', self.DEFAULTS), self.DEFAULTS['LIMITS'])
+
+
+class LoggingUtilsTests(APITestCase):
+    def _record(self, level=logging.INFO, **extra):
+        record = logging.LogRecord('core.views', level, __file__, 1, 'message', None, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_context_is_built_only_when_emitted_and_redacted(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {'password': 'hunter2', 'path': '/api/users/me/'}
+
+        record = self._record(context=LazyContext(build), sampled=True)
+        self.assertFalse(SamplingFilter(rate=0).filter(record))
+        self.assertEqual(calls, [])
+
+        self.assertTrue(ContextFilter().filter(record))
+        self.assertEqual(record.context, {'password': '***', 'path': '/api/users/me/'})
+
+    def test_sampling_never_drops_warnings(self):
+        self.assertTrue(SamplingFilter(rate=0).filter(self._record(logging.WARNING, sampled=True)))
+        self.assertEqual(redact({'refresh': 'x', 'email': 'a@b.c'}), {'refresh': '***', 'email': 'a@b.c'})
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork()')
+    def test_forked_child_restarts_the_listener(self):
+        stream = io.StringIO()
+        handler = NonBlockingStreamHandler(stream)
+        self.addCleanup(handler.close)
+
+        pid = os.fork()
+        if pid == 0:
+            handler.handle(self._record())
+            handler.listener.stop()
+            os._exit(0 if stream.getvalue() == 'message\n' else 1)
+        _, status_code = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status_code), 0)
+
+
+class SessionProfileTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.agency = Agency.objects.create(name='Session Realty')
+        self.user = User.objects.create_agent(
+            'session@example.com', 'Session', 'User', 'S3cure-pass-123', agency=self.agency
+        )
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        self.url = reverse('user-me')
+
+    def test_repeat_calls_are_cached_and_conditional(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['agency']['name'], 'Session Realty')
+        self.assertNotIn('devices', response.data)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_profile_and_agency_changes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.client.patch(self.url, {'bio': 'New bio'}, format='json')
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['bio'], 'New bio')
+
+        etag = response['ETag']
+        self.agency.name = 'Renamed Realty'
+        self.agency.save()
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['agency']['name'], 'Renamed Realty')
+
+    def test_bulk_updates_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        reviewer = User.objects.create_customer('reviewer@example.com', 'Re', 'Viewer', 'S3cure-pass-123')
+        self.client.force_authenticate(reviewer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('review-list'), {'agent': self.user.id, 'rating': 4}, format='json')
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reviews_count'], 1)
+
+        etag = response['ETag']
+        self.client.force_authenticate(User.objects.create_superuser('root@example.com', 'Root', 'Admin', 'S3cure-pass-123'))
+        self.client.post(reverse('agency-verify', args=[self.agency.pk]))
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['agency_verified'])
+
+
+@override_settings(DEVICE_REGISTRY={'TOUCH_INTERVAL_SECONDS': 300, 'MAX_DEVICES_PER_USER': 2})
+class DeviceRegistryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_customer('devices@example.com', 'Dev', 'Ices', 'S3cure-pass-123')
+
+    def _login(self, user_agent):
+        return self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': 'devices@example.com', 'password': 'S3cure-pass-123'},
+            format='json', HTTP_USER_AGENT=user_agent
+        )
+
+    def test_logins_upsert_one_device_per_fingerprint(self):
+        chrome = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36'
+        self._login(chrome)
+        cache.clear()
+        self._login(chrome)
+
+        device = UserDevice.objects.get(user=self.user)
+        self.assertEqual((device.browser, device.os, device.device_type), ('Chrome', 'Windows', 'desktop'))
+
+    def test_history_is_capped_and_listed_newest_first(self):
+        for version in range(3):
+            self._login(f'Mozilla/5.0 (iPhone) Mobile Safari/{version}')
+        self.assertEqual(UserDevice.objects.filter(user=self.user).count(), 2)
+
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-my-devices'))
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['device_type'], 'mobile')
+
+
+class ProtectedFileTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.user = User.objects.create_customer('verify@example.com', 'Ver', 'Ify', 'S3cure-pass-123')
+        self.user.verification_documents = SimpleUploadedFile('identité.pdf', b'%PDF-1.4 id')
+        self.user.save()
+        self.url = reverse('user-verification-documents', args=[self.user.pk])
+
+    def test_only_owner_downloads_and_modes_offload_the_bytes(self):
+        other = User.objects.create_customer('other@example.com', 'Oth', 'Er', 'S3cure-pass-123')
+        self.client.force_authenticate(other)
+        self.assertIn(self.client.get(self.url).status_code, (status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND))
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 id')
+
+        with override_settings(PROTECTED_FILES={'MODE': 'x-sendfile'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.user.verification_documents.path)
+        self.assertEqual(response.content, b'')
+
+        with override_settings(PROTECTED_FILES={'MODE': 'signed-url', 'SIGNED_URL_SECRET': 's3cret'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        location, query = response['Location'].split('?')
+        self.assertEqual(location, '/signed-media/verifications/identit%C3%A9.pdf')
+        params = dict(pair.split('=') for pair in query.split('&'))
+        # What nginx's secure_link_md5 "$secure_link_expires$uri s3cret" computes
+        expected = base64.urlsafe_b64encode(hashlib.md5(
+            f"{params['expires']}/signed-media/verifications/identité.pdf s3cret".encode()
+        ).digest()).decode().rstrip('=')
+        self.assertEqual(params['md5'], expected)
+
+    def test_private_directories_are_not_served_as_public_media(self):
+        request = RequestFactory().get('/media/verifications/id%20card.pdf')
+        with self.assertRaises(Http404):
+            serve_public_media(request, 'verifications/id card.pdf', document_root=settings.MEDIA_ROOT)
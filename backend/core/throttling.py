@@ -0,0 +1,165 @@
+# backend/core/throttling.py
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+
+from .utils import get_app_setting, get_client_ip
+
+
+LOGIN_GUARD_DEFAULTS = {
+    'WINDOW_SECONDS': 900,          # Sliding window used for both counters
+    'MAX_ATTEMPTS_PER_IP': 30,      # Any login attempt from one IP inside the window
+    'MAX_FAILURES_PER_EMAIL': 5,    # Failed attempts against one account before it locks
+    'LOCKOUT_SECONDS': 900,         # How long a locked account stays locked
+    'PENDING_SHARDS': 16,           # Buckets used to queue accounts for the DB sync task
+}
+
+PENDING_KEY_PREFIX = 'login_guard:pending'
+
+
+def get_login_guard_setting(name):
+    return get_app_setting('LOGIN_GUARD', name, LOGIN_GUARD_DEFAULTS)
+
+
+def normalize_login_email(email):
+    return (email or '').strip().lower()
+
+
+def _email_digest(email):
+    return hashlib.sha256(email.encode('utf-8')).hexdigest()[:32]
+
+
+class LoginGuard:
+    """
+    Cache-backed login throttling that runs in front of the token view.
+
+    Keeps sliding-window counters per client IP (all attempts) and per email
+    (failed attempts), so over-limit and locked requests are rejected before
+    the user lookup and the password hasher run. The cache is the source of
+    truth; `sync_login_lockouts_task` mirrors the per-account state onto
+    `User.failed_login_attempts` / `User.account_locked_until` in batches.
+    """
+
+    def __init__(self, request, email=None):
+        self.window = get_login_guard_setting('WINDOW_SECONDS')
+        self.ip = get_client_ip(request) or 'unknown'
+        self.email = normalize_login_email(email)
+        self.email_key = _email_digest(self.email) if self.email else None
+
+    # Key helpers
+    def _ip_prefix(self):
+        return f'login_guard:ip:{self.ip}'
+
+    def _email_prefix(self):
+        return f'login_guard:email:{self.email_key}'
+
+    def _lock_key(self):
+        return f'login_guard:lock:{self.email_key}'
+
+    # Sliding window counter: the current fixed bucket plus the previous one
+    # weighted by how much of it still overlaps the window.
+    def _sliding_count(self, prefix, now):
+        bucket = int(now // self.window)
+        keys = [f'{prefix}:{bucket}', f'{prefix}:{bucket - 1}']
+        values = cache.get_many(keys)
+        overlap = 1 - (now % self.window) / self.window
+        return values.get(keys[0], 0) + values.get(keys[1], 0) * overlap
+
+    def _hit(self, prefix, now):
+        key = f'{prefix}:{int(now // self.window)}'
+        cache.add(key, 0, timeout=self.window * 2)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Key expired between add() and incr()
+            cache.set(key, 1, timeout=self.window * 2)
+            return 1
+
+    def locked_until(self):
+        """Unix timestamp until which the account is locked, or None."""
+        if not self.email_key:
+            return None
+        until = cache.get(self._lock_key())
+        if until and until > time.time():
+            return until
+        return None
+
+    def check(self):
+        """
+        Counts this attempt against the client IP and returns the number of
+        seconds the caller has to wait, or None if the attempt may proceed.
+        """
+        now = time.time()
+
+        until = self.locked_until()
+        if until:
+            return int(until - now) + 1
+
+        ip_attempts = self._sliding_count(self._ip_prefix(), now)
+        if ip_attempts >= get_login_guard_setting('MAX_ATTEMPTS_PER_IP'):
+            return int(self.window - (now % self.window)) + 1
+        self._hit(self._ip_prefix(), now)
+        return None
+
+    def register_failure(self):
+        """Records a failed attempt and locks the account once over the limit."""
+        if not self.email_key:
+            return
+        now = time.time()
+        self._hit(self._email_prefix(), now)
+        failures = int(self._sliding_count(self._email_prefix(), now))
+        cache.set(f'{self._email_prefix()}:total', failures, timeout=self.window * 2)
+
+        if failures >= get_login_guard_setting('MAX_FAILURES_PER_EMAIL'):
+            lockout = get_login_guard_setting('LOCKOUT_SECONDS')
+            cache.set(self._lock_key(), now + lockout, timeout=lockout)
+        self._mark_pending()
+
+    def register_success(self):
+        """Clears the per-account counters after a successful login."""
+        if not self.email_key:
+            return
+        bucket = int(time.time() // self.window)
+        prefix = self._email_prefix()
+        cache.delete_many([
+            f'{prefix}:{bucket}', f'{prefix}:{bucket - 1}',
+            f'{prefix}:total', self._lock_key(),
+        ])
+        self._mark_pending()
+
+    def _mark_pending(self):
+        # Read-modify-write on a shard; a lost update only delays the sync
+        # until the next attempt against that account re-marks it.
+        shard = int(self.email_key, 16) % get_login_guard_setting('PENDING_SHARDS')
+        key = f'{PENDING_KEY_PREFIX}:{shard}'
+        pending = cache.get(key) or {}
+        pending[self.email] = self.email_key
+        cache.set(key, pending, timeout=None)
+
+
+def pop_pending_login_states():
+    """
+    Drains the queued accounts and returns {email: (failures, locked_until)}
+    with the current cache-side state of each one.
+    """
+    shard_keys = [
+        f'{PENDING_KEY_PREFIX}:{shard}'
+        for shard in range(get_login_guard_setting('PENDING_SHARDS'))
+    ]
+    pending = {}
+    for shard_pending in cache.get_many(shard_keys).values():
+        pending.update(shard_pending)
+    cache.delete_many(shard_keys)
+
+    states = {}
+    now = time.time()
+    for email, email_key in pending.items():
+        failures = cache.get(f'login_guard:email:{email_key}:total', 0)
+        until = cache.get(f'login_guard:lock:{email_key}')
+        locked_until = None
+        if until and until > now:
+            locked_until = datetime.fromtimestamp(until, tz=dt_timezone.utc)
+        states[email] = (failures, locked_until)
+    return states
@@ -14,7 +14,8 @@ from .views import (
     SpecializationViewSet,
     UserFavoriteViewSet,
     AgentProfileViewSet,
-    AgencyRegistrationView
+    AgencyRegistrationView,
+    AgentReviewViewSet
 )
 
 # API Endpoints
@@ -26,6 +27,7 @@ router.register(r'licenses', LicenseViewSet, basename='license')
 router.register(r'specializations', SpecializationViewSet, basename='specialization')
 router.register(r'favorites', UserFavoriteViewSet, basename='favorite')
 router.register(r'agent-profiles', AgentProfileViewSet, basename='agentprofile')
+router.register(r'reviews', AgentReviewViewSet, basename='review')
 
 # Authentication Endpoints
 auth_patterns = [
@@ -13,6 +13,32 @@ def generate_verification_link(user):
     uid = urlsafe_base64_encode(force_bytes(user.pk))
     return f"{settings.FRONTEND_URL}/verify-email/{uid}/{token}/"
 
+def get_app_setting(group, name, defaults):
+    """
+    settings.<group>[name], or defaults[name] when the project leaves it out.
+    Dict values are merged over their default key by key, so a project can
+    override one entry of them. The defaults live next to the code using them.
+    """
+    value = getattr(settings, group, {}).get(name, defaults[name])
+    if isinstance(defaults[name], dict):
+        return {**defaults[name], **value}
+    return value
+
+def get_client_ip(request):
+    """
+    The client address as seen by the outermost trusted proxy. Proxies only
+    append to X-Forwarded-For, so everything left of the TRUSTED_PROXY_COUNT
+    entries they added is whatever the client chose to send and is ignored.
+    With no trusted proxies the header is not read at all.
+    """
+    trusted_proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if trusted_proxies and forwarded_for:
+        addresses = [address.strip() for address in forwarded_for.split(',') if address.strip()]
+        if addresses:
+            return addresses[-min(trusted_proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR')
+
 def send_verification_email(user):
     subject = "Verify Your Email Address"
     verification_link = generate_verification_link(user)
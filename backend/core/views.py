@@ -1,16 +1,17 @@
 import logging
-from rest_framework import viewsets, permissions, status, serializers
+from rest_framework import viewsets, permissions, status, serializers, exceptions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils.translation import gettext_lazy as _
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from .models import (
     User, Agency, UserActivityLog,
-    License, Specialization, AgentProfile, UserDevice, UserFavorite
+    License, Specialization, AgentProfile, UserDevice, UserFavorite, AgentReview
 )
 from .serializers import (
     UserSerializer,
@@ -29,16 +30,27 @@ from .serializers import (
     LicenseCreateSerializer,
     AgentProfileUpdateSerializer,
     AgencyRegistrationSerializer,
+    AgentSearchParamsSerializer,
+    AgentReviewSerializer,
+    SessionProfileSerializer,
     UserUpdateSerializer  # Import UserUpdateSerializer
 )
-from .permissions import IsAdminOrSelf, IsAgencyOwner, IsAgencyMember, IsAgentOrAdmin
+from .protected_files import protected_file_response
+from .permissions import IsAdminOrSelf, IsAgencyOwner, IsAgencyMember, IsAgentOrAdmin, IsReviewerOrAdmin
+from properties.models import Property
+from .throttling import LoginGuard
+from .devices import register_device, get_device_registry_setting
+from .logging_utils import request_context
+from .pagination import KeysetPagination
+from .search import search_agents
+from .profile_cache import get_agent_public_profiles, invalidate_user_profiles, get_session_profile
 
 
 logger = logging.getLogger(__name__)
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.select_related('agency').prefetch_related(
-        'licenses', 'specializations', 'devices'
+        'licenses', 'specializations'
     ).all()
     serializer_class = UserSerializer
     filter_backends = [DjangoFilterBackend]
@@ -67,31 +79,31 @@ class UserViewSet(viewsets.ModelViewSet):
             return AgentPublicProfileSerializer
         if self.action == 'search_agents':
             return AgentSearchSerializer
+        if self.action == 'my_devices':
+            return UserDeviceSerializer
         if self.action == 'add_license':
             return LicenseCreateSerializer
         if self.action == 'update_agent_profile':
             return AgentProfileUpdateSerializer
-        if self.action == 'me' and self.request.method in ['PUT', 'PATCH']:
-            return UserUpdateSerializer
+        if self.action == 'me':
+            if self.request.method in ['PUT', 'PATCH']:
+                return UserUpdateSerializer
+            return SessionProfileSerializer
         return super().get_serializer_class()
 
     def create(self, request, *args, **kwargs):
         """User registration endpoint with detailed logging"""
         logger.info(
             "Registration attempt initiated",
-            extra={
-                "client_ip": request.META.get('REMOTE_ADDR'),
-                "user_agent": request.META.get('HTTP_USER_AGENT'),
-                "headers": {key: request.META.get(key) for key in request.META},
-                "data": {k: v for k, v in request.data.items() if k not in ['password', 'password2']}
-            }
+            extra={"context": request_context(request, include_data=True)}
         )
 
         # Block admin registration attempts
         if request.data.get('role') in ['admin', 'agency_admin']:
             logger.warning(
-                "Blocked admin registration attempt",
-                extra={"email": request.data.get('email')}
+                "Blocked admin registration attempt for %s",
+                request.data.get('email'),
+                extra={"context": request_context(request)}
             )
             return Response(
                 {'detail': _('Admin registration not allowed')},
@@ -101,11 +113,9 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
             logger.error(
-                f"Registration validation failed. Errors: {serializer.errors}. "
-                f"Data: {{ {', '.join([f'{k}: {v}' for k, v in request.data.items() if k not in ['password', 'password2']])} }}",
-                extra={
-                    "data": {k: v for k, v in request.data.items()}
-                }
+                "Registration validation failed. Errors: %s",
+                serializer.errors,
+                extra={"context": request_context(request, include_data=True)}
             )
             return Response(
                 {"detail": "Validation failed", "errors": serializer.errors},
@@ -117,12 +127,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 user = serializer.save()
                 logger.info(
                     "User registered successfully",
-                    extra={
-                        "user_id": user.id,
-                        "email": user.email,
-                        "role": user.role,
-                        "data": {k: v for k, v in request.data.items() if k not in ['password', 'password2']}
-                    }
+                    extra={"context": {"user_id": user.id, "email": user.email, "role": user.role}}
                 )
                 return Response(
                     {
@@ -131,14 +136,11 @@ class UserViewSet(viewsets.ModelViewSet):
                     },
                     status=status.HTTP_201_CREATED
                 )
-        except Exception as e:
+        except Exception:
             logger.critical(
                 "Registration system error",
-                extra={
-                    "error": str(e),
-                    "stack_trace": traceback.format_exc(),
-                    "request_data": {k: v for k, v in request.data.items() if k not in ['password', 'password2']}
-                }
+                exc_info=True,
+                extra={"context": request_context(request, include_data=True)}
             )
             return Response(
                 {"detail": "Registration system error"},
@@ -149,55 +151,44 @@ class UserViewSet(viewsets.ModelViewSet):
     def me(self, request):
         """Current user profile endpoint with logging"""
         user = request.user
+        # Profile reads are the hottest path here; only a sample is logged
         logger.info(
             "User profile access",
-            extra={
-                "user_id": user.id,
-                "action": request.method,
-                "headers": {key: request.META.get(key) for key in request.META}
-            }
+            extra={"context": request_context(request), "sampled": request.method == 'GET'}
         )
 
         if request.method == 'GET':
-            serializer = self.get_serializer(user)
-            return Response(serializer.data)
+            data, etag = get_session_profile(user)
+            if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(data)
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
 
         elif request.method in ['PUT', 'PATCH']:
             logger.debug(
                 "Profile update data received",
-                extra={
-                    "user_id": user.id,
-                    "data": request.data,
-                    "headers": {key: request.META.get(key) for key in request.META}
-                }
+                extra={"context": request_context(request, include_data=True)}
             )
             serializer = self.get_serializer(user, data=request.data, partial=True)
 
             if not serializer.is_valid():
                 logger.warning(
-                    "Profile update validation failed",
-                    extra={
-                        "user_id": user.id,
-                        "errors": serializer.errors
-                    }
+                    "Profile update validation failed for user %s: %s",
+                    user.id, serializer.errors
                 )
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
             try:
                 serializer.save()
-                logger.info(
-                    "Profile updated successfully",
-                    extra={"user_id": user.id}
-                )
+                logger.info("Profile updated successfully for user %s", user.id)
                 return Response(serializer.data)
-            except Exception as e:
+            except Exception:
                 logger.error(
-                    "Profile update error",
-                    extra={
-                        "user_id": user.id,
-                        "error": str(e),
-                        "stack_trace": traceback.format_exc()
-                    }
+                    "Profile update error for user %s", user.id,
+                    exc_info=True
                 )
                 return Response(
                     {'detail': _('Profile update failed')},
@@ -210,20 +201,13 @@ class UserViewSet(viewsets.ModelViewSet):
         user = self.get_object()
         logger.info(
             "Email verification attempt",
-            extra={
-                "target_user": user.id,
-                "requester": request.user.id,
-                "headers": {key: request.META.get(key) for key in request.META}
-            }
+            extra={"context": request_context(request, target_user=user.id)}
         )
 
         if not request.user.is_staff and user != request.user:
             logger.warning(
-                "Unauthorized verification attempt",
-                extra={
-                    "attempted_user": user.id,
-                    "requester": request.user.id
-                }
+                "Unauthorized verification attempt on user %s by %s",
+                user.id, request.user.id
             )
             return Response(
                 {'detail': _('Permission denied')},
@@ -232,19 +216,10 @@ class UserViewSet(viewsets.ModelViewSet):
 
         try:
             user.verify_email()
-            logger.info(
-                "Email verified successfully",
-                extra={"user_id": user.id}
-            )
+            logger.info("Email verified successfully for user %s", user.id)
             return Response({'status': _('Email verified successfully')})
         except Exception as e:
-            logger.error(
-                "Email verification failed",
-                extra={
-                    "user_id": user.id,
-                    "error": str(e)
-                }
-            )
+            logger.error("Email verification failed for user %s: %s", user.id, e)
             return Response(
                 {'detail': _('Verification failed')},
                 status=status.HTTP_400_BAD_REQUEST
@@ -256,20 +231,13 @@ class UserViewSet(viewsets.ModelViewSet):
         user = self.get_object()
         logger.info(
             "Phone verification attempt",
-            extra={
-                "target_user": user.id,
-                "requester": request.user.id,
-                "headers": {key: request.META.get(key) for key in request.META}
-            }
+            extra={"context": request_context(request, target_user=user.id)}
         )
 
         if not request.user.is_staff and user != request.user:
             logger.warning(
-                "Unauthorized phone verification attempt",
-                extra={
-                    "attempted_user": user.id,
-                    "requester": request.user.id
-                }
+                "Unauthorized phone verification attempt on user %s by %s",
+                user.id, request.user.id
             )
             return Response(
                 {'detail': _('Permission denied')},
@@ -278,24 +246,60 @@ class UserViewSet(viewsets.ModelViewSet):
 
         try:
             user.verify_phone()
-            logger.info(
-                "Phone number verified",
-                extra={"user_id": user.id}
-            )
+            logger.info("Phone number verified for user %s", user.id)
             return Response({'status': _('Phone verified successfully')})
         except Exception as e:
-            logger.error(
-                "Phone verification failed",
-                extra={
-                    "user_id": user.id,
-                    "error": str(e)
-                }
-            )
+            logger.error("Phone verification failed for user %s: %s", user.id, e)
             return Response(
                 {'detail': _('Verification failed')},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=True, methods=['get'], url_path='verification-documents')
+    def verification_documents(self, request, pk=None):
+        """The user's verification documents (the user themselves or admins)"""
+        user = self.get_object()
+        if not user.verification_documents:
+            raise exceptions.NotFound(_('No verification documents uploaded'))
+        return protected_file_response(user.verification_documents)
+
+    @action(detail=False, methods=['get'])
+    def my_devices(self, request):
+        """The requesting user's most recently used devices"""
+        devices = UserDevice.objects.recent_for(request.user.pk)[
+            :get_device_registry_setting('MAX_DEVICES_PER_USER')
+        ]
+        return Response(UserDeviceSerializer(devices, many=True).data)
+
+    def _paginate_agent_search(self, request):
+        params = AgentSearchParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        queryset, self.keyset_ordering = search_agents(params.validated_data)
+        paginator = KeysetPagination()
+        return paginator, paginator.paginate_queryset(queryset, request, view=self)
+
+    @action(detail=False, methods=['get'])
+    def search_agents(self, request):
+        """
+        Agent search ranked by distance from ?latitude=&longitude= (agency
+        coordinates), or by rating when no point is given. Keyset paginated.
+        """
+        paginator, page = self._paginate_agent_search(request)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def agent_profiles(self, request):
+        """
+        Agent directory with public profiles, accepting the same filters as
+        search_agents. The page is resolved on the light search queryset and
+        the profiles come from the per-agent cache (see core.profile_cache).
+        """
+        paginator, page = self._paginate_agent_search(request)
+        profiles = get_agent_public_profiles([user.pk for user in page])
+        return paginator.get_paginated_response(profiles)
+
     # Similar logging updates for other actions (password change, agent profiles, etc.)
 
 class AgencyRegistrationView(APIView):
@@ -340,8 +344,10 @@ class AgencyRegistrationView(APIView):
 
 
 class AgencyViewSet(viewsets.ModelViewSet):
-    queryset = Agency.objects.prefetch_related('members').all()
+    queryset = Agency.objects.with_member_counts()
     serializer_class = AgencySerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('name', False)
     permission_classes = [permissions.IsAuthenticated, IsAgencyOwner | permissions.IsAdminUser]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['verified']
@@ -363,6 +369,7 @@ class AgencyViewSet(viewsets.ModelViewSet):
         agency.save()
 
         agency.members.update(agency_verified=True)
+        invalidate_user_profiles(agency.members.values_list('pk', flat=True))
 
         return Response({'status': _('Agency verified successfully')})
 
@@ -390,16 +397,30 @@ class AgencyViewSet(viewsets.ModelViewSet):
     def agents(self, request, pk=None):
         """Get all agents for this agency"""
         agency = self.get_object()
-        agents = agency.members.filter(role='agent', is_active=True)
-        serializer = AgentPublicProfileSerializer(agents, many=True)
-        return Response(serializer.data)
+        agent_ids = agency.members.filter(role='agent', is_active=True).order_by(
+            'last_name', 'first_name'
+        ).values_list('pk', flat=True)
+        return Response(get_agent_public_profiles(agent_ids))
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
+        # Reject locked or over-limit attempts before the user lookup and hasher run
+        guard = LoginGuard(request, email=request.data.get('email'))
+        wait = guard.check()
+        if wait is not None:
+            raise exceptions.Throttled(wait=wait)
+
+        try:
+            response = super().post(request, *args, **kwargs)
+        except exceptions.AuthenticationFailed:
+            guard.register_failure()
+            raise
+        guard.register_success()
+        register_device(response.data['user']['id'], request)
+
         response['X-Content-Type-Options'] = 'nosniff'
         response['X-Frame-Options'] = 'DENY'
         return response
@@ -436,6 +457,14 @@ class LicenseViewSet(viewsets.ModelViewSet):
         if self.request.user.is_agent:
             self.request.user.licenses.add(license)
 
+    @action(detail=True, methods=['get'])
+    def document(self, request, pk=None):
+        """The license document, offloaded to the web server once access is checked"""
+        license = self.get_object()
+        if not license.document:
+            raise exceptions.NotFound(_('No document uploaded for this license'))
+        return protected_file_response(license.document)
+
 
 class SpecializationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = SpecializationSerializer
@@ -455,8 +484,25 @@ class UserFavoriteViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return UserFavorite.objects.filter(user=self.request.user)
 
+    # Property favorites keep Property.favorites_count in step (one UPDATE each)
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            favorite = serializer.save(user=self.request.user)
+            Property.objects.adjust_engagement(favorite.property_id, favorites=1)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            previous_property_id = serializer.instance.property_id
+            favorite = serializer.save()
+            if favorite.property_id != previous_property_id:
+                Property.objects.adjust_engagement(previous_property_id, favorites=-1)
+                Property.objects.adjust_engagement(favorite.property_id, favorites=1)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            property_id = instance.property_id
+            instance.delete()
+            Property.objects.adjust_engagement(property_id, favorites=-1)
 
 
 class AgentProfileViewSet(viewsets.ModelViewSet):
@@ -474,4 +520,50 @@ class AgentProfileViewSet(viewsets.ModelViewSet):
             raise serializers.ValidationError(
                 _("Only agents can create professional profiles.")
             )
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+
+class AgentReviewViewSet(viewsets.ModelViewSet):
+    """
+    Reviews of agents. Each write shifts the agent's rating aggregates with a
+    single F-expression UPDATE (see UserManager.apply_review_delta);
+    reconcile_agent_ratings_task recomputes them from this table in bulk.
+    """
+    serializer_class = AgentReviewSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsReviewerOrAdmin]
+    queryset = AgentReview.objects.select_related('reviewer').all()
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['agent', 'reviewer', 'rating']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('created_at', True)
+
+    def _refresh_agent(self, agent_id):
+        transaction.on_commit(lambda: invalidate_user_profiles([agent_id]))
+
+    def perform_create(self, serializer):
+        try:
+            with transaction.atomic():
+                review = serializer.save(reviewer=self.request.user)
+                User.objects.apply_review_delta(review.agent_id, review.rating, 1)
+                self._refresh_agent(review.agent_id)
+        except IntegrityError:
+            # A concurrent request won the unique (agent, reviewer) race
+            raise serializers.ValidationError(_("You have already reviewed this agent."))
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            previous = AgentReview.objects.select_for_update().only('rating').get(pk=serializer.instance.pk)
+            review = serializer.save()
+            if review.rating != previous.rating:
+                User.objects.apply_review_delta(review.agent_id, review.rating - previous.rating)
+                self._refresh_agent(review.agent_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # The locked row has the current rating, and is gone if a concurrent delete won
+            review = AgentReview.objects.select_for_update().only('agent', 'rating').filter(pk=instance.pk).first()
+            if review is None:
+                return
+            User.objects.apply_review_delta(review.agent_id, -review.rating, -1)
+            review.delete()
+            self._refresh_agent(review.agent_id)
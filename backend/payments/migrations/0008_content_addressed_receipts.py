@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:26
+
+import core.media_store
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_receipt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='receipt',
+            name='receipt_pdf',
+            field=models.FileField(blank=True, null=True, storage=core.media_store.get_content_addressed_storage, upload_to='receipts/pdfs/', verbose_name='Receipt PDF'),
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from encrypted_model_fields.fields import EncryptedCharField, EncryptedTextField
 from core.models import User
+from core.media_store import get_content_addressed_storage
 from paynow import Paynow
 from paynow.model import InitResponse
 from urllib.parse import urlparse, parse_qs
@@ -160,7 +161,9 @@ class Receipt(models.Model):
     # or pass structured data directly to the ReportLab generation function.
     # itemized_details = models.JSONField(_('Itemized Details'), default=list, blank=True) 
     
-    receipt_pdf = models.FileField(_('Receipt PDF'), upload_to='receipts/pdfs/', blank=True, null=True)
+    receipt_pdf = models.FileField(
+        _('Receipt PDF'), upload_to='receipts/pdfs/', storage=get_content_addressed_storage, blank=True, null=True
+    )
     notes = models.TextField(_('Additional Notes'), blank=True, null=True)
 
     def __str__(self):
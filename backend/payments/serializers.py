@@ -1,4 +1,5 @@
 # backend/payments/serializers.py
+from django.urls import reverse
 from rest_framework import serializers
 from .models import Payment, PaynowIntegration, Receipt # Ensure Receipt is imported
 from core.models import User # Assuming User is in core.models (adjust if User model is elsewhere)
@@ -157,9 +158,9 @@ class ReceiptSerializer(serializers.ModelSerializer):
         Returns the absolute URL for the receipt PDF if it exists.
         """
         request = self.context.get('request')
-        if obj.receipt_pdf and hasattr(obj.receipt_pdf, 'url'):
-            # Ensure MEDIA_URL is configured and files are served correctly.
-            return request.build_absolute_uri(obj.receipt_pdf.url)
+        if obj.receipt_pdf:
+            # Receipts are private media: link the authorised download endpoint
+            return request.build_absolute_uri(reverse('payments:receipt-download-pdf', args=[obj.pk]))
         return None
 
     def to_representation(self, instance):
@@ -0,0 +1,6 @@
+# backend/payments/signals.py
+from core.media_store import track_file_references
+from .models import Receipt
+
+# Reference counts of the content-addressed receipt PDFs (see core.media_store)
+track_file_references(Receipt, 'receipt_pdf')
@@ -1,6 +1,10 @@
 from rest_framework import status
 from rest_framework.test import APITestCase
-from payments.models import Payment, PaynowIntegration
+from core.models import User
+from core.testing import TemporaryMediaMixin
+from payments.models import Payment, PaynowIntegration, Receipt
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.urls import reverse
 
 
@@ -94,3 +98,34 @@ class PaymentsAppTests(APITestCase):
         
         # Assert that the status code is 400 Bad Request
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReceiptDownloadTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.owner = User.objects.create_customer('payer@example.com', 'Pay', 'Er', 'S3cure-pass-123')
+        integration = PaynowIntegration.objects.create(integration_id='receipts', is_active=True)
+        payment = Payment.objects.create(user=self.owner, amount=100, integration=integration)
+        self.receipt = Receipt.objects.create(
+            payment=payment, receipt_number='RCPT-20261019-0001', amount_paid=100, currency='USD',
+            receipt_pdf=SimpleUploadedFile('receipt.pdf', b'%PDF-1.4 receipt')
+        )
+        self.url = reverse('payments:receipt-download-pdf', args=[self.receipt.pk])
+
+    def test_download_is_authorised_then_offloaded_to_nginx(self):
+        stranger = User.objects.create_customer('stranger@example.com', 'Str', 'Anger', 'S3cure-pass-123')
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(self.owner)
+        with override_settings(PROTECTED_FILES={'MODE': 'x-accel-redirect'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.receipt.receipt_pdf.name}')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('Receipt-RCPT-20261019-0001.pdf', response['Content-Disposition'])
+        self.assertEqual(response.content, b'')
+
+        receipt = self.client.get(reverse('payments:receipt-detail', args=[self.receipt.pk])).data
+        self.assertTrue(receipt['receipt_pdf_url'].endswith(self.url))
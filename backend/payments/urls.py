@@ -1,12 +1,17 @@
 # backend/payments/urls.py
-from django.urls import path
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
 from .views import (
     PaynowIntegrationListAPIView,
     PaymentCreateAPIView,
     PaymentRetrieveAPIView,
-    PaymentWebhookAPIView
+    PaymentWebhookAPIView,
+    ReceiptViewSet
 )
 
+router = SimpleRouter()
+router.register(r'receipts', ReceiptViewSet, basename='receipt')
+
 # Define the namespace for this app
 app_name = 'payments'
 
@@ -20,4 +25,7 @@ urlpatterns = [
 
     # Webhook
     path('webhook/paynow/', PaymentWebhookAPIView.as_view(), name='webhook'),
+
+    # Receipts (download-pdf checks access, then offloads the file)
+    path('', include(router.urls)),
 ]
@@ -4,13 +4,14 @@ import hashlib # For Paynow hash validation in webhook
 
 from django.shortcuts import get_object_or_404 # Not used in the final version, but good for general Django
 from django.conf import settings # Potentially for SITE_URL or other settings
-from django.http import JsonResponse, HttpResponseBadRequest, FileResponse # For webhook and PDF download
+from django.http import JsonResponse, HttpResponseBadRequest, Http404 # For webhook and PDF download
 
 from rest_framework import generics, status, viewsets, mixins # viewsets and mixins for ReceiptViewSet
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser # Permissions
 from rest_framework.decorators import action # For custom actions in ViewSet
 
+from core.protected_files import protected_file_response
 from .models import Payment, PaynowIntegration, Receipt # Ensure Receipt is imported
 from .serializers import (
     PaymentSerializer,
@@ -230,23 +231,21 @@ class ReceiptViewSet(viewsets.ReadOnlyModelViewSet):
         ensuring users can only download PDFs of receipts they are allowed to see.
         """
         receipt = self.get_object() # Retrieves based on pk and filtered queryset
-        if receipt.receipt_pdf and hasattr(receipt.receipt_pdf, 'path'):
-            try:
-                # For production, Nginx X-Accel-Redirect or similar is better.
-                # FileResponse is good for development or internal serving.
-                return FileResponse(receipt.receipt_pdf.open('rb'), 
-                                    as_attachment=True, 
-                                    filename=f"Receipt-{receipt.receipt_number}.pdf",
-                                    content_type='application/pdf')
-            except FileNotFoundError:
-                logger.error(f"Receipt PDF file not found for {receipt.receipt_number} at path {receipt.receipt_pdf.path}")
-                return Response({"error": "Receipt PDF file not found on server."}, status=status.HTTP_404_NOT_FOUND)
-            except Exception as e:
-                logger.error(f"Error serving receipt PDF for {receipt.receipt_number}: {e}", exc_info=True)
-                return Response({"error": "Could not serve PDF file due to a server error."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
+        if not receipt.receipt_pdf:
             logger.warning(f"Receipt PDF not available for download for receipt {receipt.receipt_number} (pk: {pk})")
             return Response({"error": "Receipt PDF not available for this receipt."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            # Access is checked here; nginx (X-Accel-Redirect), X-Sendfile or a
+            # signed URL sends the bytes, depending on PROTECTED_FILES['MODE']
+            return protected_file_response(
+                receipt.receipt_pdf, filename=f"Receipt-{receipt.receipt_number}.pdf", content_type='application/pdf'
+            )
+        except Http404:
+            logger.error(f"Receipt PDF file not found for {receipt.receipt_number} at {receipt.receipt_pdf.name}")
+            return Response({"error": "Receipt PDF file not found on server."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error serving receipt PDF for {receipt.receipt_number}: {e}", exc_info=True)
+            return Response({"error": "Could not serve PDF file due to a server error."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 # Example: Admin action to manually trigger receipt (if Celery task failed or for testing)
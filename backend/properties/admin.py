@@ -6,8 +6,10 @@ from django.utils.translation import gettext_lazy as _
 from .models import (
     PlaceOfInterest, Property, PropertyPlaceOfInterest, PropertyImage,
     PropertyVideo, ServiceSubscription, Transaction, RentalContract,
-    SaleContract, PropertyInterest
+    SaleContract, PropertyInterest, SavedSearchMatch, PropertyImageVariant,
+    UploadSession
 )
+from .duplicates import duplicated_image_ids, near_duplicates
 # Assuming your core models User and Agency are registered elsewhere (e.g., in a 'core' app)
 # If not, you might need to register them here or in their own app's admin.py
 
@@ -31,8 +33,8 @@ class PropertyImageInline(admin.TabularInline): # Or admin.StackedInline for mor
 class PropertyVideoInline(admin.TabularInline):
     model = PropertyVideo
     extra = 1
-    readonly_fields = ('thumbnail', 'duration') # Assuming these are processed/set elsewhere
-    fields = ('video_file', 'thumbnail', 'duration')
+    readonly_fields = ('thumbnail', 'duration', 'processing_status', 'processing_progress')
+    fields = ('video_file', 'thumbnail', 'duration', 'processing_status', 'processing_progress')
 
 
 class PropertyPlaceOfInterestInline(admin.TabularInline):
@@ -57,7 +59,7 @@ class PropertyAdmin(admin.ModelAdmin):
             'fields': ('title', 'description', 'property_type', 'listing_type', 'status', 'featured')
         }),
         (_('Location'), {
-            'fields': ('address', 'city', 'state', 'zip_code')
+            'fields': ('address', 'city', 'state', 'zip_code', 'latitude', 'longitude')
         }),
         (_('Pricing & Measurements'), {
             'fields': ('price', 'viewing_fee', 'bedrooms', 'bathrooms', 'area')
@@ -95,21 +97,46 @@ class PropertyAdmin(admin.ModelAdmin):
 
 @admin.register(PropertyPlaceOfInterest)
 class PropertyPlaceOfInterestAdmin(admin.ModelAdmin):
-    list_display = ('property', 'place', 'distance')
-    list_filter = ('place__place_type',) # Filter by the type of the related place
+    list_display = ('property', 'place', 'distance', 'auto_computed')
+    list_filter = ('place__place_type', 'auto_computed') # Filter by the type of the related place
     search_fields = ('property__title', 'place__name')
     autocomplete_fields = ('property', 'place')
     ordering = ('property', 'distance')
 
 
+class PropertyImageVariantInline(admin.TabularInline):
+    model = PropertyImageVariant
+    extra = 0
+    can_delete = False
+    readonly_fields = ('format', 'width', 'height', 'size', 'file') # Rendered by process_property_image_task
+    fields = readonly_fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class NearDuplicateFilter(admin.SimpleListFilter):
+    title = _('near duplicates')
+    parameter_name = 'near_duplicates'
+
+    def lookups(self, request, model_admin):
+        return (('yes', _('Also used on another property')),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(pk__in=duplicated_image_ids())
+        return queryset
+
+
 @admin.register(PropertyImage)
 class PropertyImageAdmin(admin.ModelAdmin):
     list_display = ('property', 'image_preview', 'is_primary', 'created_at')
-    list_filter = ('is_primary', 'property')
+    list_filter = (NearDuplicateFilter, 'is_primary', 'property')
     search_fields = ('property__title',)
-    readonly_fields = ('thumbnail', 'created_at') # Assuming thumbnail is auto-generated
+    readonly_fields = ('thumbnail', 'near_duplicate_links', 'created_at') # Assuming thumbnail is auto-generated
     autocomplete_fields = ('property',)
     ordering = ('property', '-is_primary', '-created_at')
+    inlines = [PropertyImageVariantInline]
 
 
     def image_preview(self, obj):
@@ -122,14 +149,44 @@ class PropertyImageAdmin(admin.ModelAdmin):
     image_preview.short_description = _('Preview')
 
 
+    def near_duplicate_links(self, obj):
+        from django.urls import reverse
+        from django.utils.html import format_html, format_html_join
+        matches = near_duplicates(obj)
+        if not matches:
+            return _("None found")
+        return format_html_join(
+            format_html('<br>'), '<a href="{}">{}</a> ({} bits apart)',
+            (
+                (reverse('admin:properties_propertyimage_change', args=[other.pk]), other, distance)
+                for other, distance in matches
+            )
+        )
+    near_duplicate_links.short_description = _('Near duplicates')
+
+
 @admin.register(PropertyVideo)
 class PropertyVideoAdmin(admin.ModelAdmin):
-    list_display = ('property', 'video_file', 'thumbnail_preview', 'duration', 'created_at')
-    list_filter = ('property',)
+    list_display = (
+        'property', 'video_file', 'thumbnail_preview', 'duration', 'processing_status', 'processing_progress', 'created_at'
+    )
+    list_filter = ('processing_status', 'property')
     search_fields = ('property__title',)
-    readonly_fields = ('thumbnail', 'duration', 'created_at', 'updated_at') # Assuming thumbnail/duration are set programmatically
+    readonly_fields = (
+        'thumbnail', 'duration', 'hls_playlist', 'processing_status', 'processing_progress', 'processing_error',
+        'created_at', 'updated_at'
+    )
     autocomplete_fields = ('property',)
     ordering = ('property', '-created_at')
+    actions = ['reprocess_videos']
+
+
+    def reprocess_videos(self, request, queryset):
+        from .tasks import process_property_video_task
+        for video in queryset:
+            process_property_video_task.delay(video.pk)
+        self.message_user(request, f"{queryset.count()} videos queued for transcoding")
+    reprocess_videos.short_description = _('Transcode selected videos again')
 
 
     def thumbnail_preview(self, obj):
@@ -199,4 +256,23 @@ class PropertyInterestAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'property__title')
     readonly_fields = ('created_at',)
     autocomplete_fields = ('user', 'property')
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+
+@admin.register(SavedSearchMatch)
+class SavedSearchMatchAdmin(admin.ModelAdmin):
+    list_display = ('search', 'property', 'created_at', 'notified_at')
+    list_filter = ('notified_at',)
+    search_fields = ('search__user__email', 'property__title')
+    readonly_fields = ('created_at', 'notified_at')
+    raw_id_fields = ('search', 'property')
+    ordering = ('-created_at',)
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'kind', 'property', 'user', 'received', 'total_size', 'status', 'expires_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('filename', 'property__title', 'user__email')
+    readonly_fields = ('id', 'received', 'content_type', 'image', 'video', 'created_at', 'updated_at')
+    raw_id_fields = ('property', 'user')
@@ -0,0 +1,86 @@
+# backend/properties/alerts.py
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+from .models import SavedSearchIndex, SavedSearchMatch
+
+
+# Saved-search keys understood by the matcher; they mirror PropertyFilter
+RANGE_PARAMETERS = {
+    'min_price': Decimal,
+    'max_price': Decimal,
+    'min_bedrooms': int,
+    'max_bedrooms': int,
+}
+CHOICE_PARAMETERS = ('city', 'property_type', 'listing_type')
+
+# Property fields that can change which saved searches a listing matches
+MATCH_FIELDS = {'city', 'property_type', 'listing_type', 'price', 'bedrooms', 'status'}
+
+
+def normalize_city(city):
+    return (city or '').strip().lower()
+
+
+def compile_search_parameters(params):
+    """
+    Maps a search_parameters dict onto SavedSearchIndex columns. Unknown keys
+    are ignored and unparseable values are treated as "any".
+    """
+    params = params if isinstance(params, dict) else {}
+    compiled = {
+        'city': normalize_city(params.get('city'))[:100],
+        'property_type': str(params.get('property_type') or '')[:20],
+        'listing_type': str(params.get('listing_type') or '')[:10],
+    }
+    for key, cast in RANGE_PARAMETERS.items():
+        value = params.get(key)
+        try:
+            compiled[key] = cast(value) if value not in (None, '') else None
+        except (TypeError, ValueError, InvalidOperation):
+            compiled[key] = None
+    return compiled
+
+
+def index_saved_search(favorite):
+    """Compiles (or drops) the index row for one UserFavorite."""
+    if not favorite.search_parameters:
+        return SavedSearchIndex.objects.filter(favorite=favorite).delete()
+    return SavedSearchIndex.objects.update_or_create(
+        favorite=favorite,
+        defaults={'user_id': favorite.user_id, **compile_search_parameters(favorite.search_parameters)}
+    )
+
+
+def candidate_searches(property):
+    """Saved searches whose every predicate accepts `property`, as one indexed query."""
+    searches = SavedSearchIndex.objects.filter(
+        Q(city='') | Q(city=normalize_city(property.city)),
+        Q(property_type='') | Q(property_type=property.property_type),
+        Q(min_price__isnull=True) | Q(min_price__lte=property.price),
+        Q(max_price__isnull=True) | Q(max_price__gte=property.price),
+        Q(min_bedrooms__isnull=True) | Q(min_bedrooms__lte=property.bedrooms),
+        Q(max_bedrooms__isnull=True) | Q(max_bedrooms__gte=property.bedrooms),
+    ).exclude(user_id=property.owner_id)
+    # A listing for both sale and rent satisfies any listing type; a saved
+    # search for "both" accepts either
+    if property.listing_type != 'both':
+        searches = searches.filter(listing_type__in=['', 'both', property.listing_type])
+    return searches
+
+
+def match_property(property):
+    """
+    Records a pending SavedSearchMatch for every saved search the property
+    satisfies. Already recorded pairs are left alone, so re-running after an
+    edit only queues searches the listing newly matches.
+    """
+    if property.status != 'available':
+        return 0
+    search_ids = list(candidate_searches(property).values_list('pk', flat=True))
+    SavedSearchMatch.objects.bulk_create(
+        [SavedSearchMatch(search_id=search_id, property=property) for search_id in search_ids],
+        ignore_conflicts=True
+    )
+    return len(search_ids)
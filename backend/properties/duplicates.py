@@ -0,0 +1,151 @@
+# backend/properties/duplicates.py
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import Q
+from PIL import Image as PillowImage
+
+from core.utils import get_app_setting
+from .models import PropertyImage
+
+
+HASH_BITS = 64
+BLOCKS = 4
+BLOCK_BITS = HASH_BITS // BLOCKS
+BLOCK_MASK = (1 << BLOCK_BITS) - 1
+
+NEAR_DUPLICATES_DEFAULTS = {
+    'MAX_DISTANCE': 6,           # Hamming distance (of 64 bits) still considered the same photo
+    'REPORT_CACHE_SECONDS': 900, # Upper bound on the age of the cached duplicate report
+}
+
+GROUPS_CACHE_KEY = 'near_duplicates:image_ids'
+# PropertyImage fields that can change which images are near duplicates
+DUPLICATE_FIELDS = {'dhash', 'property'}
+
+
+def get_near_duplicates_setting(name):
+    return get_app_setting('NEAR_DUPLICATES', name, NEAR_DUPLICATES_DEFAULTS)
+
+
+def dhash(img):
+    """
+    64-bit difference hash: the image shrunk to 9x8 greyscale, one bit per
+    horizontally adjacent pair (left brighter than right). Robust to
+    rescaling, recompression and small colour edits.
+    """
+    pixels = list(img.convert('L').resize((9, 8), PillowImage.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value
+
+
+def to_signed(value):
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value):
+    return value & ((1 << HASH_BITS) - 1)
+
+
+def hash_blocks(value):
+    value = to_unsigned(value)
+    return [(value >> (BLOCK_BITS * (BLOCKS - 1 - i))) & BLOCK_MASK for i in range(BLOCKS)]
+
+
+def hash_fields(value):
+    """PropertyImage field values for an unsigned hash (or None)."""
+    if value is None:
+        return {'dhash': None, **{f'dhash_block_{i}': None for i in range(BLOCKS)}}
+    return {
+        'dhash': to_signed(value),
+        **{f'dhash_block_{i}': block for i, block in enumerate(hash_blocks(value))},
+    }
+
+
+def hamming(a, b):
+    return bin(to_unsigned(a) ^ to_unsigned(b)).count('1')
+
+
+def _within(block, radius):
+    """Every block value at most `radius` bits away from `block`."""
+    values = {block}
+    for _ in range(radius):
+        values |= {value ^ (1 << bit) for value in values for bit in range(BLOCK_BITS)}
+    return values
+
+
+def near_duplicates(image, max_distance=None):
+    """
+    [(other image, distance)] of hashed images on other properties within
+    `max_distance` bits of `image`, closest first. Multi-index hashing: if two hashes differ in at
+    most d bits, one of the four 16-bit blocks differs in at most d // 4, so
+    probing each block index with those few values finds every candidate.
+    """
+    if image.dhash is None:
+        return []
+    max_distance = get_near_duplicates_setting('MAX_DISTANCE') if max_distance is None else max_distance
+    radius = max_distance // BLOCKS
+    probes = reduce(or_, (
+        Q(**{f'dhash_block_{i}__in': sorted(_within(block, radius))})
+        for i, block in enumerate(hash_blocks(image.dhash))
+    ))
+    candidates = (
+        PropertyImage.objects.filter(probes)
+        .exclude(property_id=image.property_id)
+        .select_related('property')
+    )
+    matches = [(other, hamming(image.dhash, other.dhash)) for other in candidates]
+    return sorted(
+        [(other, distance) for other, distance in matches if distance <= max_distance],
+        key=lambda match: (match[1], match[0].pk)
+    )
+
+
+def near_duplicate_groups(max_distance=None):
+    """
+    Images that have a near duplicate on another property, as
+    {image id: [(other image id, distance)]}, computed in memory over the
+    block buckets so the report needs one query. This reads every hashed
+    image, so request paths use the cached duplicated_image_ids instead.
+    """
+    max_distance = get_near_duplicates_setting('MAX_DISTANCE') if max_distance is None else max_distance
+    radius = max_distance // BLOCKS
+    rows = list(PropertyImage.objects.filter(dhash__isnull=False).values_list('pk', 'property_id', 'dhash'))
+    buckets = [{} for _ in range(BLOCKS)]
+    for row in rows:
+        for i, block in enumerate(hash_blocks(row[2])):
+            buckets[i].setdefault(block, []).append(row)
+
+    groups = {}
+    for pk, property_id, value in rows:
+        seen = set()
+        for i, block in enumerate(hash_blocks(value)):
+            for probe in _within(block, radius):
+                for other_pk, other_property_id, other_value in buckets[i].get(probe, ()):
+                    if other_property_id == property_id or other_pk in seen:
+                        continue
+                    seen.add(other_pk)
+                    distance = hamming(value, other_value)
+                    if distance <= max_distance:
+                        groups.setdefault(pk, []).append((other_pk, distance))
+    return {pk: sorted(matches, key=lambda match: (match[1], match[0])) for pk, matches in groups.items()}
+
+
+def duplicated_image_ids():
+    """
+    Ids of the images in near_duplicate_groups(), cached until an image hash
+    or owner changes (see properties.signals), REPORT_CACHE_SECONDS at most.
+    """
+    image_ids = cache.get(GROUPS_CACHE_KEY)
+    if image_ids is None:
+        image_ids = sorted(near_duplicate_groups())
+        cache.set(GROUPS_CACHE_KEY, image_ids, timeout=get_near_duplicates_setting('REPORT_CACHE_SECONDS'))
+    return image_ids
+
+
+def forget_duplicated_image_ids():
+    cache.delete(GROUPS_CACHE_KEY)
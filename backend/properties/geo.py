@@ -0,0 +1,156 @@
+# backend/properties/geo.py
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.utils import get_app_setting
+from .models import PlaceOfInterest, Property, PropertyPlaceOfInterest
+
+
+EARTH_RADIUS_MILES = 3958.8
+
+NEARBY_PLACES_DEFAULTS = {
+    'NEAREST_PER_TYPE': 3,       # Places kept per property and place_type
+    'MAX_DISTANCE_MILES': 25,    # Farther places are not considered nearby
+    'CHUNK_SIZE': 256,           # Properties per distance matrix
+}
+
+DIRTY_TYPES_KEY = 'nearby_places:dirty_types'
+
+
+def get_nearby_places_setting(name):
+    return get_app_setting('NEARBY_PLACES', name, NEARBY_PLACES_DEFAULTS)
+
+
+def haversine_miles(lat1, lng1, lat2, lng2):
+    """
+    Great-circle distances between every point of (lat1, lng1), shape (n,),
+    and every point of (lat2, lng2), shape (m,), as an (n, m) array.
+    """
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lng1, lat2, lng2))
+    dlat = lat2[None, :] - lat1[:, None]
+    dlng = lng2[None, :] - lng1[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def mark_place_type_dirty(place_type):
+    # Read-modify-write; a lost update is caught by the next change of that type
+    dirty = cache.get(DIRTY_TYPES_KEY) or set()
+    dirty.add(place_type)
+    cache.set(DIRTY_TYPES_KEY, dirty, timeout=None)
+
+
+def pop_dirty_place_types():
+    dirty = cache.get(DIRTY_TYPES_KEY) or set()
+    cache.delete(DIRTY_TYPES_KEY)
+    return dirty
+
+
+def _places_by_type(place_types):
+    places = {}
+    rows = PlaceOfInterest.objects.filter(
+        place_type__in=place_types, latitude__isnull=False, longitude__isnull=False
+    ).values_list('pk', 'place_type', 'latitude', 'longitude')
+    for pk, place_type, lat, lng in rows:
+        places.setdefault(place_type, []).append((pk, float(lat), float(lng)))
+    return {
+        place_type: (
+            np.array([row[0] for row in rows], dtype=np.int64),
+            np.array([row[1] for row in rows]),
+            np.array([row[2] for row in rows]),
+        )
+        for place_type, rows in places.items()
+    }
+
+
+def refresh_nearby_places(properties, place_types):
+    """
+    Recomputes the nearest places of each `place_types` type for the given
+    (pk, latitude, longitude) rows, one vectorised distance matrix per chunk
+    of properties and type. New and moved pairs are upserted in bulk; computed
+    pairs that dropped out of the nearest set are deleted. Returns the number
+    of rows upserted.
+    """
+    nearest = get_nearby_places_setting('NEAREST_PER_TYPE')
+    max_distance = get_nearby_places_setting('MAX_DISTANCE_MILES')
+    chunk_size = get_nearby_places_setting('CHUNK_SIZE')
+    places = _places_by_type(place_types)
+
+    written = 0
+    for start in range(0, len(properties), chunk_size):
+        chunk = properties[start:start + chunk_size]
+        property_ids = np.array([row[0] for row in chunk], dtype=np.int64)
+        lat = np.array([float(row[1]) for row in chunk])
+        lng = np.array([float(row[2]) for row in chunk])
+
+        keep = set()
+        rows = []
+        for place_ids, place_lat, place_lng in places.values():
+            distances = haversine_miles(lat, lng, place_lat, place_lng)
+            k = min(nearest, len(place_ids))
+            candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            for row, columns in enumerate(candidates):
+                for column in columns:
+                    distance = distances[row, column]
+                    if distance > max_distance:
+                        continue
+                    pair = (int(property_ids[row]), int(place_ids[column]))
+                    keep.add(pair)
+                    rows.append(PropertyPlaceOfInterest(
+                        property_id=pair[0], place_id=pair[1], auto_computed=True,
+                        distance=Decimal(str(round(float(distance), 1)))
+                    ))
+
+        if rows:
+            PropertyPlaceOfInterest.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['property', 'place'],
+                update_fields=['distance'],
+                batch_size=1000
+            )
+            written += len(rows)
+
+        existing = PropertyPlaceOfInterest.objects.filter(
+            property_id__in=property_ids.tolist(),
+            place__place_type__in=place_types,
+            auto_computed=True
+        ).values_list('pk', 'property_id', 'place_id')
+        stale = [pk for pk, property_id, place_id in existing if (property_id, place_id) not in keep]
+        if stale:
+            PropertyPlaceOfInterest.objects.filter(pk__in=stale).delete()
+    return written
+
+
+def sync_nearby_places():
+    """
+    Incremental run: every place type for properties whose coordinates are
+    new or changed since their last computation, and every property for the
+    place types whose places changed. Returns (properties refreshed, rows upserted).
+    """
+    started = timezone.now()
+    all_types = [place_type for place_type, _ in PlaceOfInterest.PLACE_TYPES]
+    located = Property.objects.filter(latitude__isnull=False, longitude__isnull=False)
+
+    dirty_types = sorted(pop_dirty_place_types())
+    if dirty_types:
+        everyone = list(located.values_list('pk', 'latitude', 'longitude'))
+        written = refresh_nearby_places(everyone, dirty_types)
+    else:
+        everyone, written = [], 0
+
+    outdated = located.filter(Q(places_computed_at__isnull=True) | Q(updated_at__gt=F('places_computed_at')))
+    stale = list(outdated.values_list('pk', 'latitude', 'longitude'))
+    written += refresh_nearby_places(stale, all_types)
+
+    # Computed places of properties that lost their coordinates
+    PropertyPlaceOfInterest.objects.filter(auto_computed=True, property__latitude__isnull=True).delete()
+
+    refreshed = {row[0] for row in stale} | {row[0] for row in everyone}
+    # Properties edited while this ran stay outdated for the next run
+    outdated.filter(updated_at__lte=started).update(places_computed_at=started)
+    return len(refreshed), written
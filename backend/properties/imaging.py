@@ -0,0 +1,313 @@
+# backend/properties/imaging.py
+import io
+import logging
+import math
+import multiprocessing
+import os
+import resource
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image as PillowImage, ImageOps
+
+from core.media_store import retain
+from core.utils import get_app_setting
+from .duplicates import dhash, hash_fields, to_unsigned
+from .models import PropertyImage, PropertyImageVariant
+from .placeholders import placeholder_fields
+
+logger = logging.getLogger(__name__)
+
+
+IMAGE_VARIANTS_DEFAULTS = {
+    'WIDTHS': [320, 640, 1280, 1920],            # Target widths; never upscaled
+    'FORMATS': ['webp', 'jpeg'],                 # WebP first, JPEG as the fallback
+    'QUALITY': {'webp': 80, 'jpeg': 82},
+    'THUMBNAIL_SIZE': (200, 200),
+    'MAX_DECODE_PIXELS': 40_000_000,             # Refuse images larger than this once draft-decoded
+    'WORKERS': None,                             # Batch pool size; None means one per CPU
+    'WORKER_MEMORY_MB': 1024,                    # Address space limit of a pool worker
+    'TASKS_PER_WORKER': 50,                      # Recycle workers to hand memory back
+}
+
+PILLOW_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+ORIENTATION_TAG = 0x0112
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def get_image_variants_setting(name):
+    return get_app_setting('IMAGE_VARIANTS', name, IMAGE_VARIANTS_DEFAULTS)
+
+
+def variant_widths(original_width):
+    """
+    Configured widths narrower than the original, plus the original width
+    when it falls short of the largest configured one.
+    """
+    widths = sorted({width for width in get_image_variants_setting('WIDTHS') if width < original_width})
+    if original_width <= max(get_image_variants_setting('WIDTHS')):
+        widths.append(original_width)
+    return widths
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def decode_image(source, target_width=None):
+    """
+    Opens and decodes `source` once, upright, at the smallest size that is
+    still as wide as the largest variant it needs (or as `target_width`).
+    JPEGs are draft-decoded, letting libjpeg scale by 1/2, 1/4 or 1/8 in the
+    DCT, so a 24 MP photo never exists at full resolution in memory.
+    Returns (image, original format, variant widths).
+    """
+    img = PillowImage.open(source)
+    original_format = img.format or 'JPEG'
+    transposed = img.getexif().get(ORIENTATION_TAG) in TRANSPOSED_ORIENTATIONS
+    upright_width = img.height if transposed else img.width
+    widths = [min(target_width, upright_width)] if target_width else variant_widths(upright_width)
+
+    if img.format == 'JPEG' and upright_width > widths[-1]:
+        scale = widths[-1] / upright_width
+        img.draft(None, (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+
+    if img.width * img.height > get_image_variants_setting('MAX_DECODE_PIXELS'):
+        raise ImageTooLarge(f"{img.width}x{img.height} exceeds MAX_DECODE_PIXELS")
+    img = ImageOps.exif_transpose(img)
+    img.load()
+    return img, original_format, widths
+
+
+def _for_format(img, fmt):
+    if fmt == 'jpeg' and img.mode not in ('RGB', 'L'):
+        # JPEG has no alpha channel; flatten transparent areas onto white
+        rgba = img.convert('RGBA')
+        flattened = PillowImage.new('RGB', rgba.size, (255, 255, 255))
+        flattened.paste(rgba, mask=rgba.getchannel('A'))
+        return flattened
+    if img.mode not in ('RGB', 'RGBA', 'L'):
+        return img.convert('RGBA')
+    return img
+
+
+def encode_variant(img, fmt):
+    buffer = io.BytesIO()
+    options = {'quality': get_image_variants_setting('QUALITY').get(fmt, 80)}
+    if fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    _for_format(img, fmt).save(buffer, format=PILLOW_FORMATS[fmt], **options)
+    return buffer.getvalue()
+
+
+def render_image(source):
+    """
+    Every rendition of one image from a single decode: variants are derived
+    largest first, each from the previous intermediate rather than from the
+    original, and the perceptual hash, placeholder and thumbnail from the
+    smallest.
+    Touches no database, so it can run in a pool worker. `source` is a
+    path, a file object or bytes.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    img, original_format, widths = decode_image(source)
+
+    variants = []
+    current = img
+    for width in sorted(widths, reverse=True):
+        if width < current.width:
+            height = max(round(img.height * width / img.width), 1)
+            current = current.resize((width, height), PillowImage.LANCZOS, reducing_gap=2.0)
+        for fmt in get_image_variants_setting('FORMATS'):
+            variants.append((current.width, current.height, fmt, encode_variant(current, fmt)))
+
+    # The smallest intermediate is only needed for the hash, placeholder and thumbnail from here on
+    perceptual_hash = dhash(current)
+    placeholder = placeholder_fields(_for_format(current, 'jpeg'))
+    current.thumbnail(get_image_variants_setting('THUMBNAIL_SIZE'))
+    thumbnail = io.BytesIO()
+    thumb_img = current if original_format != 'JPEG' else _for_format(current, 'jpeg')
+    thumb_img.save(thumbnail, format=original_format, quality=85)
+
+    return {
+        'format': original_format,
+        'thumbnail': thumbnail.getvalue(),
+        'dhash': perceptual_hash,
+        'placeholder': placeholder,
+        'variants': variants,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def store_rendered(image_instance, rendered):
+    """Saves the thumbnail and swaps in the new variant rows of a PropertyImage."""
+    original_filename = os.path.basename(image_instance.image.name)
+    stem = os.path.splitext(original_filename)[0]
+    image_instance.thumbnail.save(f"thumb_{original_filename}", ContentFile(rendered['thumbnail']), save=False)
+    fields = {**hash_fields(rendered['dhash']), **rendered['placeholder']}
+    for name, value in fields.items():
+        setattr(image_instance, name, value)
+    image_instance.save(update_fields=['thumbnail', *fields])
+
+    variants = []
+    for width, height, fmt, data in rendered['variants']:
+        variant = PropertyImageVariant(image=image_instance, format=fmt, width=width, height=height, size=len(data))
+        variant.file.save(f"{stem}_{width}w.{EXTENSIONS[fmt]}", ContentFile(data), save=False)
+        variants.append(variant)
+    return replace_variants(image_instance, variants)
+
+
+def replace_variants(image_instance, variants):
+    # Replaced files are released, not deleted: other images may share them
+    with transaction.atomic():
+        image_instance.variants.all().delete()
+        PropertyImageVariant.objects.bulk_create(variants)
+        # bulk_create sends no post_save, so take the references here
+        retain(*(variant.file.name for variant in variants))
+    return variants
+
+
+def reuse_processed_twin(image_instance):
+    """
+    When the same bytes were uploaded and processed before (the stored name is
+    the content digest), points this image at that thumbnail and those
+    variant files instead of rendering again. Returns the variants, or None.
+    """
+    twin = (
+        PropertyImage.objects.filter(image=image_instance.image.name)
+        .exclude(pk=image_instance.pk)
+        .exclude(thumbnail='').exclude(thumbnail__isnull=True)
+        .filter(pk__in=PropertyImageVariant.objects.values('image'))
+        .first()
+    )
+    if twin is None:
+        return None
+    image_instance.thumbnail.name = twin.thumbnail.name
+    fields = {
+        **hash_fields(None if twin.dhash is None else to_unsigned(twin.dhash)),
+        'blurhash': twin.blurhash, 'dominant_color': twin.dominant_color,
+    }
+    for name, value in fields.items():
+        setattr(image_instance, name, value)
+    image_instance.save(update_fields=['thumbnail', *fields])
+    return replace_variants(image_instance, [
+        PropertyImageVariant(
+            image=image_instance, file=variant.file.name, format=variant.format,
+            width=variant.width, height=variant.height, size=variant.size
+        )
+        for variant in twin.variants.all()
+    ])
+
+
+def generate_image_variants(image_instance):
+    """
+    Renders and stores the thumbnail and every configured width x format of
+    a PropertyImage, replacing its variant rows, unless an identical upload
+    was processed already. Returns the variants created.
+    """
+    reused = reuse_processed_twin(image_instance)
+    if reused is not None:
+        return reused
+    with image_instance.image.open('rb') as source:
+        rendered = render_image(source)
+    return store_rendered(image_instance, rendered)
+
+
+def _image_source(image_instance):
+    # Workers open local files themselves; other storages are read here
+    try:
+        return image_instance.image.path
+    except NotImplementedError:
+        with image_instance.image.open('rb') as source:
+            return source.read()
+
+
+def _limit_worker_memory():
+    # Headroom on top of what the forked worker already maps
+    try:
+        with open('/proc/self/statm') as statm:
+            mapped = int(statm.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        return
+    limit = mapped + get_image_variants_setting('WORKER_MEMORY_MB') * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def regenerate_image_variants(images, workers=None):
+    """
+    Batch (re)rendering. CPU-bound resizing and encoding run in a process
+    pool of memory-limited, periodically recycled workers; results are stored
+    here. Daemonic processes (Celery prefork workers) cannot start a pool, so
+    they render in-process instead. Returns (images done, failures, peak RSS KiB).
+    """
+    images = list(images)
+    workers = workers or get_image_variants_setting('WORKERS') or os.cpu_count()
+    done, failures, peak = 0, 0, 0
+
+    def store(image_instance, rendered):
+        nonlocal done, peak
+        store_rendered(image_instance, rendered)
+        done += 1
+        peak = max(peak, rendered['peak_rss_kb'])
+
+    if multiprocessing.current_process().daemon or workers <= 1:
+        for image_instance in images:
+            try:
+                with image_instance.image.open('rb') as source:
+                    store(image_instance, render_image(source))
+            except Exception as e:
+                failures += 1
+                logger.warning(f"Could not render PropertyImage ID {image_instance.pk}: {e}")
+        return done, failures, peak
+
+    def collect(finished):
+        nonlocal failures
+        for future in finished:
+            image_instance = pending.pop(future)
+            try:
+                store(image_instance, future.result())
+            except Exception as e:
+                failures += 1
+                logger.warning(f"Could not render PropertyImage ID {image_instance.pk}: {e}")
+
+    # Workers are forked (they inherit the configured Django process) and
+    # recycled by starting a fresh pool every TASKS_PER_WORKER images each
+    pending = {}
+    generation = workers * get_image_variants_setting('TASKS_PER_WORKER')
+    for start in range(0, len(images), generation):
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_limit_worker_memory,
+        ) as pool:
+            for image_instance in images[start:start + generation]:
+                pending[pool.submit(render_image, _image_source(image_instance))] = image_instance
+                # Keep only a couple of sources per worker in flight
+                if len(pending) >= workers * 2:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            collect(list(pending))
+    return done, failures, peak
+
+
+def build_srcset(image_instance, request):
+    """
+    {format: "url 320w, url 640w, ..."} from the (prefetched) variants of an
+    image, ready for <source srcset> / <img srcset>.
+    """
+    srcset = {}
+    for variant in sorted(image_instance.variants.all(), key=lambda v: v.width):
+        srcset.setdefault(variant.format, []).append(
+            f"{request.build_absolute_uri(variant.file.url)} {variant.width}w"
+        )
+    return {fmt: ', '.join(entries) for fmt, entries in srcset.items()}
@@ -0,0 +1,27 @@
+# backend/properties/management/commands/regenerate_image_variants.py
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from properties.imaging import regenerate_image_variants
+from properties.models import PropertyImage
+
+
+class Command(BaseCommand):
+    help = 'Re-renders thumbnails and responsive variants of property images using a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--property', type=int, help='Only images of this property ID.')
+        parser.add_argument('--missing', action='store_true', help='Only images without variants, perceptual hash or placeholder.')
+        parser.add_argument('--workers', type=int, help='Pool size (default: IMAGE_VARIANTS WORKERS, else CPU count).')
+
+    def handle(self, *args, **options):
+        images = PropertyImage.objects.exclude(image='').order_by('pk')
+        if options['property']:
+            images = images.filter(property_id=options['property'])
+        if options['missing']:
+            images = images.filter(Q(variants__isnull=True) | Q(dhash__isnull=True) | Q(blurhash='')).distinct()
+
+        done, failures, peak = regenerate_image_variants(images.iterator(), workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Regenerated {done} images ({failures} failed); peak worker RSS {peak} KiB.'
+        ))
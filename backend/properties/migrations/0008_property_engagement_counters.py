@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:07
+
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_engagement_counters(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    UserFavorite = apps.get_model('core', 'UserFavorite')
+    PropertyInterest = apps.get_model('properties', 'PropertyInterest')
+
+    favorites = UserFavorite.objects.filter(property=OuterRef('pk')).order_by().values('property')
+    interests = PropertyInterest.objects.filter(property=OuterRef('pk')).order_by().values('property')
+    Property.objects.update(
+        favorites_count=Coalesce(Subquery(favorites.annotate(n=Count('pk')).values('n')), Value(0)),
+        interests_count=Coalesce(Subquery(interests.annotate(n=Count('pk')).values('n')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_userdevice_fingerprint'),
+        ('properties', '0007_property_properties__price_32e7c2_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Favorites Count'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='interests_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Interests Count'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(models.OrderBy(django.db.models.expressions.CombinedExpression(models.F('favorites_count'), '+', models.F('interests_count')), descending=True), models.OrderBy(models.F('created_at'), descending=True), name='property_popularity_idx'),
+        ),
+        migrations.RunPython(backfill_engagement_counters, migrations.RunPython.noop),
+    ]
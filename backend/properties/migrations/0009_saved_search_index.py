@@ -0,0 +1,103 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:10
+
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def compile_search_parameters(params):
+    # Frozen copy of properties.alerts.compile_search_parameters as of this migration
+    params = params if isinstance(params, dict) else {}
+    compiled = {
+        'city': (params.get('city') or '').strip().lower()[:100],
+        'property_type': str(params.get('property_type') or '')[:20],
+        'listing_type': str(params.get('listing_type') or '')[:10],
+    }
+    for key, cast in (('min_price', Decimal), ('max_price', Decimal), ('min_bedrooms', int), ('max_bedrooms', int)):
+        value = params.get(key)
+        try:
+            compiled[key] = cast(value) if value not in (None, '') else None
+        except (TypeError, ValueError, InvalidOperation):
+            compiled[key] = None
+    return compiled
+
+
+def index_existing_saved_searches(apps, schema_editor):
+    UserFavorite = apps.get_model('core', 'UserFavorite')
+    SavedSearchIndex = apps.get_model('properties', 'SavedSearchIndex')
+    favorites = UserFavorite.objects.filter(search_parameters__isnull=False).iterator()
+    SavedSearchIndex.objects.bulk_create(
+        [
+            SavedSearchIndex(
+                favorite_id=favorite.pk,
+                user_id=favorite.user_id,
+                **compile_search_parameters(favorite.search_parameters)
+            )
+            for favorite in favorites if favorite.search_parameters
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_userdevice_fingerprint'),
+        ('properties', '0008_property_engagement_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearchIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(blank=True, max_length=100, verbose_name='City')),
+                ('property_type', models.CharField(blank=True, max_length=20, verbose_name='Type')),
+                ('listing_type', models.CharField(blank=True, max_length=10, verbose_name='Listing Type')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Min Price')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Max Price')),
+                ('min_bedrooms', models.IntegerField(blank=True, null=True, verbose_name='Min Bedrooms')),
+                ('max_bedrooms', models.IntegerField(blank=True, null=True, verbose_name='Max Bedrooms')),
+                ('favorite', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_index', to='core.userfavorite')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_search_indexes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Saved Search Index',
+                'verbose_name_plural': 'Saved Search Indexes',
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSearchMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('notified_at', models.DateTimeField(blank=True, null=True, verbose_name='Notified at')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_search_matches', to='properties.property')),
+                ('search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='properties.savedsearchindex')),
+            ],
+            options={
+                'verbose_name': 'Saved Search Match',
+                'verbose_name_plural': 'Saved Search Matches',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='savedsearchindex',
+            index=models.Index(fields=['city', 'property_type', 'listing_type'], name='properties__city_f45c8c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedsearchindex',
+            index=models.Index(fields=['min_price', 'max_price'], name='properties__min_pri_bae749_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedsearchmatch',
+            index=models.Index(fields=['notified_at', 'search'], name='properties__notifie_838616_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='savedsearchmatch',
+            unique_together={('search', 'property')},
+        ),
+        migrations.RunPython(index_existing_saved_searches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0009_saved_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertySimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rank')),
+                ('score', models.FloatField(verbose_name='Score')),
+                ('source', models.CharField(choices=[('co_interest', 'Co-interest'), ('attributes', 'Attributes')], max_length=12, verbose_name='Source')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='properties.property')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='properties.property')),
+            ],
+            options={
+                'verbose_name': 'Property Similarity',
+                'verbose_name_plural': 'Property Similarities',
+                'unique_together': {('property', 'rank')},
+            },
+        ),
+    ]
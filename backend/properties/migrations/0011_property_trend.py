@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_property_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyTrend',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='properties.property')),
+                ('score', models.FloatField(default=0, verbose_name='Score')),
+                ('rank', models.PositiveIntegerField(blank=True, null=True, verbose_name='Rank')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+            ],
+            options={
+                'verbose_name': 'Property Trend',
+                'verbose_name_plural': 'Property Trends',
+                'indexes': [models.Index(fields=['rank'], name='properties__rank_69c1bb_idx')],
+            },
+        ),
+    ]
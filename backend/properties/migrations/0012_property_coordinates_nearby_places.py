@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_userdevice_fingerprint'),
+        ('properties', '0011_property_trend'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Longitude'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='places_computed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Places computed at'),
+        ),
+        migrations.AddField(
+            model_name='propertyplaceofinterest',
+            name='auto_computed',
+            field=models.BooleanField(default=False, verbose_name='Computed'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['latitude', 'longitude'], name='properties__latitud_6eb2b0_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:18
+
+import math
+
+from django.db import migrations, models
+
+
+# Frozen copies of properties.tiles.QUADKEY_ZOOM / quadkey_for as of this migration
+QUADKEY_ZOOM = 20
+MAX_LATITUDE = 85.05112878
+
+
+def quadkey_for(latitude, longitude):
+    latitude = min(max(float(latitude), -MAX_LATITUDE), MAX_LATITUDE)
+    n = 2 ** QUADKEY_ZOOM
+    sin_lat = math.sin(math.radians(latitude))
+    x = min(max(int((float(longitude) + 180.0) / 360.0 * n), 0), n - 1)
+    y = min(max(int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n), 0), n - 1)
+    digits = []
+    for level in range(QUADKEY_ZOOM, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def assign_quadkeys(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    located = Property.objects.filter(latitude__isnull=False, longitude__isnull=False).only('latitude', 'longitude')
+    properties = list(located)
+    for property in properties:
+        property.quadkey = quadkey_for(property.latitude, property.longitude)
+    Property.objects.bulk_update(properties, ['quadkey'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0012_property_coordinates_nearby_places'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='quadkey',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='Quadkey'),
+        ),
+        migrations.RunPython(assign_quadkeys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0013_property_quadkey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.ImageField(upload_to='property_image_variants/', verbose_name='File')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10, verbose_name='Format')),
+                ('width', models.PositiveIntegerField(verbose_name='Width')),
+                ('height', models.PositiveIntegerField(verbose_name='Height')),
+                ('size', models.PositiveIntegerField(verbose_name='Size (bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='properties.propertyimage')),
+            ],
+            options={
+                'verbose_name': 'Property Image Variant',
+                'verbose_name_plural': 'Property Image Variants',
+                'ordering': ['image', 'format', 'width'],
+                'unique_together': {('image', 'width', 'format')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:26
+
+import core.media_store
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0014_property_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='image',
+            field=models.ImageField(storage=core.media_store.get_content_addressed_storage, upload_to='property_images/', verbose_name='Image'),
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, storage=core.media_store.get_content_addressed_storage, upload_to='property_thumbnails/', verbose_name='Thumbnail'),
+        ),
+        migrations.AlterField(
+            model_name='propertyimagevariant',
+            name='file',
+            field=models.ImageField(storage=core.media_store.get_content_addressed_storage, upload_to='property_image_variants/', verbose_name='File'),
+        ),
+        migrations.AlterField(
+            model_name='propertyvideo',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, storage=core.media_store.get_content_addressed_storage, upload_to='video_thumbnails/', verbose_name='Video Thumbnail'),
+        ),
+        migrations.AlterField(
+            model_name='propertyvideo',
+            name='video_file',
+            field=models.FileField(storage=core.media_store.get_content_addressed_storage, upload_to='property_videos/', verbose_name='Video'),
+        ),
+    ]
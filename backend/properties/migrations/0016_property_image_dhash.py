@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0015_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='dhash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Perceptual Hash'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='dhash_block_0',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='dhash_block_1',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='dhash_block_2',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='dhash_block_3',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='propertyimage',
+            index=models.Index(fields=['dhash_block_0'], name='properties__dhash_b_71bbf5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyimage',
+            index=models.Index(fields=['dhash_block_1'], name='properties__dhash_b_d8c33c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyimage',
+            index=models.Index(fields=['dhash_block_2'], name='properties__dhash_b_c6b31c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyimage',
+            index=models.Index(fields=['dhash_block_3'], name='properties__dhash_b_367997_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:31
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0016_property_image_dhash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('image', 'Image'), ('video', 'Video')], max_length=10, verbose_name='Kind')),
+                ('filename', models.CharField(max_length=255, verbose_name='Filename')),
+                ('total_size', models.PositiveBigIntegerField(verbose_name='Total Size (bytes)')),
+                ('received', models.PositiveBigIntegerField(default=0, verbose_name='Received (bytes)')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='Detected Content Type')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('complete', 'Complete'), ('aborted', 'Aborted')], default='open', max_length=10, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('expires_at', models.DateTimeField(verbose_name='Expires at')),
+                ('image', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='properties.propertyimage')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='properties.property')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+                ('video', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='properties.propertyvideo')),
+            ],
+            options={
+                'verbose_name': 'Upload Session',
+                'verbose_name_plural': 'Upload Sessions',
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='properties__status_b4067a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0017_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyvideo',
+            name='hls_playlist',
+            field=models.FileField(blank=True, max_length=255, upload_to='video_streams/', verbose_name='HLS Playlist'),
+        ),
+        migrations.AddField(
+            model_name='propertyvideo',
+            name='processing_error',
+            field=models.TextField(blank=True, verbose_name='Processing Error'),
+        ),
+        migrations.AddField(
+            model_name='propertyvideo',
+            name='processing_progress',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Processing Progress (%)'),
+        ),
+        migrations.AddField(
+            model_name='propertyvideo',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20, verbose_name='Processing Status'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0018_video_streaming'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='blurhash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='BlurHash'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='dominant_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Dominant Color'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0019_image_placeholders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyTrendFold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('folded_through', models.BigIntegerField(verbose_name='Folded through bucket')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+            ],
+            options={
+                'verbose_name': 'Property Trend Fold',
+                'verbose_name_plural': 'Property Trend Folds',
+            },
+        ),
+    ]
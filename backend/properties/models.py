@@ -1,11 +1,15 @@
 # properties/models.py
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from core.models import User, Agency
+from core.filetypes import detect_file_mime
+from core.media_store import get_content_addressed_storage
 from datetime import date
-import magic
+import uuid
 
 
 class PlaceOfInterest(models.Model):
@@ -36,6 +40,28 @@ class PlaceOfInterest(models.Model):
         verbose_name_plural = _('Places of Interest')
 
 
+class PropertyQuerySet(models.QuerySet):
+    def adjust_engagement(self, property_id, favorites=0, interests=0):
+        """
+        Shifts the denormalized favorites/interests counters of one property
+        with a single UPDATE; counters never drop below zero.
+        """
+        changes = {}
+        if favorites:
+            changes['favorites_count'] = Greatest(F('favorites_count') + favorites, 0)
+        if interests:
+            changes['interests_count'] = Greatest(F('interests_count') + interests, 0)
+        if not changes or property_id is None:
+            return 0
+        return self.filter(pk=property_id).update(**changes)
+
+    def with_popularity(self):
+        return self.annotate(popularity=F('favorites_count') + F('interests_count'))
+
+    def popular(self):
+        return self.with_popularity().order_by('-popularity', '-created_at')
+
+
 class Property(models.Model):
     PROPERTY_TYPES = [
         ('apartment', _('Apartment')),
@@ -70,6 +96,10 @@ class Property(models.Model):
     city = models.CharField(_('City'), max_length=100)
     state = models.CharField(_('State'), max_length=100)
     zip_code = models.CharField(_('Zip Code'), max_length=20)
+    latitude = models.DecimalField(_('Latitude'), max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(_('Longitude'), max_digits=9, decimal_places=6, null=True, blank=True)
+    # Quadtree cell of the coordinates (see properties.tiles); a map tile is a key prefix
+    quadkey = models.CharField(_('Quadkey'), max_length=20, blank=True, db_index=True, editable=False)
 
 
     # Pricing & Measurements
@@ -86,15 +116,35 @@ class Property(models.Model):
     places_of_interest = models.ManyToManyField(PlaceOfInterest, through='PropertyPlaceOfInterest', related_name='properties')
 
 
+    # Engagement counters, kept in step by the favorite/interest endpoints and
+    # reconciled periodically by reconcile_property_engagement_task
+    favorites_count = models.PositiveIntegerField(_('Favorites Count'), default=0)
+    interests_count = models.PositiveIntegerField(_('Interests Count'), default=0)
+
+
     # Timestamps
     created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
+    # Set by the nearby places job; an older value than updated_at means stale
+    places_computed_at = models.DateTimeField(_('Places computed at'), null=True, blank=True, editable=False)
+
+    objects = PropertyQuerySet.as_manager()
 
 
     def __str__(self):
         return f"{self.title} ({self.get_property_type_display()})"
 
 
+    def save(self, *args, **kwargs):
+        from .tiles import quadkey_for
+
+        self.quadkey = quadkey_for(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'quadkey'}
+        super().save(*args, **kwargs)
+
+
     def clean(self):
         super().clean()  # Always call super().clean()
         if self.listing_type == 'rent' and self.status == 'sold':
@@ -111,6 +161,11 @@ class Property(models.Model):
             models.Index(fields=['price']),  # Index on price
             models.Index(fields=['city']),  # Index on city
             models.Index(fields=['property_type', 'status']), #複合索引
+            models.Index(fields=['latitude', 'longitude']),
+            models.Index(
+                (F('favorites_count') + F('interests_count')).desc(), F('created_at').desc(),
+                name='property_popularity_idx'
+            ),
         ]
 
 
@@ -118,6 +173,8 @@ class PropertyPlaceOfInterest(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='property_places')
     place = models.ForeignKey(PlaceOfInterest, on_delete=models.CASCADE)
     distance = models.DecimalField(_('Distance (miles)'), max_digits=5, decimal_places=1)
+    # Rows written by the nearby places job; hand-entered rows are never pruned
+    auto_computed = models.BooleanField(_('Computed'), default=False)
 
 
     class Meta:
@@ -132,9 +189,21 @@ class PropertyPlaceOfInterest(models.Model):
 
 class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(_('Image'), upload_to='property_images/')
-    thumbnail = models.ImageField(_('Thumbnail'), upload_to='property_thumbnails/', null=True, blank=True)
+    image = models.ImageField(_('Image'), upload_to='property_images/', storage=get_content_addressed_storage)
+    thumbnail = models.ImageField(
+        _('Thumbnail'), upload_to='property_thumbnails/', storage=get_content_addressed_storage, null=True, blank=True
+    )
     is_primary = models.BooleanField(_('Primary Image'), default=False)
+    # 64-bit difference hash (signed), split into four 16-bit blocks for
+    # multi-index near-duplicate lookups (see properties.duplicates)
+    dhash = models.BigIntegerField(_('Perceptual Hash'), null=True, blank=True, editable=False)
+    dhash_block_0 = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    dhash_block_1 = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    dhash_block_2 = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    dhash_block_3 = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Shown while the image loads (see properties.placeholders)
+    blurhash = models.CharField(_('BlurHash'), max_length=64, blank=True, editable=False)
+    dominant_color = models.CharField(_('Dominant Color'), max_length=7, blank=True, editable=False)
     created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
 
 
@@ -145,11 +214,8 @@ class PropertyImage(models.Model):
     def clean(self):
         super().clean()  # Always call super().clean()
         if self.image:
-            mime = magic.Magic(mime=True)
-            file_mime = mime.from_buffer(self.image.read(2048))  # Read the first 2048 bytes
-            if file_mime not in ['image/jpeg', 'image/png', 'image/gif']:
+            if detect_file_mime(self.image) not in ['image/jpeg', 'image/png', 'image/gif']:
                 raise ValidationError(_('Only JPEG, PNG, and GIF images are allowed.'))
-            self.image.seek(0)  # Reset file pointer after reading
 
 
         if self.is_primary:
@@ -164,13 +230,62 @@ class PropertyImage(models.Model):
     class Meta:
         verbose_name = _('Property Image')
         verbose_name_plural = _('Property Images')
+        indexes = [
+            models.Index(fields=['dhash_block_0']),
+            models.Index(fields=['dhash_block_1']),
+            models.Index(fields=['dhash_block_2']),
+            models.Index(fields=['dhash_block_3']),
+        ]
+
+
+class PropertyImageVariant(models.Model):
+    FORMATS = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    image = models.ForeignKey(PropertyImage, on_delete=models.CASCADE, related_name='variants')
+    file = models.ImageField(_('File'), upload_to='property_image_variants/', storage=get_content_addressed_storage)
+    format = models.CharField(_('Format'), max_length=10, choices=FORMATS)
+    width = models.PositiveIntegerField(_('Width'))
+    height = models.PositiveIntegerField(_('Height'))
+    size = models.PositiveIntegerField(_('Size (bytes)'))
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+
+
+    def __str__(self):
+        return f"{self.width}w {self.format} variant of image {self.image_id}"
+
+
+    class Meta:
+        unique_together = ('image', 'width', 'format')
+        ordering = ['image', 'format', 'width']
+        verbose_name = _('Property Image Variant')
+        verbose_name_plural = _('Property Image Variants')
 
 
 class PropertyVideo(models.Model):
+    PROCESSING_STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('processing', _('Processing')),
+        ('ready', _('Ready')),
+        ('failed', _('Failed')),
+    ]
+
+
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='videos')
-    video_file = models.FileField(_('Video'), upload_to='property_videos/')
-    thumbnail = models.ImageField(_('Video Thumbnail'), upload_to='video_thumbnails/', null=True, blank=True)
+    video_file = models.FileField(_('Video'), upload_to='property_videos/', storage=get_content_addressed_storage)
+    thumbnail = models.ImageField(
+        _('Video Thumbnail'), upload_to='video_thumbnails/', storage=get_content_addressed_storage, null=True, blank=True
+    )
     duration = models.PositiveIntegerField(_('Duration (seconds)'), blank=True, null=True)
+    # HLS master playlist; its rendition playlists and segments sit beside it
+    hls_playlist = models.FileField(_('HLS Playlist'), upload_to='video_streams/', max_length=255, blank=True)
+    processing_status = models.CharField(
+        _('Processing Status'), max_length=20, choices=PROCESSING_STATUS_CHOICES, default='pending', db_index=True
+    )
+    processing_progress = models.PositiveSmallIntegerField(_('Processing Progress (%)'), default=0)
+    processing_error = models.TextField(_('Processing Error'), blank=True)
     created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
 
@@ -187,6 +302,8 @@ class PropertyVideo(models.Model):
                 raise ValidationError(_('Maximum video file size is 500MB'))
             if not self.video_file.name.lower().endswith(('.mp4', '.mov')):
                 raise ValidationError(_('Only MP4 and MOV files are allowed'))
+            if detect_file_mime(self.video_file) not in ['video/mp4', 'video/quicktime']:
+                raise ValidationError(_('Only MP4 and MOV files are allowed'))
 
 
     class Meta:
@@ -295,4 +412,176 @@ class PropertyInterest(models.Model):
 
 
     def __str__(self):
-        return f"{self.user.username} - {self.property.title}"
\ No newline at end of file
+        return f"{self.user.username} - {self.property.title}"
+
+
+class SavedSearchIndex(models.Model):
+    """
+    A saved search (UserFavorite.search_parameters) compiled into indexed
+    predicate columns. Blank/null columns mean "any", so the searches that
+    can match a property are found with one indexed query instead of
+    re-running every saved search.
+    """
+    favorite = models.OneToOneField(
+        'core.UserFavorite',
+        on_delete=models.CASCADE,
+        related_name='search_index'
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_search_indexes')
+    city = models.CharField(_('City'), max_length=100, blank=True)
+    property_type = models.CharField(_('Type'), max_length=20, blank=True)
+    listing_type = models.CharField(_('Listing Type'), max_length=10, blank=True)
+    min_price = models.DecimalField(_('Min Price'), max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(_('Max Price'), max_digits=10, decimal_places=2, null=True, blank=True)
+    min_bedrooms = models.IntegerField(_('Min Bedrooms'), null=True, blank=True)
+    max_bedrooms = models.IntegerField(_('Max Bedrooms'), null=True, blank=True)
+
+
+    class Meta:
+        verbose_name = _('Saved Search Index')
+        verbose_name_plural = _('Saved Search Indexes')
+        indexes = [
+            models.Index(fields=['city', 'property_type', 'listing_type']),
+            models.Index(fields=['min_price', 'max_price']),
+        ]
+
+
+    def __str__(self):
+        return f"Saved search {self.favorite_id} for {self.user}"
+
+
+class SavedSearchMatch(models.Model):
+    """A property that matched a saved search, pending inclusion in a digest."""
+    search = models.ForeignKey(SavedSearchIndex, on_delete=models.CASCADE, related_name='matches')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='saved_search_matches')
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+    notified_at = models.DateTimeField(_('Notified at'), null=True, blank=True)
+
+
+    class Meta:
+        unique_together = ('search', 'property')
+        verbose_name = _('Saved Search Match')
+        verbose_name_plural = _('Saved Search Matches')
+        indexes = [
+            models.Index(fields=['notified_at', 'search']),
+        ]
+
+
+    def __str__(self):
+        return f"{self.property.title} matched search {self.search_id}"
+
+
+class PropertySimilarity(models.Model):
+    """
+    Precomputed top-K neighbours of a property, ranked from co-interest
+    (users who favourited or registered interest in both) with attribute
+    similarity filling the remaining slots. Rebuilt by
+    compute_property_similarity_task.
+    """
+    SOURCES = [
+        ('co_interest', _('Co-interest')),
+        ('attributes', _('Attributes')),
+    ]
+
+
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField(_('Rank'))
+    score = models.FloatField(_('Score'))
+    source = models.CharField(_('Source'), max_length=12, choices=SOURCES)
+
+
+    class Meta:
+        unique_together = ('property', 'rank')
+        verbose_name = _('Property Similarity')
+        verbose_name_plural = _('Property Similarities')
+
+
+    def __str__(self):
+        return f"{self.similar_id} is #{self.rank} similar to {self.property_id}"
+
+
+class PropertyTrend(models.Model):
+    """
+    Exponentially decayed view score of a recently viewed property and its
+    precomputed trending rank. Only properties with a non-negligible score
+    have a row; maintained by fold_property_views_task.
+    """
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='trend')
+    score = models.FloatField(_('Score'), default=0)
+    rank = models.PositiveIntegerField(_('Rank'), null=True, blank=True)
+    updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
+
+
+    class Meta:
+        verbose_name = _('Property Trend')
+        verbose_name_plural = _('Property Trends')
+        indexes = [
+            models.Index(fields=['rank']),
+        ]
+
+
+    def __str__(self):
+        return f"{self.property_id}: {self.score:.2f} (#{self.rank})"
+
+
+class PropertyTrendFold(models.Model):
+    """
+    Last view bucket folded into PropertyTrend. A single row, written in the
+    same transaction as the trends so no bucket is ever folded twice.
+    """
+    folded_through = models.BigIntegerField(_('Folded through bucket'))
+    updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
+
+
+    class Meta:
+        verbose_name = _('Property Trend Fold')
+        verbose_name_plural = _('Property Trend Folds')
+
+
+    def __str__(self):
+        return f"Folded through bucket {self.folded_through}"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload of a property image or video (see
+    properties.uploads). Chunks are appended to a partial file on disk; the
+    media row is created when the upload is finalized.
+    """
+    KINDS = [
+        ('image', _('Image')),
+        ('video', _('Video')),
+    ]
+    STATUS_CHOICES = [
+        ('open', _('Open')),
+        ('complete', _('Complete')),
+        ('aborted', _('Aborted')),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='upload_sessions')
+    kind = models.CharField(_('Kind'), max_length=10, choices=KINDS)
+    filename = models.CharField(_('Filename'), max_length=255)
+    total_size = models.PositiveBigIntegerField(_('Total Size (bytes)'))
+    received = models.PositiveBigIntegerField(_('Received (bytes)'), default=0)
+    content_type = models.CharField(_('Detected Content Type'), max_length=100, blank=True)
+    status = models.CharField(_('Status'), max_length=10, choices=STATUS_CHOICES, default='open')
+    image = models.ForeignKey(PropertyImage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    video = models.ForeignKey(PropertyVideo, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
+    expires_at = models.DateTimeField(_('Expires at'))
+
+
+    class Meta:
+        verbose_name = _('Upload Session')
+        verbose_name_plural = _('Upload Sessions')
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+
+    def __str__(self):
+        return f"{self.kind} upload {self.filename} ({self.received}/{self.total_size})"
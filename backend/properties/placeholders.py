@@ -0,0 +1,88 @@
+# backend/properties/placeholders.py
+import math
+
+import numpy as np
+from PIL import Image as PillowImage
+
+
+BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+# Horizontal x vertical cosine components: a 28 character hash
+COMPONENTS = (4, 3)
+# Longest side the image is shrunk to first; more pixels add nothing to a blur
+SAMPLE_SIZE = 32
+
+
+def _base83(value, length):
+    return ''.join(BASE83[(value // 83 ** (length - 1 - i)) % 83] for i in range(length))
+
+
+def _to_linear(srgb):
+    value = srgb / 255
+    return np.where(value <= 0.04045, value / 12.92, ((value + 0.055) / 1.055) ** 2.4)
+
+
+def _to_srgb(linear):
+    value = min(max(linear, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sample(img):
+    sample = img.convert('RGB')
+    scale = SAMPLE_SIZE / max(sample.size)
+    if scale < 1:
+        size = (max(round(sample.width * scale), 1), max(round(sample.height * scale), 1))
+        sample = sample.resize(size, PillowImage.BILINEAR)
+    return sample
+
+
+def blurhash(img, components=COMPONENTS):
+    """
+    BlurHash (https://blurha.sh) of an image: the average colour plus a few
+    low-frequency cosine components, base83-encoded. Clients decode it to
+    a blurred placeholder of any size while the real image loads.
+    """
+    x_components, y_components = components
+    linear = _to_linear(np.asarray(_sample(img), dtype=np.float64))
+    height, width = linear.shape[:2]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            basis = np.outer(np.cos(np.pi * j * np.arange(height) / height), np.cos(np.pi * i * np.arange(width) / width))
+            scale = (1 if i == j == 0 else 2) / (width * height)
+            factors.append(scale * np.tensordot(basis, linear, axes=([0, 1], [0, 1])))
+    dc, ac = factors[0], factors[1:]
+
+    encoded = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = int(max(0, min(82, math.floor(max(abs(v) for f in ac for v in f) * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        encoded += _base83(quantised_max, 1)
+    else:
+        maximum = 1
+        encoded += _base83(0, 1)
+    encoded += _base83((_to_srgb(dc[0]) << 16) + (_to_srgb(dc[1]) << 8) + _to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (
+            int(max(0, min(18, math.floor(math.copysign(abs(v / maximum) ** 0.5, v) * 9 + 9.5))))
+            for v in factor
+        )
+        encoded += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return encoded
+
+
+def dominant_color(img):
+    """'#rrggbb' of the largest colour cluster (median cut), not the muddy mean."""
+    palette_image = _sample(img).quantize(colors=5, method=PillowImage.Quantize.MEDIANCUT)
+    _, index = max(palette_image.getcolors())
+    r, g, b = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def placeholder_fields(img):
+    """PropertyImage field values for an (opaque RGB) image, or blanks for None."""
+    if img is None:
+        return {'blurhash': '', 'dominant_color': ''}
+    return {'blurhash': blurhash(img), 'dominant_color': dominant_color(img)}
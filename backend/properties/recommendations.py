@@ -0,0 +1,172 @@
+# backend/properties/recommendations.py
+import numpy as np
+from django.db import transaction
+
+from core.models import UserFavorite
+from .models import Property, PropertyInterest, PropertySimilarity
+
+
+TOP_K = 10
+# Only the most recent interactions of very active users are counted; a
+# basket of n items contributes n * n pairs
+MAX_BASKET = 200
+# Attribute neighbours are scored below any co-interest neighbour
+ATTRIBUTE_SCORE_SCALE = 0.1
+# Attribute distances are computed for this many targets at a time, bounding
+# the matrix at TARGET_CHUNK x block size
+TARGET_CHUNK = 512
+
+
+def load_interactions():
+    """
+    (user_ids, property_ids) arrays of distinct user/property pairs from
+    property interests and property favourites, newest first per user.
+    """
+    pairs = {}
+    sources = (
+        PropertyInterest.objects.values_list('user_id', 'property_id', 'created_at'),
+        UserFavorite.objects.filter(property__isnull=False).values_list('user_id', 'property_id', 'created_at'),
+    )
+    for rows in sources:
+        for user_id, property_id, created_at in rows.iterator():
+            key = (user_id, property_id)
+            if key not in pairs or pairs[key] < created_at:
+                pairs[key] = created_at
+
+    ordered = sorted(pairs.items(), key=lambda item: (item[0][0], item[1]), reverse=True)
+    users = np.fromiter((user_id for (user_id, _), _ in ordered), dtype=np.int64, count=len(ordered))
+    items = np.fromiter((property_id for (_, property_id), _ in ordered), dtype=np.int64, count=len(ordered))
+    return users, items
+
+
+def co_interest_neighbours(users, items, top_k=TOP_K, max_basket=MAX_BASKET):
+    """
+    Item-item cosine similarity over the binary user x property matrix,
+    computed sparsely: only pairs that actually co-occur in some user's
+    basket are materialised. Returns {property_id: [(neighbour_id, score)]}.
+    """
+    if not len(items):
+        return {}
+
+    item_ids, item_index = np.unique(items, return_inverse=True)
+    _, user_index = np.unique(users, return_inverse=True)
+
+    # Rows arrive grouped by user (newest first); keep at most max_basket per user
+    starts = np.flatnonzero(np.r_[True, user_index[1:] != user_index[:-1]])
+    sizes = np.diff(np.r_[starts, len(user_index)])
+    position = np.arange(len(user_index)) - np.repeat(starts, sizes)
+    keep = position < max_basket
+    user_index, item_index = user_index[keep], item_index[keep]
+    starts = np.flatnonzero(np.r_[True, user_index[1:] != user_index[:-1]])
+    sizes = np.diff(np.r_[starts, len(user_index)])
+
+    # Every ordered pair (p, q) of positions inside one basket
+    squares = sizes * sizes
+    pair_group = np.repeat(np.arange(len(sizes)), squares)
+    pair_offset = np.arange(squares.sum()) - np.repeat(np.cumsum(squares) - squares, squares)
+    group_size = sizes[pair_group]
+    left = starts[pair_group] + pair_offset // group_size
+    right = starts[pair_group] + pair_offset % group_size
+    a, b = item_index[left], item_index[right]
+    distinct = a != b
+    a, b = a[distinct], b[distinct]
+    if not len(a):
+        return {}
+
+    n_items = len(item_ids)
+    keys, counts = np.unique(a * n_items + b, return_counts=True)
+    a, b = keys // n_items, keys % n_items
+    degree = np.bincount(item_index, minlength=n_items).astype(np.float64)
+    scores = counts / np.sqrt(degree[a] * degree[b])
+
+    # Best top_k per item: sort by item, then score descending, then rank in group
+    order = np.lexsort((-scores, a))
+    a, b, scores = a[order], b[order], scores[order]
+    group_start = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+    group_sizes = np.diff(np.r_[group_start, len(a)])
+    rank = np.arange(len(a)) - np.repeat(group_start, group_sizes)
+    top = rank < top_k
+
+    neighbours = {}
+    for i, j, score in zip(item_ids[a[top]], item_ids[b[top]], scores[top]):
+        neighbours.setdefault(int(i), []).append((int(j), float(score)))
+    return neighbours
+
+
+def attribute_neighbours(property_ids, top_k=TOP_K):
+    """
+    Cold-start neighbours for `property_ids` among available listings in the
+    same city and of the same type, closest by log price and bedrooms.
+    Returns {property_id: [(neighbour_id, score)]} with scores in (0, 1].
+    """
+    wanted = set(property_ids)
+    rows = list(
+        Property.objects.filter(status='available')
+        .values_list('pk', 'city', 'property_type', 'price', 'bedrooms')
+    )
+    blocks = {}
+    for pk, city, property_type, price, bedrooms in rows:
+        blocks.setdefault((city.strip().lower(), property_type), []).append((pk, float(price), bedrooms))
+
+    neighbours = {}
+    for block in blocks.values():
+        ids = np.array([row[0] for row in block], dtype=np.int64)
+        targets = np.flatnonzero(np.isin(ids, list(wanted)))
+        if not len(targets) or len(ids) < 2:
+            continue
+        log_price = np.log1p(np.array([row[1] for row in block]))
+        bedrooms = np.array([row[2] for row in block], dtype=np.float64)
+
+        limit = min(top_k, len(ids) - 1)
+        for start in range(0, len(targets), TARGET_CHUNK):
+            chunk = targets[start:start + TARGET_CHUNK]
+            chunk_rows = np.arange(len(chunk))
+            distance = (
+                np.abs(log_price[chunk, None] - log_price[None, :])
+                + 0.25 * np.abs(bedrooms[chunk, None] - bedrooms[None, :])
+            )
+            distance[chunk_rows, chunk] = np.inf
+            # Select the k nearest, then order only those k columns
+            nearest = np.argpartition(distance, limit - 1, axis=1)[:, :limit]
+            nearest_distance = distance[chunk_rows[:, None], nearest]
+            order = np.lexsort((nearest, nearest_distance))
+            nearest = np.take_along_axis(nearest, order, axis=1)
+            for row, target in enumerate(chunk):
+                neighbours[int(ids[target])] = [
+                    (int(ids[j]), float(1.0 / (1.0 + distance[row, j]))) for j in nearest[row]
+                ]
+    return neighbours
+
+
+def rebuild_property_similarities(top_k=TOP_K):
+    """
+    Recomputes the neighbour table for every available property and swaps it
+    in with one transaction. Returns the number of rows written.
+    """
+    users, items = load_interactions()
+    available = set(Property.objects.filter(status='available').values_list('pk', flat=True))
+
+    ranked = {
+        pk: [(j, score, 'co_interest') for j, score in pairs if j in available]
+        for pk, pairs in co_interest_neighbours(users, items, top_k).items()
+        if pk in available
+    }
+    cold = [pk for pk in available if len(ranked.get(pk, ())) < top_k]
+    for pk, pairs in attribute_neighbours(cold, top_k).items():
+        chosen = ranked.setdefault(pk, [])
+        seen = {j for j, _, _ in chosen}
+        for j, score in pairs:
+            if len(chosen) >= top_k:
+                break
+            if j not in seen:
+                chosen.append((j, score * ATTRIBUTE_SCORE_SCALE, 'attributes'))
+
+    rows = [
+        PropertySimilarity(property_id=pk, similar_id=j, rank=rank, score=score, source=source)
+        for pk, chosen in ranked.items()
+        for rank, (j, score, source) in enumerate(chosen[:top_k], start=1)
+    ]
+    with transaction.atomic():
+        PropertySimilarity.objects.all().delete()
+        PropertySimilarity.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
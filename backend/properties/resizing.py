@@ -0,0 +1,189 @@
+# backend/properties/resizing.py
+import hashlib
+import os
+import tempfile
+import time
+
+from django.core.cache import cache
+from PIL import Image as PillowImage
+
+from core.utils import get_app_setting
+from .imaging import EXTENSIONS, decode_image, encode_variant
+
+
+IMAGE_RESIZE_DEFAULTS = {
+    'DIRECTORY': None,                  # Render cache; None means <tmp>/image-resize-cache
+    'MAX_CACHE_BYTES': 1024 ** 3,       # Least recently used renders are evicted past this
+    'MAX_WIDTH': 2560,
+    'WIDTH_STEP': 40,                   # Widths round up to a multiple, bounding distinct renders
+    'RENDER_WAIT_SECONDS': 2,           # How long a request waits on another's render before rendering itself
+    'TOUCH_INTERVAL_SECONDS': 3600,     # Hits refresh a render's LRU timestamp at most this often
+}
+
+FORMATS = ('webp', 'jpeg')
+# The URL carries render_version, so a replaced original gets new URLs and
+# a render can be cached for good
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Render locks outlive RENDER_WAIT_SECONDS so slow renders are not duplicated
+RENDER_LOCK_SECONDS = 120
+TOTAL_BYTES_KEY = 'image_resize:bytes'
+EVICT_LOCK = 'image_resize:evict:lock'
+# Eviction trims the cache to this share of MAX_CACHE_BYTES, not just under it
+LOW_WATER = 0.9
+TEMPORARY_PREFIX = '.render-'
+
+
+def get_image_resize_setting(name):
+    return get_app_setting('IMAGE_RESIZE', name, IMAGE_RESIZE_DEFAULTS)
+
+
+def cache_directory():
+    return get_image_resize_setting('DIRECTORY') or os.path.join(tempfile.gettempdir(), 'image-resize-cache')
+
+
+def canonical_width(width):
+    """`width` rounded up to WIDTH_STEP and capped at MAX_WIDTH."""
+    step = get_image_resize_setting('WIDTH_STEP')
+    return min(max(-(-width // step) * step, step), get_image_resize_setting('MAX_WIDTH'))
+
+
+def _digest(image_instance):
+    return os.path.splitext(os.path.basename(image_instance.image.name))[0]
+
+
+def cache_path(image_instance, width, fmt):
+    digest = _digest(image_instance)
+    return os.path.join(cache_directory(), digest[:2], f'{digest}_{width}w.{EXTENSIONS[fmt]}')
+
+
+def render_version(image_instance):
+    """Short tag of the original's stored name, which changes whenever its content does."""
+    return hashlib.sha256(image_instance.image.name.encode('utf-8')).hexdigest()[:16]
+
+
+def render_etag(image_instance, width, fmt):
+    """Strong ETag of a render: the original's content digest, width and format."""
+    return f'"{_digest(image_instance)}-{width}w.{EXTENSIONS[fmt]}"'
+
+
+def render_resized(image_instance, width, fmt):
+    """Encoded bytes of the image at `width` (never upscaled), from a draft decode."""
+    with image_instance.image.open('rb') as source:
+        img, _, widths = decode_image(source, target_width=width)
+    if widths[0] < img.width:
+        height = max(round(img.height * widths[0] / img.width), 1)
+        img = img.resize((widths[0], height), PillowImage.LANCZOS, reducing_gap=2.0)
+    return encode_variant(img, fmt)
+
+
+def _touch(path):
+    # mtime doubles as the LRU timestamp; atime is unreliable on noatime mounts
+    try:
+        if time.time() - os.stat(path).st_mtime > get_image_resize_setting('TOUCH_INTERVAL_SECONDS'):
+            os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=TEMPORARY_PREFIX, delete=False) as temporary:
+        temporary.write(data)
+    os.replace(temporary.name, path)
+
+
+def _account(size):
+    try:
+        total = cache.incr(TOTAL_BYTES_KEY, size)
+    except ValueError:
+        # Running total lost (cache flushed or never set); recount
+        total = None
+    if total is None or total > get_image_resize_setting('MAX_CACHE_BYTES'):
+        evict_resized_images()
+
+
+def evict_resized_images():
+    """
+    Deletes least recently used renders until the cache is back under
+    LOW_WATER of MAX_CACHE_BYTES (once it is over the cap), plus renders
+    abandoned halfway, and resets the running total. Returns the number
+    of files removed.
+    """
+    if not cache.add(EVICT_LOCK, 1, timeout=300):
+        return 0
+    try:
+        entries, removed = [], 0
+        for root, _, files in os.walk(cache_directory()):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.startswith(TEMPORARY_PREFIX):
+                    if time.time() - stat.st_mtime > 3600:
+                        os.remove(path)
+                        removed += 1
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        max_bytes = get_image_resize_setting('MAX_CACHE_BYTES')
+        if total > max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= max_bytes * LOW_WATER:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        cache.set(TOTAL_BYTES_KEY, total, None)
+        return removed
+    finally:
+        cache.delete(EVICT_LOCK)
+
+
+def cached_resized_image(image_instance, width, fmt):
+    """
+    Path of the render of a PropertyImage at `width` in `fmt`, rendering it
+    into the disk cache on a miss. Concurrent misses for the same render
+    coalesce: one request renders while the others wait for its file (up
+    to RENDER_WAIT_SECONDS, after which they render it themselves rather
+    than hold a sync worker any longer).
+    """
+    path = cache_path(image_instance, width, fmt)
+    if _touch(path):
+        return path
+
+    lock = f'image_resize:{os.path.basename(path)}:lock'
+    deadline = time.monotonic() + get_image_resize_setting('RENDER_WAIT_SECONDS')
+    locked = cache.add(lock, 1, timeout=RENDER_LOCK_SECONDS)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(0.05)
+        if _touch(path):
+            return path
+        locked = cache.add(lock, 1, timeout=RENDER_LOCK_SECONDS)
+    try:
+        if os.path.exists(path):
+            return path
+        data = render_resized(image_instance, width, fmt)
+        _write(path, data)
+    finally:
+        if locked:
+            cache.delete(lock)
+    _account(len(data))
+    return path
+
+
+def open_resized_image(image_instance, width, fmt):
+    """The cached render opened for reading (re-rendered if evicted meanwhile)."""
+    for _ in range(2):
+        try:
+            return open(cached_resized_image(image_instance, width, fmt), 'rb')
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(cache_path(image_instance, width, fmt))
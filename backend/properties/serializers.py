@@ -3,11 +3,16 @@
 
 from rest_framework import serializers
 from .models import *
+from .imaging import build_srcset
+from .resizing import render_version
+from .uploads import validate_declared_upload
 
 
 class PropertyImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     thumbnail_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    resize_version = serializers.SerializerMethodField()
 
 
     def get_image_url(self, obj):
@@ -24,14 +29,30 @@ class PropertyImageSerializer(serializers.ModelSerializer):
         return None
 
 
+    def get_srcset(self, obj):
+        return build_srcset(obj, self.context.get('request'))
+
+
+    def get_resize_version(self, obj):
+        # Path segment of the on-demand resize URL (images/<id>/<version>/<width>/<format>/)
+        return render_version(obj) if obj.image else None
+
+
     class Meta:
         model = PropertyImage
-        fields = ['id', 'image_url', 'thumbnail_url', 'is_primary', 'created_at']
-        read_only_fields = fields
+        fields = [
+            'id', 'image', 'image_url', 'thumbnail_url', 'srcset', 'resize_version', 'blurhash', 'dominant_color',
+            'is_primary', 'created_at'
+        ]
+        read_only_fields = [
+            'id', 'image_url', 'thumbnail_url', 'srcset', 'resize_version', 'blurhash', 'dominant_color', 'is_primary', 'created_at'
+        ]
+        extra_kwargs = {'image': {'write_only': True}}
 
 
 class PropertyVideoSerializer(serializers.ModelSerializer):
     video_url = serializers.SerializerMethodField()
+    hls_url = serializers.SerializerMethodField()
     thumbnail_url = serializers.SerializerMethodField()
 
 
@@ -42,6 +63,14 @@ class PropertyVideoSerializer(serializers.ModelSerializer):
         return None
 
 
+    def get_hls_url(self, obj):
+        # Adaptive stream; players fall back to video_url until it is ready
+        request = self.context.get('request')
+        if obj.hls_playlist and obj.processing_status == 'ready':
+            return request.build_absolute_uri(obj.hls_playlist.url)
+        return None
+
+
     def get_thumbnail_url(self, obj):
         request = self.context.get('request')
         if obj.thumbnail:
@@ -51,8 +80,15 @@ class PropertyVideoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PropertyVideo
-        fields = ['id', 'video_url', 'thumbnail_url', 'duration', 'created_at']
-        read_only_fields = fields
+        fields = [
+            'id', 'video_file', 'video_url', 'hls_url', 'thumbnail_url', 'duration',
+            'processing_status', 'processing_progress', 'created_at'
+        ]
+        read_only_fields = [
+            'id', 'video_url', 'hls_url', 'thumbnail_url', 'duration',
+            'processing_status', 'processing_progress', 'created_at'
+        ]
+        extra_kwargs = {'video_file': {'write_only': True}}
 
 
 class PlaceOfInterestSerializer(serializers.ModelSerializer):
@@ -80,7 +116,7 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
 
     def get_primary_image(self, obj):
         request = self.context.get('request')
-        primary = obj.images.filter(is_primary=True).first()
+        primary = next((image for image in obj.images.all() if image.is_primary), None)
         if primary:
             return PropertyImageSerializer(primary, context={'request': request}).data
         return None
@@ -91,10 +127,11 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'property_type', 'property_type_display',
             'status', 'status_display', 'listing_type', 'listing_type_display',
-            'featured', 'address', 'city', 'state', 'zip_code', 'price',
+            'featured', 'address', 'city', 'state', 'zip_code', 'latitude', 'longitude', 'price',
             'viewing_fee', 'bedrooms', 'bathrooms', 'area', 'owner', 'owner_name',
             'listing_agency', 'listing_agency_name', 'property_places', 'created_at',
-            'updated_at', 'images', 'videos', 'primary_image'
+            'updated_at', 'images', 'videos', 'primary_image',
+            'favorites_count', 'interests_count'
         ]
 
 
@@ -107,21 +144,19 @@ class PublicPropertyListSerializer(serializers.ModelSerializer):
 
     def get_primary_image(self, obj):
         request = self.context.get('request')
-        primary = obj.images.filter(is_primary=True).first()
-        if primary:
+        # Read from the prefetched images rather than issuing per-row queries
+        images = sorted(obj.images.all(), key=lambda image: image.pk)
+        image = next((image for image in images if image.is_primary), images[0] if images else None)
+        if image:
             return {
-                'id': primary.id,
-                'image_url': request.build_absolute_uri(primary.image.url) if primary.image else None,
-                'thumbnail_url': request.build_absolute_uri(primary.thumbnail.url) if primary.thumbnail else None,
-                'is_primary': primary.is_primary
-            }
-        first_image = obj.images.first()
-        if first_image:
-            return {
-                'id': first_image.id,
-                'image_url': request.build_absolute_uri(first_image.image.url) if first_image.image else None,
-                'thumbnail_url': request.build_absolute_uri(first_image.thumbnail.url) if first_image.thumbnail else None,
-                'is_primary': first_image.is_primary
+                'id': image.id,
+                'image_url': request.build_absolute_uri(image.image.url) if image.image else None,
+                'thumbnail_url': request.build_absolute_uri(image.thumbnail.url) if image.thumbnail else None,
+                'srcset': build_srcset(image, request),
+                # Painted by the client until the image itself arrives
+                'blurhash': image.blurhash or None,
+                'dominant_color': image.dominant_color or None,
+                'is_primary': image.is_primary
             }
         return None
 
@@ -131,8 +166,8 @@ class PublicPropertyListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'property_type', 'property_type_display',
             'status', 'status_display', 'listing_type', 'listing_type_display',
-            'price', 'bedrooms', 'bathrooms', 'city', 'primary_image',
-            'created_at', 'featured'
+            'price', 'bedrooms', 'bathrooms', 'city', 'latitude', 'longitude', 'primary_image',
+            'created_at', 'featured', 'favorites_count', 'interests_count'
         ]
 
 
@@ -216,4 +251,21 @@ class ServiceSubscriptionSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'service_type', 'service_type_display', 'property', 'property_details',
             'user', 'user_name', 'valid_until', 'status', 'created_at'
-        ]
\ No newline at end of file
+        ]
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+
+
+    def validate(self, attrs):
+        validate_declared_upload(attrs['kind'], attrs['filename'], attrs['total_size'])
+        return attrs
+
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'property', 'kind', 'filename', 'total_size', 'offset',
+            'content_type', 'status', 'image', 'video', 'created_at', 'expires_at'
+        ]
+        read_only_fields = ['id', 'offset', 'content_type', 'status', 'image', 'video', 'created_at', 'expires_at']
@@ -1,27 +1,86 @@
 # backend/properties/signals.py
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import PropertyImage, PropertyVideo
-from .tasks import process_property_image_task, process_property_video_task
+from core.media_store import track_file_references
+from core.models import UserFavorite
+from .alerts import MATCH_FIELDS, index_saved_search
+from .duplicates import DUPLICATE_FIELDS, forget_duplicated_image_ids
+from .geo import mark_place_type_dirty
+from .models import PlaceOfInterest, Property, PropertyImage, PropertyImageVariant, PropertyVideo
+from .tiles import TILE_FIELDS, bump_catalogue_version
+from .video import remove_video_stream, stream_directory
+from .tasks import process_property_image_task, process_property_video_task, match_saved_searches_task
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Reference counts of the content-addressed media files (see core.media_store)
+track_file_references(PropertyImage, 'image', 'thumbnail')
+track_file_references(PropertyImageVariant, 'file')
+track_file_references(PropertyVideo, 'video_file', 'thumbnail')
+
 @receiver(post_save, sender=PropertyImage)
 def schedule_property_image_processing(sender, instance, created, **kwargs):
     # Check if the image field was actually updated or if it's a new instance with an image
     if instance.image and (created or (kwargs.get('update_fields') and 'image' in kwargs['update_fields'])) :
         logger.info(f"PropertyImage post_save signal: Scheduling image processing for ID {instance.id}")
-        process_property_image_task.delay(instance.id)
+        image_id = instance.id
+        # A worker must not pick the task up before the row is visible to it
+        transaction.on_commit(lambda: process_property_image_task.delay(image_id))
     elif created and not instance.image:
         logger.warning(f"PropertyImage post_save signal: Instance {instance.id} created without an image.")
 
 
 @receiver(post_save, sender=PropertyVideo)
 def schedule_property_video_processing(sender, instance, created, **kwargs):
-    if instance.video and (created or (kwargs.get('update_fields') and 'video' in kwargs['update_fields'])):
+    if instance.video_file and (created or (kwargs.get('update_fields') and 'video_file' in kwargs['update_fields'])):
         logger.info(f"PropertyVideo post_save signal: Scheduling video processing for ID {instance.id}")
-        process_property_video_task.delay(instance.id)
-    elif created and not instance.video:
+        video_id = instance.id
+        transaction.on_commit(lambda: process_property_video_task.delay(video_id))
+    elif created and not instance.video_file:
         logger.warning(f"PropertyVideo post_save signal: Instance {instance.id} created without a video.")
 
+
+@receiver(post_delete, sender=PropertyVideo)
+def remove_property_video_stream(sender, instance, **kwargs):
+    # HLS segments are per video, unlike the content-addressed originals
+    if instance.hls_playlist:
+        directory = stream_directory(instance)
+        transaction.on_commit(lambda: remove_video_stream(directory))
+
+
+@receiver(post_save, sender=UserFavorite)
+def index_favorite_saved_search(sender, instance, **kwargs):
+    index_saved_search(instance)
+
+
+@receiver(post_save, sender=Property)
+def schedule_saved_search_matching(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not MATCH_FIELDS.intersection(update_fields):
+        return
+    property_id = instance.pk
+    transaction.on_commit(lambda: match_saved_searches_task.delay(property_id))
+
+
+@receiver(post_save, sender=PlaceOfInterest)
+@receiver(post_delete, sender=PlaceOfInterest)
+def mark_nearby_places_stale(sender, instance, **kwargs):
+    # sync_nearby_places_task recomputes this type for every located property
+    mark_place_type_dirty(instance.place_type)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def retire_map_tiles(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not TILE_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def retire_near_duplicate_report(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not DUPLICATE_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(forget_duplicated_image_ids)
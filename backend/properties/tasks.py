@@ -1,21 +1,29 @@
 # backend/properties/tasks.py
 from celery import shared_task
+from celery.signals import worker_ready
 from django.conf import settings
 import logging
-from PIL import Image as PillowImage # Renamed to avoid conflict if you have a model named Image
-from django.core.files.base import ContentFile
-import io
 
+from .imaging import ImageTooLarge, generate_image_variants, peak_rss_kb
+from .video import missing_binaries
 from .models import PropertyImage, PropertyVideo # Make sure models are correctly imported
 
 logger = logging.getLogger(__name__)
 
+
+@worker_ready.connect
+def check_video_binaries(**kwargs):
+    # Without them every uploaded video would fail one by one
+    missing = missing_binaries()
+    if missing:
+        logger.error(f"Video processing is unavailable: {', '.join(missing)} not found on PATH")
+
 @shared_task(name="process_property_image_task", bind=True, max_retries=3)
 def process_property_image_task(self, property_image_id):
     """
     Celery task to process a property image:
     - Generate thumbnail
-    - Potentially compress/optimize (basic example here)
+    - Generate responsive WebP/JPEG variants
     """
     try:
         image_instance = PropertyImage.objects.get(pk=property_image_id)
@@ -26,41 +34,16 @@ def process_property_image_task(self, property_image_id):
             return "No image file found."
 
         try:
-            # Open the original image using Pillow
-            img = PillowImage.open(image_instance.image)
-            original_format = img.format or 'JPEG' # Keep original format or default to JPEG
-
-            # 1. Generate Thumbnail
-            thumb_size = (200, 200) # Define your thumbnail size
-            thumb_img = img.copy()
-            thumb_img.thumbnail(thumb_size)
-            
-            thumb_io = io.BytesIO()
-            thumb_img.save(thumb_io, format=original_format, quality=85) # Adjust quality
-            thumb_io.seek(0)
-            
-            # Construct a unique thumbnail name
-            original_filename = image_instance.image.name.split('/')[-1]
-            thumb_filename = f"thumb_{original_filename}"
-            
-            image_instance.thumbnail.save(thumb_filename, ContentFile(thumb_io.read()), save=False)
-            logger.info(f"Thumbnail generated for PropertyImage ID: {property_image_id}")
-
-            # 2. Basic Optimization (example: re-saving with quality)
-            # More advanced optimization might involve tools like optipng, jpegoptim
-            # or cloud services.
-            # For simplicity, we'll just re-save the original with a set quality if it's JPEG/PNG
-            # if original_format.upper() in ['JPEG', 'JPG', 'PNG']:
-            #     optimized_io = io.BytesIO()
-            #     img.save(optimized_io, format=original_format, quality=85, optimize=True) # Adjust quality
-            #     optimized_io.seek(0)
-            #     image_instance.image.save(original_filename, ContentFile(optimized_io.read()), save=False)
-            #     logger.info(f"Image optimized for PropertyImage ID: {property_image_id}")
-            
-            image_instance.save(update_fields=['thumbnail']) # Add 'image' here if you re-save the original
-            
+            # Thumbnail and responsive variants (srcset widths, WebP + JPEG
+            # fallback), all from a single draft-mode decode of the original
+            variants = generate_image_variants(image_instance)
+            logger.info(f"Generated thumbnail and {len(variants)} variants for PropertyImage ID: {property_image_id} (peak RSS {peak_rss_kb()} KiB)")
+
             return f"Successfully processed image for PropertyImage ID: {property_image_id}"
 
+        except ImageTooLarge as e:
+            logger.error(f"Refusing to process PropertyImage ID {property_image_id}: {e}")
+            return f"Failed: PropertyImage ID {property_image_id} is too large to process"
         except FileNotFoundError:
             logger.error(f"Original image file not found for PropertyImage ID: {property_image_id} at path {image_instance.image.path if image_instance.image else 'N/A'}")
             # Don't retry if file not found
@@ -83,29 +66,30 @@ def process_property_image_task(self, property_image_id):
 @shared_task(name="process_property_video_task", bind=True, max_retries=3)
 def process_property_video_task(self, property_video_id):
     """
-    Celery task to process a property video.
-    Placeholder for actual video processing (e.g., thumbnail, transcoding).
-    Requires tools like FFmpeg.
+    Celery task to process a property video with FFmpeg:
+    - Probe the duration and extract a poster frame as the thumbnail
+    - Transcode an H.264/AAC bitrate ladder packaged as HLS
+    Progress and the outcome are tracked on the PropertyVideo row.
     """
+    from .video import VideoProcessingError, process_video
+
     try:
         video_instance = PropertyVideo.objects.get(pk=property_video_id)
-        logger.info(f"Attempting to process video: {video_instance.video.name} for PropertyVideo ID: {property_video_id}")
-        
-        # Actual video processing logic here.
-        # This is complex and usually involves calling FFmpeg as a subprocess.
-        # Example placeholder:
-        # 1. Generate thumbnail from video
-        # 2. Transcode to web-friendly formats (e.g., MP4 H.264)
-        
-        # For now, just log and return
-        logger.info(f"Placeholder: Video processing for PropertyVideo ID {property_video_id} would happen here.")
-        # video_instance.processed = True # Example field
-        # video_instance.save()
-        return f"Placeholder: Successfully processed video for PropertyVideo ID: {property_video_id}"
-        
+        if not video_instance.video_file:
+            logger.warning(f"No video file found for PropertyVideo ID: {property_video_id}")
+            return "No video file found."
+        logger.info(f"Processing video: {video_instance.video_file.name} for PropertyVideo ID: {property_video_id}")
+
+        rungs = process_video(video_instance)
+        return f"Successfully transcoded PropertyVideo ID {property_video_id} to {len(rungs)} renditions"
+
     except PropertyVideo.DoesNotExist:
         logger.warning(f"PropertyVideo with ID {property_video_id} does not exist. Cannot process.")
         return f"PropertyVideo ID {property_video_id} not found."
+    except (VideoProcessingError, FileNotFoundError) as e:
+        # FFmpeg rejected the input (or it is gone); retrying won't help
+        logger.error(f"Could not process video for PropertyVideo ID {property_video_id}: {e}")
+        return f"Failed: Could not process video for PropertyVideo ID {property_video_id}"
     except Exception as e:
         logger.error(f"Error processing video for PropertyVideo ID {property_video_id}: {e}", exc_info=True)
         self.retry(exc=e, countdown=300 * (self.request.retries + 1)) # Longer retry for video
@@ -123,3 +107,159 @@ def check_featured_properties_expiry_task():
         logger.info(f"Unfeatured {count} properties whose feature period expired.")
     return f"Checked featured properties expiry. Unfeatured {count} properties."
 
+
+
+@shared_task(name="reconcile_property_engagement_task")
+def reconcile_property_engagement_task():
+    """
+    Periodic task that recounts favorites_count / interests_count for every
+    property from UserFavorite and PropertyInterest in one UPDATE, correcting
+    any drift in the counters maintained by the API endpoints.
+    """
+    from django.db.models import Count, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+    from core.models import UserFavorite
+    from .models import Property, PropertyInterest
+
+    favorites = UserFavorite.objects.filter(property=OuterRef('pk')).order_by().values('property')
+    interests = PropertyInterest.objects.filter(property=OuterRef('pk')).order_by().values('property')
+    updated = Property.objects.update(
+        favorites_count=Coalesce(Subquery(favorites.annotate(n=Count('pk')).values('n')), Value(0)),
+        interests_count=Coalesce(Subquery(interests.annotate(n=Count('pk')).values('n')), Value(0)),
+    )
+    logger.info(f"Reconciled engagement counters for {updated} properties.")
+    return f"Reconciled engagement counters for {updated} properties."
+
+
+@shared_task(name="match_saved_searches_task")
+def match_saved_searches_task(property_id):
+    """Queues digest matches for the saved searches a new or changed property satisfies."""
+    from .alerts import match_property
+    from .models import Property
+
+    try:
+        property = Property.objects.get(pk=property_id)
+    except Property.DoesNotExist:
+        return f"Property ID {property_id} not found."
+    matched = match_property(property)
+    return f"Property ID {property_id} matched {matched} saved searches."
+
+
+@shared_task(name="send_saved_search_digests_task")
+def send_saved_search_digests_task(batch_size=1000):
+    """
+    Periodic task that sends each user one email listing the properties that
+    matched their saved searches since the last digest, then marks those
+    matches as notified in one UPDATE. Users can opt out with
+    notification_preferences['saved_search_alerts'] = False.
+    """
+    from django.core.mail import send_mail
+    from django.utils import timezone
+    from .models import SavedSearchMatch
+
+    pending = list(
+        SavedSearchMatch.objects.filter(notified_at__isnull=True)
+        .select_related('property', 'search__user')
+        .order_by('search__user_id', '-created_at')[:batch_size]
+    )
+    digests = {}
+    for match in pending:
+        digests.setdefault(match.search.user, {})[match.property_id] = match.property
+
+    sent = 0
+    for user, properties in digests.items():
+        if not (user.notification_preferences or {}).get('saved_search_alerts', True):
+            continue
+        lines = [
+            f"- {item.title}, {item.city}: {item.price} ({settings.FRONTEND_URL}/properties/{item.pk})"
+            for item in properties.values()
+        ]
+        try:
+            send_mail(
+                f"{len(lines)} new properties match your saved searches",
+                f"Hi {user.first_name or user.email},\n\n"
+                "These listings match your saved searches:\n\n" + "\n".join(lines),
+                settings.DEFAULT_FROM_EMAIL,
+                [user.email],
+                fail_silently=False,
+            )
+            sent += 1
+        except Exception as e:
+            logger.error(f"Error sending saved search digest to user {user.pk}: {e}", exc_info=True)
+            # Leave this user's matches pending for the next run
+            pending = [match for match in pending if match.search.user_id != user.pk]
+
+    SavedSearchMatch.objects.filter(pk__in=[match.pk for match in pending]).update(notified_at=timezone.now())
+    logger.info(f"Sent {sent} saved search digests covering {len(pending)} matches.")
+    return f"Sent {sent} saved search digests covering {len(pending)} matches."
+
+
+@shared_task(name="compute_property_similarity_task")
+def compute_property_similarity_task():
+    """
+    Periodic task that rebuilds the PropertySimilarity neighbour table from
+    co-interest data, falling back to attribute similarity for cold-start
+    listings.
+    """
+    from .recommendations import rebuild_property_similarities
+
+    written = rebuild_property_similarities()
+    logger.info(f"Rebuilt property similarities: {written} neighbour rows.")
+    return f"Rebuilt property similarities: {written} neighbour rows."
+
+
+@shared_task(name="fold_property_views_task")
+def fold_property_views_task():
+    """
+    Periodic task that folds the cache-side property view counters into
+    decayed PropertyTrend scores and recomputes the trending ranks.
+    """
+    from .trending import fold_property_views
+
+    folded = fold_property_views()
+    logger.info(f"Folded {folded} property view buckets into trending scores.")
+    return f"Folded {folded} property view buckets into trending scores."
+
+
+@shared_task(name="sync_nearby_places_task")
+def sync_nearby_places_task():
+    """
+    Periodic task that recomputes the nearest places of interest for
+    properties with new or moved coordinates and for place types whose
+    places changed since the last run.
+    """
+    from .geo import sync_nearby_places
+
+    refreshed, written = sync_nearby_places()
+    logger.info(f"Refreshed nearby places for {refreshed} properties ({written} rows upserted).")
+    return f"Refreshed nearby places for {refreshed} properties ({written} rows upserted)."
+
+
+@shared_task(name="regenerate_property_image_variants_task")
+def regenerate_property_image_variants_task(property_image_ids=None):
+    """
+    Re-renders thumbnails and variants in bulk, e.g. after IMAGE_VARIANTS
+    changes. Inside a Celery worker this renders in-process; the
+    regenerate_image_variants management command uses a process pool.
+    """
+    from .imaging import regenerate_image_variants
+
+    images = PropertyImage.objects.exclude(image='')
+    if property_image_ids is not None:
+        images = images.filter(pk__in=property_image_ids)
+    done, failures, peak = regenerate_image_variants(images.iterator())
+    logger.info(f"Regenerated variants for {done} images ({failures} failed, peak RSS {peak} KiB).")
+    return f"Regenerated variants for {done} images ({failures} failed, peak RSS {peak} KiB)."
+
+
+@shared_task(name="expire_upload_sessions_task")
+def expire_upload_sessions_task():
+    """
+    Periodic task that aborts chunked upload sessions left idle past their
+    expiry and deletes their partial files.
+    """
+    from .uploads import expire_upload_sessions
+
+    expired = expire_upload_sessions()
+    logger.info(f"Expired {expired} idle upload sessions.")
+    return f"Expired {expired} idle upload sessions."
@@ -1,3 +1,777 @@
-from django.test import TestCase
+import io
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image as PillowImage
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from core.filetypes import get_detector
+from core.media_store import collect_orphan_blobs
+from core.models import StoredBlob, User, UserFavorite
+from core.testing import TemporaryMediaMixin, enter_context
+from .alerts import match_property
+from .duplicates import dhash, duplicated_image_ids, hamming, hash_fields, near_duplicate_groups, near_duplicates
+from .geo import haversine_miles, sync_nearby_places
+from .imaging import ORIENTATION_TAG, decode_image, generate_image_variants, regenerate_image_variants
+from .models import (
+    PlaceOfInterest, Property, PropertyImage, PropertyImageVariant, PropertyInterest, PropertyPlaceOfInterest,
+    PropertySimilarity, PropertyTrend, PropertyTrendFold, PropertyVideo, SavedSearchMatch, UploadSession
+)
+from .recommendations import attribute_neighbours, rebuild_property_similarities
+from .resizing import cache_path, cached_resized_image, evict_resized_images, render_version
+from .serializers import PropertyVideoSerializer
+from .tasks import process_property_video_task, reconcile_property_engagement_task, send_saved_search_digests_task
+from .tiles import bump_catalogue_version, quadkey_for, tile_for, tile_quadkey
+from .trending import fold_property_views
+from .uploads import OffsetMismatch, get_media_uploads_setting, read_media_upload, write_chunk
+from .video import VideoProcessingError, hls_command, ladder_for, missing_binaries
+
+
+def create_property(owner, **kwargs):
+    fields = {
+        'title': 'Garden Cottage',
+        'description': 'Two bedroom cottage',
+        'property_type': 'house',
+        'address': '1 Main Street',
+        'city': 'Harare',
+        'state': 'Harare',
+        'zip_code': '0000',
+        'price': '120000.00',
+        'area': '900.00',
+        'bedrooms': 2,
+        'owner': owner,
+    }
+    fields.update(kwargs)
+    return Property.objects.create(**fields)
+
+
+class PropertyEngagementCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_customer('fan@example.com', 'Fan', 'User', 'S3cure-pass-123')
+        self.owner = User.objects.create_customer('owner@example.com', 'Own', 'Er', 'S3cure-pass-123')
+        self.quiet = create_property(self.owner, title='Quiet Flat')
+        self.loved = create_property(self.owner, title='Loved House')
+        self.client.force_authenticate(self.user)
+
+    def test_favorites_and_interests_move_counters(self):
+        favorite = self.client.post(
+            reverse('favorite-list'), {'user': self.user.id, 'property': self.loved.id, 'agent': None}, format='json'
+        )
+        self.assertEqual(favorite.status_code, status.HTTP_201_CREATED)
+        interest = self.client.post(reverse('interest-list'), {'property': self.loved.id}, format='json')
+        self.assertEqual(interest.status_code, status.HTTP_201_CREATED)
+
+        self.loved.refresh_from_db()
+        self.assertEqual((self.loved.favorites_count, self.loved.interests_count), (1, 1))
+
+        self.client.delete(reverse('favorite-detail', args=[favorite.data['id']]))
+        self.loved.refresh_from_db()
+        self.assertEqual(self.loved.favorites_count, 0)
+
+    def test_popular_orders_by_engagement(self):
+        self.client.post(reverse('interest-list'), {'property': self.loved.id}, format='json')
+
+        response = self.client.get(reverse('property-popular'))
+        titles = [row['title'] for row in response.data]
+        self.assertEqual(titles, ['Loved House', 'Quiet Flat'])
+
+        response = self.client.get(reverse('property-list'), {'ordering': '-popularity'})
+        self.assertEqual(response.data[0]['interests_count'], 1)
+
+    def test_reconciliation_recounts_from_source_tables(self):
+        PropertyInterest.objects.create(user=self.user, property=self.quiet)
+        Property.objects.filter(pk=self.loved.pk).update(favorites_count=7)
+
+        reconcile_property_engagement_task()
+
+        self.quiet.refresh_from_db()
+        self.loved.refresh_from_db()
+        self.assertEqual((self.quiet.interests_count, self.loved.favorites_count), (1, 0))
+
+
+class SavedSearchAlertTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_customer('lister@example.com', 'List', 'Er', 'S3cure-pass-123')
+        self.hunter = User.objects.create_customer('hunter@example.com', 'Hunt', 'Er', 'S3cure-pass-123')
+        self.other = User.objects.create_customer('other@example.com', 'Oth', 'Er', 'S3cure-pass-123')
+        UserFavorite.objects.create(user=self.hunter, search_parameters={
+            'city': 'masvingo', 'property_type': 'house', 'min_bedrooms': 2, 'max_price': '150000'
+        })
+        UserFavorite.objects.create(user=self.other, search_parameters={'city': 'Bulawayo'})
+
+    def test_only_candidate_searches_match(self):
+        matching = create_property(self.owner, city='Masvingo', bedrooms=3)
+        self.assertEqual(match_property(matching), 1)
+        self.assertEqual(match_property(create_property(self.owner, city='Masvingo', price='200000.00')), 0)
+        self.assertEqual(match_property(create_property(self.owner, city='Harare')), 0)
+
+        # Re-matching after an edit does not queue the pair twice
+        match_property(matching)
+        self.assertEqual(SavedSearchMatch.objects.count(), 1)
+
+    def test_digest_batches_matches_per_user(self):
+        for title in ('First', 'Second'):
+            match_property(create_property(self.owner, title=title, city='Masvingo'))
+
+        send_saved_search_digests_task()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['hunter@example.com'])
+        self.assertIn('First', mail.outbox[0].body)
+        self.assertIn('Second', mail.outbox[0].body)
+        self.assertFalse(SavedSearchMatch.objects.filter(notified_at__isnull=True).exists())
+
+
+class PropertySimilarityTests(APITestCase):
+    def setUp(self):
+        owner = User.objects.create_customer('seller@example.com', 'Sell', 'Er', 'S3cure-pass-123')
+        self.base = create_property(owner, title='Base', price='100000.00')
+        self.co_viewed = create_property(owner, title='Co-viewed', city='Gweru', price='900000.00')
+        self.lookalike = create_property(owner, title='Lookalike', price='105000.00')
+        self.mansion = create_property(owner, title='Mansion', price='950000.00', bedrooms=6)
+
+        for i in range(2):
+            user = User.objects.create_customer(f'browser{i}@example.com', 'Brow', 'Ser', 'S3cure-pass-123')
+            PropertyInterest.objects.create(user=user, property=self.base)
+            PropertyInterest.objects.create(user=user, property=self.co_viewed)
+
+    def test_co_interest_ranks_first_then_attributes_fill(self):
+        rebuild_property_similarities(top_k=3)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('property-similar', args=[self.base.id]))
+        titles = [row['title'] for row in response.data]
+        self.assertEqual(titles, ['Co-viewed', 'Lookalike', 'Mansion'])
+
+        sources = PropertySimilarity.objects.filter(property=self.co_viewed).values_list('source', flat=True)
+        self.assertEqual(list(sources), ['co_interest'])
+
+    def test_attribute_neighbours_do_not_depend_on_chunking(self):
+        ids = [self.base.id, self.lookalike.id, self.mansion.id]
+        expected = attribute_neighbours(ids, top_k=2)
+        with mock.patch('properties.recommendations.TARGET_CHUNK', 1):
+            self.assertEqual(attribute_neighbours(ids, top_k=2), expected)
+        self.assertEqual([j for j, _ in expected[self.base.id]], [self.lookalike.id, self.mansion.id])
+
+
+class TrendingPropertyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_customer('agent@example.com', 'Ag', 'Ent', 'S3cure-pass-123')
+        self.hot = create_property(owner, title='Hot')
+        self.warm = create_property(owner, title='Warm')
+
+    def _view(self, property, address):
+        return self.client.get(reverse('property-detail', args=[property.id]), REMOTE_ADDR=address)
+
+    def test_views_are_counted_in_cache_then_folded_into_ranks(self):
+        with CaptureQueriesContext(connection) as queries:
+            for address in ('10.0.0.1', '10.0.0.2', '10.0.0.2'):
+                self._view(self.hot, address)
+            self._view(self.warm, '10.0.0.3')
+        self.assertFalse([q for q in queries if not q['sql'].startswith('SELECT')])
+
+        fold_property_views(now=time.time() + 300)
+
+        self.assertEqual(PropertyTrend.objects.get(pk=self.hot.pk).rank, 1)
+        response = self.client.get(reverse('property-trending'))
+        self.assertEqual([row['title'] for row in response.data], ['Hot', 'Warm'])
+
+    def test_folded_buckets_are_not_folded_again(self):
+        self._view(self.hot, '10.0.0.1')
+        later = time.time() + 300
+        fold_property_views(now=later)
+        score = PropertyTrend.objects.get(pk=self.hot.pk).score
+        self.assertEqual(fold_property_views(now=later), 0)
+
+        # Without a watermark row (as right after upgrading), the trends'
+        # own fold time bounds what was already folded
+        PropertyTrendFold.objects.all().delete()
+        PropertyTrend.objects.update(updated_at=datetime.fromtimestamp(later, tz=dt_timezone.utc))
+        fold_property_views(now=later)
+        self.assertAlmostEqual(PropertyTrend.objects.get(pk=self.hot.pk).score, score, places=2)
+
+
+class NearbyPlacesTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_customer('mapper@example.com', 'Map', 'Per', 'S3cure-pass-123')
+        self.home = create_property(owner, latitude='-20.070000', longitude='30.830000')
+        self.near_school = PlaceOfInterest.objects.create(
+            name='Near School', place_type='school', latitude='-20.071000', longitude='30.831000'
+        )
+        self.far_school = PlaceOfInterest.objects.create(
+            name='Far School', place_type='school', latitude='-20.200000', longitude='30.900000'
+        )
+        PlaceOfInterest.objects.create(
+            name='Other City Park', place_type='park', latitude='-17.830000', longitude='31.050000'
+        )
+
+    def test_haversine_matches_known_distance(self):
+        # Harare to Masvingo is about 156 miles as the crow flies
+        distance = haversine_miles([-17.8292], [31.0522], [-20.0744], [30.8328])[0, 0]
+        self.assertAlmostEqual(distance, 156, delta=5)
+
+    @override_settings(NEARBY_PLACES={'NEAREST_PER_TYPE': 1, 'MAX_DISTANCE_MILES': 25})
+    def test_sync_keeps_nearest_per_type_and_is_incremental(self):
+        sync_nearby_places()
+        rows = PropertyPlaceOfInterest.objects.filter(property=self.home)
+        self.assertEqual([row.place_id for row in rows], [self.near_school.id])
+        self.assertTrue(rows[0].auto_computed)
+
+        # Hand-entered rows are never replaced by the computation
+        park = PlaceOfInterest.objects.get(name='Other City Park')
+        PropertyPlaceOfInterest.objects.create(property=self.home, place=park, distance='155.0')
+
+        # Nothing changed: nothing to refresh
+        self.assertEqual(sync_nearby_places(), (0, 0))
+
+        # Moving the near school away promotes the other one
+        self.near_school.latitude = '-21.000000'
+        self.near_school.save()
+        sync_nearby_places()
+        rows = PropertyPlaceOfInterest.objects.filter(property=self.home, auto_computed=True)
+        self.assertEqual([row.place_id for row in rows], [self.far_school.id])
+        self.assertTrue(PropertyPlaceOfInterest.objects.filter(place=park, auto_computed=False).exists())
+
+
+class MapTileTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_customer('cartographer@example.com', 'Carto', 'Grapher', 'S3cure-pass-123')
+        # Two listings a few hundred metres apart in Harare, one in Bulawayo
+        create_property(owner, title='Avondale', price='90000.00', latitude='-17.8000', longitude='31.0400')
+        create_property(owner, title='Belgravia', price='150000.00', latitude='-17.8030', longitude='31.0430')
+        self.bulawayo = create_property(owner, title='Suburbs', latitude='-20.1500', longitude='28.5800')
+        create_property(owner, title='Unmapped')
+
+    def test_quadkey_prefix_is_the_containing_tile(self):
+        x, y = tile_for(-17.8, 31.04, 10)
+        self.assertTrue(quadkey_for(-17.8, 31.04).startswith(tile_quadkey(10, x, y)))
+        self.assertEqual(tile_quadkey(1, 1, 1), '3')
+
+    def test_tile_clusters_are_cached_per_catalogue_version(self):
+        url = reverse('property-tile', args=[0, 0, 0])
+        response = self.client.get(url)
+        clusters = response.data['clusters']
+        self.assertEqual(sum(cluster['count'] for cluster in clusters), 3)
+
+        x, y = tile_for(-17.8, 31.04, 12)
+        harare = self.client.get(reverse('property-tile', args=[12 - 3, x >> 3, y >> 3])).data['clusters']
+        self.assertEqual([cluster['count'] for cluster in harare], [2])
+        self.assertEqual((harare[0]['min_price'], harare[0]['max_price']), (90000, 150000))
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        # Taking a listing off the market retires every cached tile
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.bulawayo.status = 'sold'
+            self.bulawayo.save()
+        self.assertIn(bump_catalogue_version, callbacks)
+        bump_catalogue_version()
+        response = self.client.get(url)
+        self.assertEqual(sum(cluster['count'] for cluster in response.data['clusters']), 2)
+
+    def test_out_of_range_tile_is_not_found(self):
+        response = self.client.get(reverse('property-tile', args=[2, 4, 0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(IMAGE_VARIANTS={'WIDTHS': [320, 640, 1280]})
+class ImageVariantTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        owner = User.objects.create_customer('photographer@example.com', 'Photo', 'Grapher', 'S3cure-pass-123')
+        self.property = create_property(owner)
+        buffer = io.BytesIO()
+        PillowImage.new('RGBA', (1000, 600), (200, 80, 40, 128)).save(buffer, format='PNG')
+        with mock.patch('properties.signals.process_property_image_task'):
+            self.image = PropertyImage.objects.create(
+                property=self.property, is_primary=True,
+                image=SimpleUploadedFile('front.png', buffer.getvalue(), content_type='image/png')
+            )
+
+    def test_variants_are_never_upscaled(self):
+        generate_image_variants(self.image)
+        variants = PropertyImageVariant.objects.filter(image=self.image)
+        self.assertEqual(
+            sorted(variants.values_list('format', 'width', 'height')),
+            [('jpeg', 320, 192), ('jpeg', 640, 384), ('jpeg', 1000, 600),
+             ('webp', 320, 192), ('webp', 640, 384), ('webp', 1000, 600)]
+        )
+        jpeg = variants.get(format='jpeg', width=320)
+        self.assertEqual(PillowImage.open(jpeg.file).mode, 'RGB')
+
+        # Re-rendering yields the same content, so the same stored files
+        stored = set(variants.values_list('file', flat=True))
+        regenerate_image_variants([self.image], workers=1)
+        self.assertEqual(set(variants.values_list('file', flat=True)), stored)
+        self.assertEqual(set(StoredBlob.objects.filter(name__in=stored).values_list('refcount', flat=True)), {1})
+
+    @override_settings(IMAGE_VARIANTS={'WIDTHS': [320, 640]})
+    def test_jpeg_is_draft_decoded_upright(self):
+        exif = PillowImage.Exif()
+        exif[ORIENTATION_TAG] = 6  # Stored sideways, displayed rotated 90 degrees
+        buffer = io.BytesIO()
+        PillowImage.new('RGB', (3000, 1500), 'gray').save(buffer, format='JPEG', exif=exif)
+
+        img, original_format, widths = decode_image(io.BytesIO(buffer.getvalue()))
+        # libjpeg halves while decoding; 1/4 would fall short of 640 wide
+        self.assertEqual((img.size, original_format, widths), ((750, 1500), 'JPEG', [320, 640]))
+
+    def test_batch_renders_in_a_process_pool(self):
+        done, failures, peak = regenerate_image_variants([self.image], workers=2)
+
+        self.assertEqual((done, failures), (1, 0))
+        self.assertGreater(peak, 0)
+        self.image.refresh_from_db()
+        self.assertTrue(self.image.thumbnail)
+        self.assertEqual(self.image.variants.count(), 6)
+
+    def test_list_exposes_srcset_per_format(self):
+        generate_image_variants(self.image)
+
+        response = self.client.get(reverse('property-list'))
+        srcset = response.data[0]['primary_image']['srcset']
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertTrue(srcset['webp'].endswith(' 1000w'))
+        self.assertEqual(srcset['jpeg'].count('w,'), 2)
+
+    def test_list_carries_placeholder_of_primary_image(self):
+        generate_image_variants(self.image)
+
+        primary_image = self.client.get(reverse('property-list')).data[0]['primary_image']
+        self.assertRegex(primary_image['blurhash'], r'^L[0-9A-Za-z#$%*+,\-.:;=?@\[\]^_{|}~]{27}$')
+        # Half-transparent (200, 80, 40) flattened onto white
+        red, green, blue = (int(primary_image['dominant_color'][i:i + 2], 16) for i in (1, 3, 5))
+        self.assertTrue(abs(red - 228) <= 3 and abs(green - 168) <= 3 and abs(blue - 148) <= 3)
+
+
+@override_settings(MEDIA_STORE={'ORPHAN_GRACE_HOURS': 0})
+class ContentAddressedMediaTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        enter_context(self, mock.patch('properties.signals.process_property_image_task'))
+
+        owner = User.objects.create_customer('relister@example.com', 'Re', 'Lister', 'S3cure-pass-123')
+        self.first = create_property(owner, title='First listing')
+        self.second = create_property(owner, title='Relisted')
+        buffer = io.BytesIO()
+        PillowImage.new('RGB', (800, 600), 'teal').save(buffer, format='JPEG')
+        self.photo = buffer.getvalue()
+
+    def _upload(self, property, name):
+        return PropertyImage.objects.create(
+            property=property, image=SimpleUploadedFile(name, self.photo, content_type='image/jpeg')
+        )
+
+    def test_identical_uploads_share_one_file_and_its_variants(self):
+        original = self._upload(self.first, 'front.jpg')
+        generate_image_variants(original)
+        copy = self._upload(self.second, 'IMG_0001.JPG')
+
+        self.assertEqual(copy.image.name, original.image.name)
+        self.assertEqual(StoredBlob.objects.get(name=original.image.name).refcount, 2)
+
+        with mock.patch('properties.imaging.render_image') as render:
+            generate_image_variants(copy)
+        render.assert_not_called()
+        self.assertEqual(
+            sorted(copy.variants.values_list('file', flat=True)),
+            sorted(original.variants.values_list('file', flat=True))
+        )
+        self.assertEqual(copy.thumbnail.name, original.thumbnail.name)
+        self.assertEqual(copy.dhash, original.dhash)
+        self.assertIsNotNone(copy.dhash)
+
+    def test_orphans_are_collected_once_unreferenced(self):
+        original = self._upload(self.first, 'front.jpg')
+        copy = self._upload(self.second, 'front-again.jpg')
+        path = original.image.path
+
+        original.delete()
+        self.assertEqual(collect_orphan_blobs(), (0, 0))
+        self.assertTrue(os.path.exists(path))
+
+        # A counter that drifted to zero is repaired, not trusted
+        StoredBlob.objects.filter(name=copy.image.name).update(refcount=0)
+        self.assertEqual(collect_orphan_blobs(), (0, 1))
+
+        copy.delete()
+        self.assertEqual(collect_orphan_blobs(), (1, 0))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredBlob.objects.exists())
+
+
+class NearDuplicateImageTests(APITestCase):
+    def setUp(self):
+        enter_context(self, mock.patch('properties.signals.process_property_image_task'))
+        owner = User.objects.create_customer('dup@example.com', 'Dup', 'Er', 'S3cure-pass-123')
+        self.listing = create_property(owner, title='Listing')
+        self.relisting = create_property(owner, title='Relisting')
+
+        gradient = PillowImage.linear_gradient('L').resize((640, 480)).convert('RGB')
+        recompressed = io.BytesIO()
+        gradient.resize((320, 240)).save(recompressed, format='JPEG', quality=40)
+        self.photo = gradient
+        self.copy = PillowImage.open(recompressed)
+        self.other = gradient.transpose(PillowImage.Transpose.FLIP_TOP_BOTTOM).rotate(90)
+
+    def _image(self, property, img):
+        return PropertyImage.objects.create(property=property, image='property_images/x.jpg', **hash_fields(dhash(img)))
+
+    def test_dhash_survives_rescaling_and_recompression(self):
+        self.assertLessEqual(hamming(dhash(self.photo), dhash(self.copy)), 2)
+        self.assertGreater(hamming(dhash(self.photo), dhash(self.other)), 20)
+
+    def test_near_duplicates_across_listings(self):
+        original = self._image(self.listing, self.photo)
+        copy = self._image(self.relisting, self.copy)
+        self._image(self.relisting, self.other)
+
+        distance = hamming(original.dhash, copy.dhash)
+        self.assertEqual(near_duplicate_groups(), {original.pk: [(copy.pk, distance)], copy.pk: [(original.pk, distance)]})
+
+        admin = User.objects.create_superuser('boss@example.com', 'Bo', 'Ss', 'S3cure-pass-123')
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse('property-near-duplicates', args=[self.listing.id]))
+        self.assertEqual(response.data[0]['matches'][0]['property_title'], 'Relisting')
+
+    def test_photos_of_the_same_listing_are_not_duplicates(self):
+        front = self._image(self.listing, self.photo)
+        self._image(self.listing, self.copy)
+
+        self.assertEqual(near_duplicates(front), [])
+        self.assertEqual(near_duplicate_groups(), {})
+
+    def test_admin_report_is_cached_until_hashes_change(self):
+        cache.clear()
+        original = self._image(self.listing, self.photo)
+        with self.captureOnCommitCallbacks(execute=True):
+            copy = self._image(self.relisting, self.copy)
+        self.assertEqual(duplicated_image_ids(), sorted([original.pk, copy.pk]))
+        with self.assertNumQueries(0):
+            duplicated_image_ids()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            copy.delete()
+        self.assertEqual(duplicated_image_ids(), [])
+
+
+class ChunkedUploadTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        enter_context(self, override_settings(MEDIA_UPLOADS={'DIRECTORY': self.temporary_directory()}))
+        self.process_image = enter_context(self, mock.patch('properties.signals.process_property_image_task'))
+        cache.clear()
+
+        admin = User.objects.create_superuser('uploader@example.com', 'Up', 'Loader', 'S3cure-pass-123')
+        self.client.force_authenticate(admin)
+        self.property = create_property(admin)
+        buffer = io.BytesIO()
+        PillowImage.effect_noise((256, 256), 64).convert('RGB').save(buffer, format='JPEG', quality=95)
+        self.photo = buffer.getvalue()
+
+    def _start(self, filename='lounge.jpg', size=None):
+        return self.client.post(reverse('upload-list'), {
+            'property': self.property.id, 'kind': 'image', 'filename': filename,
+            'total_size': size or len(self.photo),
+        }, format='json')
+
+    def _put(self, session_id, start, data, total=None):
+        return self.client.generic(
+            'PUT', reverse('upload-detail', args=[session_id]), data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{total or len(self.photo)}'
+        )
+
+    def test_chunks_resume_from_offset_and_finalize_attaches_image(self):
+        session = self._start().data
+        half = len(self.photo) // 2
+
+        self.assertEqual(self._put(session['id'], 0, self.photo[:half]).data['offset'], half)
+        self.assertEqual(self._put(session['id'], 0, self.photo[:half]).status_code, status.HTTP_409_CONFLICT)
+        resumed = self.client.get(reverse('upload-detail', args=[session['id']])).data
+        self.assertEqual((resumed['offset'], resumed['content_type']), (half, 'image/jpeg'))
+        self._put(session['id'], half, self.photo[half:])
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(reverse('upload-finalize', args=[session['id']]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Processing is only queued once the new row has been committed
+        self.process_image.delay.assert_not_called()
+        for callback in callbacks:
+            callback()
+        self.process_image.delay.assert_called_once_with(response.data['id'])
+        image = PropertyImage.objects.get(pk=response.data['id'])
+        self.assertEqual(image.property, self.property)
+        self.assertEqual(image.image.read(), self.photo)
+        self.assertFalse(os.listdir(get_media_uploads_setting('DIRECTORY')))
+
+    def test_offset_is_checked_against_the_stored_session(self):
+        session = UploadSession.objects.get(pk=self._start().data['id'])
+        half = len(self.photo) // 2
+        self.assertEqual(self._put(session.pk, 0, self.photo[:half]).data['offset'], half)
+
+        # A stale copy, as read by a request that raced the first chunk
+        with self.assertRaises(OffsetMismatch):
+            write_chunk(session, 0, half, io.BytesIO(self.photo[:half]))
+        self.assertEqual(session.received, half)
+
+        UploadSession.objects.filter(pk=session.pk).update(status='aborted')
+        with self.assertRaises(ValidationError):
+            write_chunk(session, half, len(self.photo) - half, io.BytesIO(self.photo[half:]))
+
+    def test_empty_chunk_body_is_rejected(self):
+        session = self._start().data
+        response = self.client.generic(
+            'PUT', reverse('upload-detail', args=[session['id']]), b'', content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes 0-9/{len(self.photo)}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_type_and_size_are_checked_while_streaming(self):
+        self.assertEqual(self._start(filename='notes.txt').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._start(size=10 ** 9).status_code, status.HTTP_400_BAD_REQUEST)
+
+        text = b'not really a jpeg ' * 100
+        session = self._start(size=len(text)).data
+        response = self._put(session['id'], 0, text, total=len(text))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get(pk=session['id']).received, 0)
+
+        response = self.client.post(reverse('upload-finalize', args=[session['id']]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_multipart_uploads_are_sniffed_and_capped_while_streaming(self):
+        url = reverse('property-upload-image', args=[self.property.id])
+        disguised = SimpleUploadedFile('lounge.jpg', b'#!/bin/sh\necho hi\n' * 50, content_type='image/jpeg')
+        response = self.client.post(url, {'image': disguised}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('not an allowed image type', response.data['image'][0])
+
+        with override_settings(MEDIA_UPLOADS={'MAX_SIZE': {'image': len(self.photo) - 1, 'video': 1}}):
+            photo = SimpleUploadedFile('lounge.jpg', self.photo, content_type='image/jpeg')
+            response = self.client.post(url, {'image': photo}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('limited to', str(response.data))
+        self.assertFalse(PropertyImage.objects.exists())
+
+        photo = SimpleUploadedFile('lounge.jpg', self.photo, content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'image': photo}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(PropertyImage.objects.get(pk=response.data['id']).image.read(), self.photo)
+        # One libmagic handle serves every upload in the process
+        self.assertIs(get_detector(), get_detector())
+
+    def test_uploads_parsed_before_the_view_are_still_checked(self):
+        url = reverse('property-upload-image', args=[self.property.id])
+        disguised = SimpleUploadedFile('lounge.jpg', b'#!/bin/sh\necho hi\n' * 50, content_type='image/jpeg')
+        django_request = APIRequestFactory().post(url, {'image': disguised}, format='multipart')
+        # As SessionAuthentication's CSRF check does, before the view runs
+        django_request.POST
+        with self.assertRaises(ValidationError) as raised:
+            read_media_upload(Request(django_request, parsers=[MultiPartParser()]), 'image')
+        self.assertIn('not an allowed image type', str(raised.exception.detail['image'][0]))
+
+        photo = SimpleUploadedFile('lounge.jpg', self.photo, content_type='image/jpeg')
+        django_request = APIRequestFactory().post(url, {'image': photo}, format='multipart')
+        django_request.POST
+        with override_settings(MEDIA_UPLOADS={'MAX_SIZE': {'image': len(self.photo) - 1, 'video': 1}}):
+            with self.assertRaises(ValidationError):
+                read_media_upload(Request(django_request, parsers=[MultiPartParser()]), 'image')
+
+
+class VideoPipelineTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        enter_context(self, mock.patch('properties.signals.process_property_video_task'))
+
+        owner = User.objects.create_superuser('video@example.com', 'Vid', 'Eo', 'S3cure-pass-123')
+        self.video = PropertyVideo.objects.create(
+            property=create_property(owner), video_file=SimpleUploadedFile('tour.mp4', b'\x00\x00\x00\x18ftypmp42' * 64)
+        )
+        self.probe = enter_context(self, mock.patch('properties.video.probe', return_value={
+            'duration': 93.4, 'width': 1280, 'height': 720, 'has_audio': True,
+        }))
+        poster = io.BytesIO()
+        PillowImage.new('RGB', (64, 36), 'navy').save(poster, format='JPEG')
+        enter_context(self, mock.patch('properties.video.extract_poster', return_value=poster.getvalue()))
+
+    def test_missing_ffmpeg_binaries_are_reported(self):
+        with override_settings(VIDEO_PIPELINE={'FFMPEG': 'ffmpeg-not-installed', 'FFPROBE': 'ffprobe-not-installed'}):
+            self.assertEqual(missing_binaries(), ['ffmpeg-not-installed', 'ffprobe-not-installed'])
+        with mock.patch('properties.video.shutil.which', return_value='/usr/bin/ffmpeg'):
+            self.assertEqual(missing_binaries(), [])
+
+    def test_ladder_never_upscales_and_maps_audio_per_rendition(self):
+        self.assertEqual([rung[0] for rung in ladder_for(720)], [360, 720])
+        self.assertEqual([rung[0] for rung in ladder_for(2160)], [360, 720, 1080])
+        self.assertEqual(ladder_for(241)[0][0], 240)
+
+        command = hls_command('in.mp4', '/out', ladder_for(720), has_audio=True)
+        self.assertEqual(command[command.index('-var_stream_map') + 1], 'v:0,a:0 v:1,a:1')
+        self.assertIn('[0:v]split=2[s0][s1];[s0]scale=-2:360[v0];[s1]scale=-2:720[v1]', command)
+        silent = hls_command('in.mp4', '/out', ladder_for(720), has_audio=False)
+        self.assertNotIn('0:a:0', silent)
+        self.assertEqual(silent[silent.index('-var_stream_map') + 1], 'v:0 v:1')
+
+    def test_transcode_stores_hls_stream_and_tracks_progress(self):
+        seen = []
+
+        def transcode(source, output_dir, rungs, has_audio, duration, on_progress=None):
+            on_progress(0.5)
+            seen.append(PropertyVideo.objects.get(pk=self.video.pk).processing_progress)
+            for name in ('master.m3u8', 'v0/index.m3u8', 'v0/segment_00000.ts', 'v1/index.m3u8'):
+                os.makedirs(os.path.dirname(os.path.join(output_dir, name)), exist_ok=True)
+                with open(os.path.join(output_dir, name), 'w') as f:
+                    f.write('#EXTM3U\n')
+
+        with mock.patch('properties.video.transcode_hls', side_effect=transcode):
+            process_property_video_task(self.video.pk)
+
+        self.assertEqual(seen, [50])
+        video = PropertyVideo.objects.get(pk=self.video.pk)
+        self.assertEqual((video.processing_status, video.processing_progress, video.duration), ('ready', 100, 93))
+        self.assertEqual(video.hls_playlist.name, f'video_streams/{video.pk}/master.m3u8')
+        self.assertTrue(video.thumbnail)
+        request = mock.Mock(build_absolute_uri=lambda url: url)
+        self.assertTrue(PropertyVideoSerializer(video, context={'request': request}).data['hls_url'].endswith('master.m3u8'))
+
+        segment = os.path.join(os.path.dirname(video.hls_playlist.path), 'v0', 'segment_00000.ts')
+        self.assertTrue(os.path.exists(segment))
+        with self.captureOnCommitCallbacks(execute=True):
+            video.delete()
+        self.assertFalse(os.path.exists(segment))
+
+    def test_rejected_input_marks_video_failed_without_retrying(self):
+        with mock.patch('properties.video.transcode_hls', side_effect=VideoProcessingError('moov atom not found')):
+            result = process_property_video_task(self.video.pk)
+
+        self.assertTrue(result.startswith('Failed'))
+        video = PropertyVideo.objects.get(pk=self.video.pk)
+        self.assertEqual((video.processing_status, video.processing_error), ('failed', 'moov atom not found'))
+        self.assertFalse(video.hls_playlist)
+        self.assertIsNone(PropertyVideoSerializer(video, context={'request': mock.Mock()}).data['hls_url'])
+
+
+class ImageResizeTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.renders = self.temporary_directory()
+        enter_context(self, override_settings(IMAGE_RESIZE={'DIRECTORY': self.renders, 'MAX_CACHE_BYTES': 10 ** 7}))
+        cache.clear()
+
+        owner = User.objects.create_customer('resize@example.com', 'Re', 'Size', 'S3cure-pass-123')
+        buffer = io.BytesIO()
+        PillowImage.effect_noise((900, 600), 64).convert('RGB').save(buffer, format='JPEG')
+        with mock.patch('properties.signals.process_property_image_task'):
+            self.image = PropertyImage.objects.create(
+                property=create_property(owner), image=SimpleUploadedFile('den.jpg', buffer.getvalue())
+            )
+
+    def _url(self, width, fmt='webp'):
+        return reverse('property-resized-image', args=[self.image.pk, render_version(self.image), width, fmt])
+
+    def _get(self, width, fmt='webp'):
+        return self.client.get(self._url(width, fmt))
+
+    def test_renders_once_then_serves_immutable_cached_file(self):
+        response = self._get(300)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        # Widths round up to the 40px step; never wider than the original
+        self.assertEqual(PillowImage.open(io.BytesIO(b''.join(response.streaming_content))).size, (320, 213))
+
+        with mock.patch('properties.resizing.render_resized') as render:
+            self.assertEqual(self._get(310).status_code, status.HTTP_200_OK)
+            render.assert_not_called()
+        response = self._get(2000, 'jpeg')
+        self.assertEqual(PillowImage.open(io.BytesIO(b''.join(response.streaming_content))).size, (900, 600))
+        self.assertTrue(os.path.exists(cache_path(self.image, 2000, 'jpeg')))
+        self.assertEqual(self.client.get(self._url(300).replace('/webp/', '/gif/')).status_code, 404)
+
+    def test_replaced_original_moves_to_a_new_url(self):
+        stale_url = self._url(300)
+        etag = self._get(300)['ETag']
+        self.assertEqual(
+            self.client.get(stale_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+        buffer = io.BytesIO()
+        PillowImage.new('RGB', (600, 400), 'red').save(buffer, format='JPEG')
+        with mock.patch('properties.signals.process_property_image_task'):
+            self.image.image = SimpleUploadedFile('den.jpg', buffer.getvalue())
+            self.image.save()
+        self.assertNotEqual(self._url(300), stale_url)
+        response = self.client.get(stale_url)
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response['Location'], self._url(300))
+
+        response = self._get(300)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertGreater(PillowImage.open(io.BytesIO(b''.join(response.streaming_content))).getpixel((0, 0))[0], 200)
+
+    def test_least_recently_used_renders_are_evicted_past_the_cap(self):
+        paths = [os.path.join(self.renders, f'render{i}.webp') for i in range(4)]
+        for age, path in zip((40, 30, 20, 10), paths):
+            with open(path, 'wb') as f:
+                f.write(b'x' * 400)
+            os.utime(path, (time.time() - age * 3600,) * 2)
+        enter_context(self, override_settings(
+            IMAGE_RESIZE={'DIRECTORY': self.renders, 'MAX_CACHE_BYTES': 1000, 'TOUCH_INTERVAL_SECONDS': 0}
+        ))
+        # A hit makes the oldest render the most recently used
+        with mock.patch('properties.resizing.cache_path', return_value=paths[0]):
+            self.assertEqual(cached_resized_image(self.image, 640, 'webp'), paths[0])
+
+        self.assertEqual(evict_resized_images(), 2)
+        self.assertEqual([os.path.exists(path) for path in paths], [True, False, False, True])
+        self.assertEqual(cache.get('image_resize:bytes'), 800)
+
+    def test_concurrent_misses_coalesce_into_one_render(self):
+        path = cache_path(self.image, 640, 'webp')
+        lock = f'image_resize:{os.path.basename(path)}:lock'
+        cache.add(lock, 1)
+
+        def finish_other_render():
+            time.sleep(0.2)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'rendered elsewhere')
+            cache.delete(lock)
+
+        other = threading.Thread(target=finish_other_render)
+        other.start()
+        with mock.patch('properties.resizing.render_resized') as render:
+            self.assertEqual(cached_resized_image(self.image, 640, 'webp'), path)
+        other.join()
+        render.assert_not_called()
+
+    def test_stalled_render_is_not_waited_on_for_long(self):
+        path = cache_path(self.image, 640, 'webp')
+        cache.add(f'image_resize:{os.path.basename(path)}:lock', 1)
+        enter_context(self, override_settings(IMAGE_RESIZE={'DIRECTORY': self.renders, 'RENDER_WAIT_SECONDS': 0.1}))
+
+        started = time.monotonic()
+        self.assertEqual(cached_resized_image(self.image, 640, 'webp'), path)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(os.path.exists(path))
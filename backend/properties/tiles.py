@@ -0,0 +1,125 @@
+# backend/properties/tiles.py
+import math
+
+from django.core.cache import cache
+from django.db.models import Count, FloatField, Max, Min, Avg
+from django.db.models.functions import Cast, Substr
+
+from core.utils import get_app_setting
+from .models import Property
+
+
+# Depth of the quadkey stored on Property; level 20 cells are ~40m wide
+QUADKEY_ZOOM = 20
+# Web Mercator cannot represent the poles
+MAX_LATITUDE = 85.05112878
+
+MAP_TILES_DEFAULTS = {
+    'CLUSTER_DEPTH': 3,          # A tile is clustered on a 2**depth x 2**depth grid
+    'CACHE_TIMEOUT': 86400,      # Tiles of an old catalogue version expire on their own
+}
+
+VERSION_KEY = 'map_tiles:version'
+
+# Property fields that can move a listing on, onto or off the map
+TILE_FIELDS = {'latitude', 'longitude', 'quadkey', 'status', 'price'}
+
+
+def get_map_tiles_setting(name):
+    return get_app_setting('MAP_TILES', name, MAP_TILES_DEFAULTS)
+
+
+def tile_for(latitude, longitude, zoom):
+    """(x, y) of the slippy-map tile containing the point at `zoom`."""
+    latitude = min(max(float(latitude), -MAX_LATITUDE), MAX_LATITUDE)
+    n = 2 ** zoom
+    x = int((float(longitude) + 180.0) / 360.0 * n)
+    sin_lat = math.sin(math.radians(latitude))
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_quadkey(zoom, x, y):
+    """
+    Quadtree key of a tile: one digit (0-3) per zoom level, so the key of
+    every cell inside a tile starts with the tile's key.
+    """
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def quadkey_for(latitude, longitude):
+    if latitude is None or longitude is None:
+        return ''
+    return tile_quadkey(QUADKEY_ZOOM, *tile_for(latitude, longitude, QUADKEY_ZOOM))
+
+
+def catalogue_version():
+    cache.add(VERSION_KEY, 1, timeout=None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def bump_catalogue_version():
+    """Retires every cached tile at once; old entries simply expire."""
+    cache.add(VERSION_KEY, 1, timeout=None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+        return 2
+
+
+def build_tile(zoom, x, y):
+    """
+    Clusters of available listings inside one tile, one per quadtree cell
+    CLUSTER_DEPTH levels below it. The tile is a quadkey prefix range, so
+    this is one indexed, grouped query.
+    """
+    prefix = tile_quadkey(zoom, x, y)
+    cell_length = min(zoom + get_map_tiles_setting('CLUSTER_DEPTH'), QUADKEY_ZOOM)
+    queryset = Property.objects.filter(status='available', quadkey__startswith=prefix)
+    if not prefix:
+        queryset = queryset.exclude(quadkey='')
+
+    cells = (
+        queryset.annotate(cell=Substr('quadkey', 1, cell_length))
+        .values('cell')
+        .annotate(
+            count=Count('pk'),
+            latitude=Avg(Cast('latitude', FloatField())),
+            longitude=Avg(Cast('longitude', FloatField())),
+            min_price=Min('price'),
+            max_price=Max('price'),
+            property_id=Min('pk'),
+        )
+        .order_by('cell')
+    )
+    clusters = []
+    for cell in cells:
+        cluster = {
+            'key': cell['cell'],
+            'count': cell['count'],
+            'latitude': round(cell['latitude'], 6),
+            'longitude': round(cell['longitude'], 6),
+            'min_price': cell['min_price'],
+            'max_price': cell['max_price'],
+        }
+        # A single listing can be drawn as a marker and linked directly
+        if cell['count'] == 1:
+            cluster['property_id'] = cell['property_id']
+        clusters.append(cluster)
+    return clusters
+
+
+def get_tile(zoom, x, y):
+    """(version, clusters) for a tile, cached per catalogue version."""
+    version = catalogue_version()
+    key = f'map_tiles:{version}:{zoom}:{x}:{y}'
+    clusters = cache.get(key)
+    if clusters is None:
+        clusters = build_tile(zoom, x, y)
+        cache.set(key, clusters, timeout=get_map_tiles_setting('CACHE_TIMEOUT'))
+    return version, clusters
@@ -0,0 +1,150 @@
+# backend/properties/trending.py
+import math
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from core.utils import get_app_setting, get_client_ip
+from .models import Property, PropertyTrend, PropertyTrendFold
+
+
+TRENDING_DEFAULTS = {
+    'BUCKET_SECONDS': 300,       # Width of one view-counter bucket
+    'BUCKET_TTL_SECONDS': 21600, # Unfolded buckets older than this are lost
+    'HALF_LIFE_HOURS': 24,       # A view counts half as much after this long
+    'MAX_RANKED': 100,           # Length of the precomputed trending list
+    'MIN_SCORE': 0.05,           # Trends decayed below this are dropped
+}
+
+
+def get_trending_setting(name):
+    return get_app_setting('TRENDING', name, TRENDING_DEFAULTS)
+
+
+def current_bucket(now=None):
+    return int((now or time.time()) // get_trending_setting('BUCKET_SECONDS'))
+
+
+def _incr(key, timeout):
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key expired between add() and incr()
+        cache.set(key, 1, timeout=timeout)
+        return 1
+
+
+def record_property_view(property_id, request):
+    """
+    Counts a view of `property_id` in the current bucket, at most once per
+    viewer (user, else client IP) and bucket. Cache operations only.
+
+    The first view of a property in a bucket also claims a numbered slot in
+    that bucket (an atomic add + incr), so the fold task can enumerate the
+    viewed properties without a shared, racy set.
+    """
+    bucket = current_bucket()
+    timeout = get_trending_setting('BUCKET_TTL_SECONDS')
+    prefix = f'property_views:{bucket}'
+
+    user_id = getattr(request.user, 'pk', None)
+    viewer = f'u{user_id}' if user_id else f'ip{get_client_ip(request)}'
+    if not cache.add(f'{prefix}:viewer:{property_id}:{viewer}', 1, timeout=timeout):
+        return False
+
+    if cache.add(f'{prefix}:seen:{property_id}', 1, timeout=timeout):
+        slot = _incr(f'{prefix}:slots', timeout)
+        cache.set(f'{prefix}:slot:{slot}', property_id, timeout=timeout)
+    _incr(f'{prefix}:count:{property_id}', timeout)
+    return True
+
+
+def collect_bucket_views(bucket):
+    """{property_id: views} recorded in one bucket."""
+    prefix = f'property_views:{bucket}'
+    slots = cache.get(f'{prefix}:slots', 0)
+    if not slots:
+        return {}
+    property_ids = cache.get_many([f'{prefix}:slot:{slot}' for slot in range(1, slots + 1)]).values()
+    counts = cache.get_many([f'{prefix}:count:{property_id}' for property_id in property_ids])
+    return {
+        property_id: counts.get(f'{prefix}:count:{property_id}', 0)
+        for property_id in property_ids
+    }
+
+
+def fold_property_views(now=None):
+    """
+    Folds every closed, not yet folded bucket into PropertyTrend.
+
+    score(now) = score(last fold) * decay(elapsed) + sum(views * decay(age of bucket)),
+    with decay(t) = 0.5 ** (t / half_life). Trends below MIN_SCORE are
+    dropped and the top MAX_RANKED available properties get a rank.
+    Returns the number of buckets folded.
+
+    The watermark (PropertyTrendFold) is kept in the database with the
+    trends, since the view buckets outlive a fold and must not be counted
+    again if a cache key is evicted.
+    """
+    with transaction.atomic():
+        # The locked watermark also keeps concurrent folds apart
+        watermark = PropertyTrendFold.objects.select_for_update().first()
+        return _fold_property_views(now or time.time(), watermark)
+
+
+def _folded_through(watermark):
+    if watermark is not None:
+        return watermark.folded_through
+    # No watermark yet: trends written by an earlier fold cover every bucket
+    # closed before it ran
+    latest = PropertyTrend.objects.aggregate(latest=Max('updated_at'))['latest']
+    return current_bucket(latest.timestamp()) - 1 if latest else None
+
+
+def _fold_property_views(now, watermark):
+    bucket_seconds = get_trending_setting('BUCKET_SECONDS')
+    half_life = get_trending_setting('HALF_LIFE_HOURS') * 3600
+    last_closed = current_bucket(now) - 1
+    oldest = current_bucket(now) - get_trending_setting('BUCKET_TTL_SECONDS') // bucket_seconds
+    folded_through = _folded_through(watermark)
+    first = max(folded_through + 1 if folded_through is not None else oldest, oldest)
+
+    def decay(seconds):
+        return 0.5 ** (max(seconds, 0) / half_life)
+
+    fresh = {}
+    for bucket in range(first, last_closed + 1):
+        weight = decay(now - (bucket + 1) * bucket_seconds)
+        for property_id, views in collect_bucket_views(bucket).items():
+            fresh[property_id] = fresh.get(property_id, 0.0) + views * weight
+
+    scores = {}
+    for trend in PropertyTrend.objects.all():
+        scores[trend.property_id] = trend.score * decay(now - trend.updated_at.timestamp())
+    for property_id, score in fresh.items():
+        scores[property_id] = scores.get(property_id, 0.0) + score
+
+    min_score = get_trending_setting('MIN_SCORE')
+    scores = {pk: score for pk, score in scores.items() if score >= min_score and math.isfinite(score)}
+    available = set(
+        Property.objects.filter(pk__in=scores.keys(), status='available').values_list('pk', flat=True)
+    )
+    ranked = sorted((pk for pk in scores if pk in available), key=lambda pk: (-scores[pk], pk))
+    ranks = {pk: rank for rank, pk in enumerate(ranked[:get_trending_setting('MAX_RANKED')], start=1)}
+
+    PropertyTrend.objects.all().delete()
+    PropertyTrend.objects.bulk_create(
+        [
+            PropertyTrend(property_id=pk, score=score, rank=ranks.get(pk))
+            for pk, score in scores.items() if pk in available
+        ],
+        batch_size=1000
+    )
+    if watermark is None:
+        watermark = PropertyTrendFold(folded_through=last_closed)
+    watermark.folded_through = max(last_closed, watermark.folded_through)
+    watermark.save()
+    return max(last_closed - first + 1, 0)
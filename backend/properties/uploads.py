@@ -0,0 +1,276 @@
+# backend/properties/uploads.py
+import os
+import re
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.filetypes import detect_file_mime, detect_mime
+from core.utils import get_app_setting
+from .models import PropertyImage, PropertyVideo, UploadSession
+
+
+MEDIA_UPLOADS_DEFAULTS = {
+    'DIRECTORY': None,                          # Chunked partial files; None means <tmp>/chunked-uploads
+    'MAX_SIZE': {'image': 25 * 1024 * 1024, 'video': 500 * 1024 * 1024},
+    'SESSION_TTL_HOURS': 24,                    # Idle sessions expire and their bytes are dropped
+    'BLOCK_SIZE': 64 * 1024,                    # Bytes read from the request per write
+}
+
+ALLOWED_TYPES = {
+    'image': {'image/jpeg', 'image/png', 'image/gif'},
+    'video': {'video/mp4', 'video/quicktime'},
+}
+ALLOWED_EXTENSIONS = {
+    'image': ('.jpg', '.jpeg', '.png', '.gif'),
+    'video': ('.mp4', '.mov'),
+}
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+# Multipart boundaries, headers and small form fields on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class OffsetMismatch(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Chunk does not start at the current upload offset.'
+    default_code = 'offset_mismatch'
+
+
+class UploadBusy(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Another chunk of this upload is being written.'
+    default_code = 'upload_busy'
+
+
+def get_media_uploads_setting(name):
+    return get_app_setting('MEDIA_UPLOADS', name, MEDIA_UPLOADS_DEFAULTS)
+
+
+def part_path(session):
+    directory = get_media_uploads_setting('DIRECTORY') or os.path.join(tempfile.gettempdir(), 'chunked-uploads')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{session.pk}.part')
+
+
+def session_expiry():
+    return timezone.now() + timedelta(hours=get_media_uploads_setting('SESSION_TTL_HOURS'))
+
+
+class MediaUploadHandler(FileUploadHandler):
+    """
+    First handler of a media upload request. It sniffs the first chunk of
+    every file with the shared libmagic detector and counts bytes as they
+    arrive, passing the data on to Django's memory/temporary-file handlers.
+    A wrong type or a file past the kind's MAX_SIZE stops the upload at
+    once (nothing more is read or written), and the reason is left in
+    request.upload_errors for the view to report.
+    """
+
+    def __init__(self, request, kind):
+        super().__init__(request)
+        self.kind = kind
+        self.max_size = get_media_uploads_setting('MAX_SIZE')[kind]
+
+    def reject(self, field_name, message):
+        self.request.upload_errors = {field_name: [message]}
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            # Refuse before reading a single byte of the body
+            self.reject('non_field_errors', f'{self.kind.capitalize()} uploads are limited to {self.max_size} bytes.')
+            return QueryDict(), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0:
+            detected = detect_mime(raw_data)
+            if detected not in ALLOWED_TYPES[self.kind]:
+                self.reject(self.field_name, f'{detected} is not an allowed {self.kind} type.')
+                raise StopUpload(connection_reset=True)
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.reject(self.field_name, f'{self.kind.capitalize()} uploads are limited to {self.max_size} bytes.')
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        # The next handler builds the uploaded file
+        return None
+
+
+def read_media_upload(request, kind):
+    """
+    request.data of a multipart media upload, parsed with a MediaUploadHandler
+    in front of the default handlers. Raises ValidationError when the handler
+    stopped the upload. When the body was already parsed (SessionAuthentication's
+    CSRF check reads request.POST first), the stored files get the same type
+    and size checks instead.
+    """
+    django_request = request._request
+    django_request.upload_errors = {}
+    if hasattr(django_request, '_files'):
+        django_request.upload_errors = check_parsed_uploads(django_request.FILES, kind)
+    else:
+        django_request.upload_handlers = [MediaUploadHandler(django_request, kind), *django_request.upload_handlers]
+    data = request.data
+    if django_request.upload_errors:
+        raise ValidationError(django_request.upload_errors)
+    return data
+
+
+def check_parsed_uploads(files, kind):
+    """MediaUploadHandler's checks for files that were parsed without it; returns the errors."""
+    max_size = get_media_uploads_setting('MAX_SIZE')[kind]
+    for field_name, uploads in files.lists():
+        for upload in uploads:
+            detected = detect_file_mime(upload)
+            if detected not in ALLOWED_TYPES[kind]:
+                return {field_name: [f'{detected} is not an allowed {kind} type.']}
+            if upload.size > max_size:
+                return {field_name: [f'{kind.capitalize()} uploads are limited to {max_size} bytes.']}
+    return {}
+
+
+def validate_declared_upload(kind, filename, total_size):
+    """Checks a new session's declared name and size before any byte arrives."""
+    if not filename.lower().endswith(ALLOWED_EXTENSIONS[kind]):
+        raise ValidationError({'filename': f"Allowed {kind} extensions: {', '.join(ALLOWED_EXTENSIONS[kind])}."})
+    max_size = get_media_uploads_setting('MAX_SIZE')[kind]
+    if not 0 < total_size <= max_size:
+        raise ValidationError({'total_size': f"{kind.capitalize()} uploads must be 1 to {max_size} bytes."})
+
+
+def parse_content_range(header, session):
+    """(start, length) of a chunk from its Content-Range header."""
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        raise ValidationError({'detail': 'Content-Range: bytes <start>-<end>/<total> is required.'})
+    start, end, total = (int(group) for group in match.groups())
+    if total != session.total_size or end < start or end >= total:
+        raise ValidationError({'detail': f'Content-Range does not fit an upload of {session.total_size} bytes.'})
+    return start, end - start + 1
+
+
+def write_chunk(session, start, length, stream):
+    """
+    Appends one chunk, streaming it from the request into the partial file
+    BLOCK_SIZE bytes at a time. The first block of the upload is sniffed
+    (libmagic) and must be an allowed type for the session's kind. Bytes
+    received before a dropped connection are kept and acknowledged, so the
+    client resumes from the returned offset. Returns the new offset.
+    """
+    if stream is None:
+        # Django hands out no stream for an empty body
+        raise ValidationError({'detail': 'Chunk body is empty.'})
+    lock = f'upload_session:{session.pk}:lock'
+    if not cache.add(lock, 1, timeout=600):
+        raise UploadBusy()
+    try:
+        # `session` was read before the lock; another chunk may have landed since
+        session.refresh_from_db(fields=['status', 'received', 'content_type'])
+        if session.status != 'open':
+            raise ValidationError({'detail': f'Upload is {session.status}.'})
+        if start != session.received:
+            raise OffsetMismatch(f'Upload offset is {session.received}.')
+        _append_chunk(session, start, length, stream)
+    finally:
+        cache.delete(lock)
+    return session.received
+
+
+def _append_chunk(session, start, length, stream):
+    block_size = get_media_uploads_setting('BLOCK_SIZE')
+    path = part_path(session)
+    written = 0
+    try:
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as part:
+            # Drop bytes past the acknowledged offset left by an interrupted write
+            part.seek(start)
+            part.truncate()
+            while written < length:
+                block = stream.read(min(block_size, length - written))
+                if not block:
+                    break
+                if start + written == 0:
+                    detected = detect_mime(block)
+                    if detected not in ALLOWED_TYPES[session.kind]:
+                        raise ValidationError({'detail': f'{detected} is not an allowed {session.kind} type.'})
+                    UploadSession.objects.filter(pk=session.pk).update(content_type=detected)
+                    session.content_type = detected
+                part.write(block)
+                written += len(block)
+            part.flush()
+            os.fsync(part.fileno())
+    finally:
+        if written:
+            acknowledged = UploadSession.objects.filter(pk=session.pk, status='open', received=start).update(
+                received=start + written, expires_at=session_expiry(), updated_at=timezone.now()
+            )
+            if acknowledged:
+                session.received = start + written
+            else:
+                # Aborted or expired meanwhile: report what is actually stored
+                session.refresh_from_db(fields=['status', 'received'])
+
+
+@transaction.atomic
+def finalize_upload(session):
+    """
+    Attaches a fully received upload to its property as a PropertyImage or
+    PropertyVideo (running the model's own validation), then discards the
+    partial file. Returns the created media row.
+    """
+    session = UploadSession.objects.select_for_update().get(pk=session.pk)
+    if session.status != 'open':
+        raise ValidationError({'detail': f'Upload is {session.status}.'})
+    if session.received != session.total_size:
+        raise ValidationError({'detail': f'Received {session.received} of {session.total_size} bytes.'})
+
+    path = part_path(session)
+    with open(path, 'rb') as part:
+        upload = File(part, name=session.filename)
+        if session.kind == 'image':
+            media = PropertyImage(property=session.property, image=upload)
+        else:
+            media = PropertyVideo(property=session.property, video_file=upload)
+        try:
+            media.clean()
+        except DjangoValidationError as e:
+            raise ValidationError({'detail': e.messages})
+        media.save()
+
+    session.status = 'complete'
+    setattr(session, session.kind, media)
+    session.save(update_fields=['status', session.kind, 'updated_at'])
+    transaction.on_commit(lambda: os.path.exists(path) and os.remove(path))
+    return media
+
+
+def abort_upload(session):
+    UploadSession.objects.filter(pk=session.pk, status='open').update(status='aborted', updated_at=timezone.now())
+    path = part_path(session)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def expire_upload_sessions():
+    """Aborts open sessions idle past their expiry and drops their bytes. Returns the count."""
+    expired = list(UploadSession.objects.filter(status='open', expires_at__lt=timezone.now()))
+    for session in expired:
+        abort_upload(session)
+    return len(expired)
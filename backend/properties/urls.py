@@ -9,7 +9,8 @@ from .views import (
     RentalContractViewSet,
     SaleContractViewSet,
     ServiceSubscriptionViewSet,
-    PropertyPlaceOfInterestViewSet
+    PropertyPlaceOfInterestViewSet,
+    UploadSessionViewSet
 )
 
 
@@ -21,6 +22,7 @@ router.register(r'rental-contracts', RentalContractViewSet, basename='rental-con
 router.register(r'sale-contracts', SaleContractViewSet, basename='sale-contract')
 router.register(r'subscriptions', ServiceSubscriptionViewSet, basename='subscription')
 router.register(r'property-places', PropertyPlaceOfInterestViewSet, basename='property-place')
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
 
 
 urlpatterns = [
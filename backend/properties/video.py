@@ -0,0 +1,268 @@
+# backend/properties/video.py
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from core.utils import get_app_setting
+from .models import PropertyVideo
+
+logger = logging.getLogger(__name__)
+
+
+VIDEO_PIPELINE_DEFAULTS = {
+    'FFMPEG': 'ffmpeg',
+    'FFPROBE': 'ffprobe',
+    # (height, video kbps, audio kbps) rungs; only those not above the source are encoded
+    'LADDER': [(360, 800, 96), (720, 2800, 128), (1080, 5000, 160)],
+    'SEGMENT_SECONDS': 6,
+    'PRESET': 'veryfast',                # libx264 speed/size trade-off
+    'POSTER_AT': 0.1,                    # Poster frame position, as a fraction of the duration
+    'POSTER_WIDTH': 1280,
+    'PROBE_TIMEOUT': 60,                 # Seconds for ffprobe and the poster frame
+}
+
+MASTER_PLAYLIST = 'master.m3u8'
+# Share of the overall progress reached before and after the transcode itself
+TRANSCODE_START, TRANSCODE_END = 5, 95
+
+
+class VideoProcessingError(RuntimeError):
+    pass
+
+
+def get_video_pipeline_setting(name):
+    return get_app_setting('VIDEO_PIPELINE', name, VIDEO_PIPELINE_DEFAULTS)
+
+
+def missing_binaries():
+    """The configured FFmpeg executables that cannot be found on PATH."""
+    binaries = (get_video_pipeline_setting('FFMPEG'), get_video_pipeline_setting('FFPROBE'))
+    return [binary for binary in binaries if shutil.which(binary) is None]
+
+
+def _run(command, timeout=None):
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout, check=False)
+    except FileNotFoundError:
+        raise VideoProcessingError(f"{command[0]} is not installed")
+    except subprocess.TimeoutExpired:
+        raise VideoProcessingError(f"{os.path.basename(command[0])} timed out after {timeout}s")
+    if result.returncode != 0:
+        raise VideoProcessingError(result.stderr.decode(errors='replace').strip()[-1000:])
+    return result.stdout
+
+
+def probe(source):
+    """{duration, width, height, has_audio} of a video file, via ffprobe."""
+    output = _run([
+        get_video_pipeline_setting('FFPROBE'), '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', source,
+    ], timeout=get_video_pipeline_setting('PROBE_TIMEOUT'))
+    info = json.loads(output or b'{}')
+    streams = info.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    if video is None:
+        raise VideoProcessingError("No video stream found")
+
+    width, height = int(video['width']), int(video['height'])
+    # Phone footage is often stored sideways with a rotation hint
+    rotation = video.get('tags', {}).get('rotate') or next(
+        (entry.get('rotation') for entry in video.get('side_data_list', []) if 'rotation' in entry), 0
+    )
+    if abs(int(float(rotation))) % 180 == 90:
+        width, height = height, width
+    duration = float(info.get('format', {}).get('duration') or video.get('duration') or 0)
+    return {
+        'duration': duration,
+        'width': width,
+        'height': height,
+        'has_audio': any(stream.get('codec_type') == 'audio' for stream in streams),
+    }
+
+
+def ladder_for(height):
+    """Rungs of the configured ladder the source can fill, never upscaling."""
+    ladder = sorted(get_video_pipeline_setting('LADDER'))
+    rungs = [rung for rung in ladder if rung[0] <= height]
+    if not rungs:
+        # Smaller than the lowest rung: one rendition at the source height
+        rungs = [(height - height % 2, *ladder[0][1:])]
+    return rungs
+
+
+def extract_poster(source, duration):
+    """JPEG bytes of one frame POSTER_AT into the video."""
+    with tempfile.TemporaryDirectory(prefix='poster-') as directory:
+        poster = os.path.join(directory, 'poster.jpg')
+        _run([
+            get_video_pipeline_setting('FFMPEG'), '-hide_banner', '-nostdin', '-y',
+            '-ss', f"{duration * get_video_pipeline_setting('POSTER_AT'):.3f}", '-i', source,
+            '-frames:v', '1', '-vf', f"scale='min({get_video_pipeline_setting('POSTER_WIDTH')},iw)':-2",
+            '-q:v', '3', poster,
+        ], timeout=get_video_pipeline_setting('PROBE_TIMEOUT'))
+        with open(poster, 'rb') as f:
+            return f.read()
+
+
+def hls_command(source, output_dir, rungs, has_audio):
+    """
+    One ffmpeg run that decodes the source once, scales it to every rung
+    and encodes each as H.264 (+ AAC) HLS: v<i>/index.m3u8 with its
+    segments per rendition and master.m3u8 listing them. Keyframes are
+    forced on segment boundaries so every rendition switches cleanly.
+    """
+    segment = get_video_pipeline_setting('SEGMENT_SECONDS')
+    outputs = ''.join(f'[s{i}]' for i in range(len(rungs)))
+    scales = ';'.join(f'[s{i}]scale=-2:{height}[v{i}]' for i, (height, _, _) in enumerate(rungs))
+    command = [
+        get_video_pipeline_setting('FFMPEG'), '-hide_banner', '-nostdin', '-y', '-i', source,
+        '-progress', 'pipe:1', '-nostats',
+        '-filter_complex', f'[0:v]split={len(rungs)}{outputs};{scales}',
+    ]
+    for i, (height, video_kbps, audio_kbps) in enumerate(rungs):
+        command += [
+            '-map', f'[v{i}]', f'-c:v:{i}', 'libx264', f'-b:v:{i}', f'{video_kbps}k',
+            f'-maxrate:v:{i}', f'{video_kbps * 107 // 100}k', f'-bufsize:v:{i}', f'{video_kbps * 3 // 2}k',
+        ]
+        if has_audio:
+            command += ['-map', '0:a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', f'{audio_kbps}k']
+    stream_map = ' '.join(f'v:{i},a:{i}' if has_audio else f'v:{i}' for i in range(len(rungs)))
+    command += [
+        '-preset', get_video_pipeline_setting('PRESET'), '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        '-force_key_frames', f'expr:gte(t,n_forced*{segment})', '-sc_threshold', '0',
+        *(['-ac', '2'] if has_audio else []),
+        '-f', 'hls', '-hls_time', str(segment), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(output_dir, 'v%v', 'segment_%05d.ts'),
+        '-master_pl_name', MASTER_PLAYLIST, '-var_stream_map', stream_map,
+        os.path.join(output_dir, 'v%v', 'index.m3u8'),
+    ]
+    return command
+
+
+def transcode_hls(source, output_dir, rungs, has_audio, duration, on_progress=None):
+    """
+    Runs hls_command, calling on_progress(fraction) as ffmpeg reports the
+    position it has encoded up to on its -progress pipe.
+    """
+    for i in range(len(rungs)):
+        os.makedirs(os.path.join(output_dir, f'v{i}'), exist_ok=True)
+    command = hls_command(source, output_dir, rungs, has_audio)
+    # stderr goes to a file: a full pipe nobody reads would stall ffmpeg
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        except FileNotFoundError:
+            raise VideoProcessingError(f"{command[0]} is not installed")
+        with process:
+            for line in process.stdout:
+                key, _, value = line.decode(errors='replace').strip().partition('=')
+                if key == 'out_time_us' and value.isdigit() and duration and on_progress:
+                    on_progress(min(int(value) / 1_000_000 / duration, 1.0))
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise VideoProcessingError(stderr.read().decode(errors='replace').strip()[-1000:])
+
+
+def stream_directory(video):
+    return f'video_streams/{video.pk}'
+
+
+def remove_video_stream(directory):
+    """Deletes a stored HLS directory (playlists and segments)."""
+    try:
+        subdirectories, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        default_storage.delete(f'{directory}/{name}')
+    for name in subdirectories:
+        remove_video_stream(f'{directory}/{name}')
+
+
+def store_stream(output_dir, directory):
+    """Copies an HLS output tree into storage. Returns the master playlist name."""
+    remove_video_stream(directory)
+    for root, _, files in os.walk(output_dir):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, output_dir).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                default_storage.save(f'{directory}/{relative}', File(f))
+    return f'{directory}/{MASTER_PLAYLIST}'
+
+
+@contextmanager
+def local_source(video):
+    # ffmpeg needs a path; files on remote storages are copied down first
+    try:
+        path = video.video_file.path
+    except NotImplementedError:
+        path = None
+    if path:
+        yield path
+        return
+    suffix = os.path.splitext(video.video_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as copy:
+        with video.video_file.open('rb') as original:
+            shutil.copyfileobj(original, copy)
+        copy.flush()
+        yield copy.name
+
+
+def set_progress(video, percent):
+    percent = int(percent)
+    if percent > video.processing_progress:
+        video.processing_progress = percent
+        PropertyVideo.objects.filter(pk=video.pk).update(processing_progress=percent)
+
+
+def process_video(video):
+    """
+    Probes a PropertyVideo, extracts its poster frame as the thumbnail and
+    transcodes it to an adaptive HLS ladder, storing the playlists and
+    segments under video_streams/<id>/. Progress (0-100) and the outcome
+    are kept on the row as it goes; failures are recorded and re-raised.
+    """
+    PropertyVideo.objects.filter(pk=video.pk).update(
+        processing_status='processing', processing_progress=0, processing_error=''
+    )
+    video.processing_status, video.processing_progress, video.processing_error = 'processing', 0, ''
+    try:
+        with local_source(video) as source, tempfile.TemporaryDirectory(prefix='hls-') as output_dir:
+            info = probe(source)
+            poster = extract_poster(source, info['duration'])
+            rungs = ladder_for(info['height'])
+            set_progress(video, TRANSCODE_START)
+
+            transcode_hls(
+                source, output_dir, rungs, info['has_audio'], info['duration'],
+                on_progress=lambda done: set_progress(
+                    video, TRANSCODE_START + done * (TRANSCODE_END - TRANSCODE_START)
+                ),
+            )
+            playlist = store_stream(output_dir, stream_directory(video))
+    except Exception as e:
+        PropertyVideo.objects.filter(pk=video.pk).update(processing_status='failed', processing_error=str(e))
+        video.processing_status, video.processing_error = 'failed', str(e)
+        raise
+
+    stem = os.path.splitext(os.path.basename(video.video_file.name))[0]
+    video.thumbnail.save(f"poster_{stem}.jpg", ContentFile(poster), save=False)
+    video.duration = round(info['duration'])
+    video.hls_playlist.name = playlist
+    video.processing_status = 'ready'
+    video.processing_progress = 100
+    video.save(update_fields=[
+        'thumbnail', 'duration', 'hls_playlist', 'processing_status', 'processing_progress', 'updated_at'
+    ])
+    logger.info(f"Transcoded PropertyVideo ID {video.pk} to {len(rungs)} HLS renditions ({info['duration']:.0f}s)")
+    return rungs
@@ -1,20 +1,32 @@
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import viewsets, mixins, permissions, filters, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import FilterSet, NumberFilter, ChoiceFilter
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.db import transaction
+from django.http import FileResponse, HttpResponseNotModified, HttpResponseRedirect
+from django.urls import reverse
+from django.utils.http import parse_etags
+from PIL import UnidentifiedImageError
+from .duplicates import near_duplicates
+from .imaging import ImageTooLarge
+from .resizing import CACHE_CONTROL, canonical_width, open_resized_image, render_etag, render_version
+from .tiles import QUADKEY_ZOOM, get_tile
+from .uploads import abort_upload, finalize_upload, parse_content_range, read_media_upload, session_expiry, write_chunk
+from .trending import record_property_view
 from .models import (
     Property, PropertyInterest, Transaction, 
     PropertyImage, PropertyVideo, PropertyPlaceOfInterest,
-    RentalContract, SaleContract, ServiceSubscription
+    RentalContract, SaleContract, ServiceSubscription, UploadSession
 )
 from .serializers import (
     PublicPropertyListSerializer, PropertyDetailSerializer,
     PropertyInterestSerializer, PaymentSerializer,
     PropertyImageSerializer, PropertyVideoSerializer,
     PlaceOfInterestSerializer, RentalContractSerializer,
-    SaleContractSerializer, ServiceSubscriptionSerializer
+    SaleContractSerializer, ServiceSubscriptionSerializer, UploadSessionSerializer
 )
 
 
@@ -42,34 +54,114 @@ class PropertyViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_class = PropertyFilter
     search_fields = ['title', 'description', 'address', 'city']
-    ordering_fields = ['price', 'created_at', 'area']
+    ordering_fields = ['price', 'created_at', 'area', 'popularity', 'favorites_count', 'interests_count']
     ordering = ['-created_at']
     permission_classes = [permissions.AllowAny]
 
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ['list', 'popular', 'similar', 'trending']:
             return PublicPropertyListSerializer
         return PropertyDetailSerializer
 
 
     def get_queryset(self):
-        base_queryset = Property.objects.all()
-        if self.action == 'list':
-            return base_queryset.prefetch_related('images').filter(status='available')
+        base_queryset = Property.objects.with_popularity()
+        if self.action in ['list', 'popular']:
+            return base_queryset.prefetch_related('images__variants').filter(status='available')
         return base_queryset.prefetch_related(
-            'images', 'videos', 'property_places__place',
+            'images__variants', 'videos', 'property_places__place',
             'rental_contracts', 'sale_contracts'
         )
 
 
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        # Cache-only counter; folded into trending scores by fold_property_views_task
+        record_property_view(response.data['id'], request)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Available properties by precomputed trending rank (recent views, decayed)."""
+        queryset = Property.objects.filter(
+            trend__rank__isnull=False, status='available'
+        ).order_by('trend__rank').prefetch_related('images__variants')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def popular(self, request):
+        """Available properties ordered by favorites plus interests (same filters as list)."""
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-popularity', '-created_at')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+
+    @action(detail=False, methods=['get'], url_path=r'tiles/(?P<zoom>\d+)/(?P<x>\d+)/(?P<y>\d+)')
+    def tile(self, request, zoom=None, x=None, y=None):
+        """Clusters of available properties in one z/x/y map tile (count, centroid, price range)."""
+        zoom, x, y = int(zoom), int(x), int(y)
+        if zoom > QUADKEY_ZOOM or x >= 2 ** zoom or y >= 2 ** zoom:
+            raise NotFound('No such map tile.')
+        version, clusters = get_tile(zoom, x, y)
+        response = Response({'zoom': zoom, 'x': x, 'y': y, 'version': version, 'clusters': clusters})
+        response['Cache-Control'] = 'public, max-age=60'
+        return response
+
+
+    @action(detail=False, methods=['get'],
+            url_path=r'images/(?P<image_id>\d+)/(?P<version>[0-9a-f]+)/(?P<width>\d+)/(?P<image_format>webp|jpeg)')
+    def resized_image(self, request, image_id=None, version=None, width=None, image_format=None):
+        """A property image about `width` pixels wide, rendered on first request and served from a disk cache."""
+        image = PropertyImage.objects.exclude(image='').filter(pk=image_id).first()
+        if image is None or int(width) == 0:
+            raise NotFound('No such image.')
+        current = render_version(image)
+        if version != current:
+            # The original was replaced since the link was built
+            response = HttpResponseRedirect(
+                reverse('property-resized-image', args=[image.pk, current, width, image_format])
+            )
+            response['Cache-Control'] = 'no-cache'
+            return response
+        width = canonical_width(int(width))
+        etag = render_etag(image, width, image_format)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            try:
+                rendered = open_resized_image(image, width, image_format)
+            except (FileNotFoundError, ImageTooLarge, UnidentifiedImageError):
+                raise NotFound('Image cannot be rendered.')
+            response = FileResponse(rendered, content_type=f'image/{image_format}')
+        response['ETag'] = etag
+        response['Cache-Control'] = CACHE_CONTROL
+        return response
+
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Precomputed similar properties, best first (see compute_property_similarity_task)."""
+        queryset = Property.objects.filter(
+            similar_to__property_id=pk, status='available'
+        ).order_by('similar_to__rank').prefetch_related('images__variants')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser],
             parser_classes=[MultiPartParser, FormParser])
     def upload_image(self, request, pk=None):
         """Upload an image for a property."""
         property = self.get_object()
+        # Type and size are checked while the body streams in
+        data = read_media_upload(request, 'image')
         serializer = PropertyImageSerializer(
-            data=request.data,
+            data=data,
             context={'request': request}
         )
         if serializer.is_valid():
@@ -82,8 +174,10 @@ class PropertyViewSet(viewsets.ReadOnlyModelViewSet):
     def upload_video(self, request, pk=None):
         """Upload a video for a property."""
         property = self.get_object()
+        # Type and size are checked while the body streams in
+        data = read_media_upload(request, 'video')
         serializer = PropertyVideoSerializer(
-            data=request.data,
+            data=data,
             context={'request': request}
         )
         if serializer.is_valid():
@@ -120,6 +214,69 @@ class PropertyViewSet(viewsets.ReadOnlyModelViewSet):
             )
 
 
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def near_duplicates(self, request, pk=None):
+        """Per image of this property, perceptually near-identical images (Hamming distance of dHashes)."""
+        property = self.get_object()
+        report = []
+        for image in property.images.all():
+            report.append({
+                'image_id': image.id,
+                'matches': [
+                    {
+                        'image_id': other.id,
+                        'property_id': other.property_id,
+                        'property_title': other.property.title,
+                        'distance': distance,
+                    }
+                    for other, distance in near_duplicates(image)
+                ],
+            })
+        return Response(report)
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable chunked uploads of property images and videos:
+    POST creates a session, PUT sends a chunk with Content-Range, GET/HEAD
+    report the offset to resume from, POST finalize/ attaches the media and
+    DELETE aborts.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, expires_at=session_expiry())
+
+
+    def update(self, request, pk=None):
+        session = self.get_object()
+        start, length = parse_content_range(request.headers.get('Content-Range'), session)
+        # Read straight from the request stream; request.data would buffer the chunk
+        write_chunk(session, start, length, request.stream)
+        return Response(self.get_serializer(session).data)
+
+
+    def destroy(self, request, pk=None):
+        abort_upload(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        session = self.get_object()
+        media = finalize_upload(session)
+        if session.kind == 'image':
+            data = PropertyImageSerializer(media, context={'request': request}).data
+        else:
+            data = PropertyVideoSerializer(media, context={'request': request}).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
 # Other ViewSets (PropertyInterestViewSet, PaymentViewSet, etc.) remain the same
 class PropertyInterestViewSet(viewsets.ModelViewSet):
     serializer_class = PropertyInterestSerializer
@@ -134,7 +291,23 @@ class PropertyInterestViewSet(viewsets.ModelViewSet):
         return self.queryset.filter(user=self.request.user)
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            interest = serializer.save(user=self.request.user)
+            Property.objects.adjust_engagement(interest.property_id, interests=1)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            previous_property_id = serializer.instance.property_id
+            interest = serializer.save()
+            if interest.property_id != previous_property_id:
+                Property.objects.adjust_engagement(previous_property_id, interests=-1)
+                Property.objects.adjust_engagement(interest.property_id, interests=1)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            property_id = instance.property_id
+            instance.delete()
+            Property.objects.adjust_engagement(property_id, interests=-1)
 
 
 class PaymentViewSet(viewsets.ModelViewSet):